@@ -6,6 +6,7 @@ It connects to Turso (LibSQL) for the database via HTTP API.
 """
 
 import os
+import re
 import sys
 
 # Add the api directory to the path for imports
@@ -948,20 +949,58 @@ def get_risk(challenge_id):
 
 @app.route('/api/leaderboard', methods=['GET'])
 def get_leaderboard():
-    """Get the leaderboard."""
+    """
+    Get the leaderboard.
+    Ranked by the precomputed risk-adjusted score in challenge_stats (written
+    by the backend leaderboard engine); users without a ranked challenge follow,
+    ordered by passed challenges and best profit.
+    """
     leaderboard = query_db(
-        '''SELECT u.id, u.name, u.avatar_url, 
+        '''SELECT u.id, u.name, u.avatar_url,
                   COUNT(c.id) as total_challenges,
                   SUM(CASE WHEN c.status = 'passed' THEN 1 ELSE 0 END) as passed_challenges,
-                  MAX(c.equity - c.start_balance) as best_profit
+                  MAX(c.equity - c.start_balance) as best_profit,
+                  MIN(s.rank) as rank
            FROM users u
-           LEFT JOIN challenges c ON u.id = c.user_id
+           JOIN challenges c ON u.id = c.user_id
+           LEFT JOIN challenge_stats s ON s.challenge_id = c.id
            GROUP BY u.id
-           HAVING total_challenges > 0
-           ORDER BY passed_challenges DESC, best_profit DESC
+           ORDER BY rank IS NULL, rank, passed_challenges DESC, best_profit DESC
            LIMIT 50'''
     )
     
+    if not leaderboard:
+        # challenge_stats not created yet on this database
+        leaderboard = query_db(
+            '''SELECT u.id, u.name, u.avatar_url, 
+                      COUNT(c.id) as total_challenges,
+                      SUM(CASE WHEN c.status = 'passed' THEN 1 ELSE 0 END) as passed_challenges,
+                      MAX(c.equity - c.start_balance) as best_profit
+               FROM users u
+               LEFT JOIN challenges c ON u.id = c.user_id
+               GROUP BY u.id
+               HAVING total_challenges > 0
+               ORDER BY passed_challenges DESC, best_profit DESC
+               LIMIT 50'''
+        )
+        return jsonify({'leaderboard': leaderboard})
+    
+    # Attach the metrics of each user's best-ranked challenge
+    ranks = [row['rank'] for row in leaderboard if row.get('rank') is not None]
+    if ranks:
+        placeholders = ','.join('?' * len(ranks))
+        metrics = query_db(
+            f'''SELECT rank, score, sharpe, sortino, max_drawdown_pct, profit_factor,
+                       consistency_score, total_return_pct
+                FROM challenge_stats WHERE rank IN ({placeholders})''',
+            tuple(ranks)
+        )
+        by_rank = {m['rank']: m for m in metrics}
+        for row in leaderboard:
+            stats = by_rank.get(row.get('rank'))
+            if stats:
+                row.update({k: v for k, v in stats.items() if k != 'rank'})
+    
     return jsonify({'leaderboard': leaderboard})
 
 
@@ -969,9 +1008,30 @@ def get_leaderboard():
 # Community Routes
 # ============================================
 
+# Public, non-personalized reads a browser/CDN may keep briefly: (path pattern, max-age seconds)
+PUBLIC_CACHE_RULES = [
+    (re.compile(r'^/(?:api/)?v1/[^/]+/academy/courses(?:/\d+)?$'), 300),
+    (re.compile(r'^/api/plans$'), 300),
+    (re.compile(r'^/api/news/latest$'), 300),
+    (re.compile(r'^/api/leaderboard$'), 60),
+]
+
+
 @app.after_request
 def add_cache_headers(response):
-    """Add headers to prevent caching of API responses."""
+    """
+    no-store for dynamic responses (authenticated, writes, errors, live market
+    data); the public catalog reads above get a short shared cache lifetime.
+    """
+    if 'Cache-Control' in response.headers:
+        return response  # Set by the view itself
+
+    if request.method == 'GET' and response.status_code == 200 and 'Authorization' not in request.headers:
+        for pattern, max_age in PUBLIC_CACHE_RULES:
+            if pattern.match(request.path):
+                response.headers['Cache-Control'] = f'public, max-age={max_age}, stale-while-revalidate={max_age}'
+                return response
+
     response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '0'
@@ -1967,317 +2027,9 @@ def pay_paypal():
 # Academy Routes - MasterClass Learning Center
 # ============================================
 
-# Static course data (no database needed for MVP)
-ACADEMY_COURSES = [
-    {
-        'id': 1,
-        'title': 'Trading Fundamentals',
-        'description': 'Master the basics of trading - from market structure to order types. Perfect for beginners.',
-        'difficulty': 'Beginner',
-        'duration_minutes': 270,
-        'duration': '4h 30m',
-        'xp_reward': 500,
-        'thumbnail_url': 'https://images.unsplash.com/photo-1611974789855-9c2a0a7236a3?w=800',
-        'instructor': 'Sarah Johnson',
-        'rating': 4.8,
-        'students': 2547,
-        'is_premium': False,
-        'user_progress': 0,
-        'modules': [
-            {
-                'id': 1, 
-                'title': 'Market Basics', 
-                'duration': '1h 30m',
-                'lessons': [
-                    {'id': 101, 'title': 'Introduction to Financial Markets', 'duration': '15m', 'completed': False, 'type': 'video'},
-                    {'id': 102, 'title': 'Understanding Market Structure', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 103, 'title': 'Types of Financial Instruments', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 104, 'title': 'Quiz: Market Basics', 'duration': '10m', 'completed': False, 'type': 'quiz'}
-                ]
-            },
-            {
-                'id': 2, 
-                'title': 'Order Types', 
-                'duration': '1h 30m',
-                'lessons': [
-                    {'id': 105, 'title': 'Market Orders vs Limit Orders', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 106, 'title': 'Stop Loss & Take Profit', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 107, 'title': 'Advanced Order Types', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 108, 'title': 'Practice: Place Your First Trade', 'duration': '15m', 'completed': False, 'type': 'practice'}
-                ]
-            },
-            {
-                'id': 3, 
-                'title': 'Risk Management', 
-                'duration': '1h 30m',
-                'lessons': [
-                    {'id': 109, 'title': 'Position Sizing Fundamentals', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 110, 'title': 'Risk-Reward Ratios', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 111, 'title': 'Building a Risk Management Plan', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 112, 'title': 'Final Quiz', 'duration': '15m', 'completed': False, 'type': 'quiz'}
-                ]
-            }
-        ]
-    },
-    {
-        'id': 2,
-        'title': 'Technical Analysis Pro',
-        'description': 'Advanced chart patterns, indicators, and price action strategies used by professionals.',
-        'difficulty': 'Pro',
-        'duration_minutes': 495,
-        'duration': '8h 15m',
-        'xp_reward': 1200,
-        'thumbnail_url': 'https://images.unsplash.com/photo-1642790106117-e829e14a795f?w=800',
-        'instructor': 'Michael Chen',
-        'rating': 4.9,
-        'students': 1823,
-        'is_premium': True,
-        'user_progress': 0,
-        'modules': [
-            {
-                'id': 4, 
-                'title': 'Chart Patterns', 
-                'duration': '3h',
-                'lessons': [
-                    {'id': 201, 'title': 'Support & Resistance Levels', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 202, 'title': 'Trend Lines & Channels', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 203, 'title': 'Head & Shoulders Pattern', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 204, 'title': 'Double Tops & Bottoms', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 205, 'title': 'Triangles & Wedges', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 206, 'title': 'Pattern Recognition Practice', 'duration': '20m', 'completed': False, 'type': 'practice'}
-                ]
-            },
-            {
-                'id': 5, 
-                'title': 'Indicators Mastery', 
-                'duration': '2h 30m',
-                'lessons': [
-                    {'id': 207, 'title': 'Moving Averages Deep Dive', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 208, 'title': 'RSI & Momentum Indicators', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 209, 'title': 'MACD Strategies', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 210, 'title': 'Bollinger Bands', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 211, 'title': 'Combining Multiple Indicators', 'duration': '25m', 'completed': False, 'type': 'video'}
-                ]
-            },
-            {
-                'id': 6, 
-                'title': 'Price Action', 
-                'duration': '2h 45m',
-                'lessons': [
-                    {'id': 212, 'title': 'Candlestick Patterns', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 213, 'title': 'Price Action Trading Strategies', 'duration': '35m', 'completed': False, 'type': 'video'},
-                    {'id': 214, 'title': 'Market Structure Analysis', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 215, 'title': 'Live Chart Analysis', 'duration': '30m', 'completed': False, 'type': 'practice'},
-                    {'id': 216, 'title': 'Final Assessment', 'duration': '20m', 'completed': False, 'type': 'quiz'}
-                ]
-            }
-        ]
-    },
-    {
-        'id': 3,
-        'title': 'Forex Mastery',
-        'description': 'Complete guide to forex trading - pairs, sessions, and advanced strategies.',
-        'difficulty': 'Pro',
-        'duration_minutes': 405,
-        'duration': '6h 45m',
-        'xp_reward': 1000,
-        'thumbnail_url': 'https://images.unsplash.com/photo-1526304640581-d334cdbbf45e?w=800',
-        'instructor': 'Ahmed Mansour',
-        'rating': 4.7,
-        'students': 1456,
-        'is_premium': True,
-        'user_progress': 0,
-        'modules': [
-            {
-                'id': 7, 
-                'title': 'Forex Basics', 
-                'duration': '2h',
-                'lessons': [
-                    {'id': 301, 'title': 'Introduction to Forex', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 302, 'title': 'Currency Pairs Explained', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 303, 'title': 'Pips, Lots & Leverage', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 304, 'title': 'Reading Forex Quotes', 'duration': '20m', 'completed': False, 'type': 'video'}
-                ]
-            },
-            {
-                'id': 8, 
-                'title': 'Session Trading', 
-                'duration': '2h 30m',
-                'lessons': [
-                    {'id': 305, 'title': 'Understanding Trading Sessions', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 306, 'title': 'London Session Strategies', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 307, 'title': 'New York Session Strategies', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 308, 'title': 'Session Overlap Trading', 'duration': '25m', 'completed': False, 'type': 'video'}
-                ]
-            },
-            {
-                'id': 9, 
-                'title': 'Advanced Strategies', 
-                'duration': '2h 15m',
-                'lessons': [
-                    {'id': 309, 'title': 'Carry Trade Strategy', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 310, 'title': 'News Trading', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 311, 'title': 'Correlation Trading', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 312, 'title': 'Final Quiz', 'duration': '15m', 'completed': False, 'type': 'quiz'}
-                ]
-            }
-        ]
-    },
-    {
-        'id': 4,
-        'title': 'Algorithmic Trading',
-        'description': 'Build and backtest your own trading algorithms. Python & automation focus.',
-        'difficulty': 'Elite',
-        'duration_minutes': 750,
-        'duration': '12h 30m',
-        'xp_reward': 2000,
-        'thumbnail_url': 'https://images.unsplash.com/photo-1555949963-aa79dcee981c?w=800',
-        'instructor': 'Dr. Emily Watson',
-        'rating': 4.9,
-        'students': 892,
-        'is_premium': True,
-        'user_progress': 0,
-        'modules': [
-            {
-                'id': 10, 
-                'title': 'Python for Trading', 
-                'duration': '4h',
-                'lessons': [
-                    {'id': 401, 'title': 'Python Basics for Traders', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 402, 'title': 'Pandas for Financial Data', 'duration': '35m', 'completed': False, 'type': 'video'},
-                    {'id': 403, 'title': 'NumPy for Calculations', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 404, 'title': 'Data Visualization', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 405, 'title': 'API Integration', 'duration': '35m', 'completed': False, 'type': 'video'},
-                    {'id': 406, 'title': 'Coding Practice', 'duration': '30m', 'completed': False, 'type': 'practice'}
-                ]
-            },
-            {
-                'id': 11, 
-                'title': 'Strategy Development', 
-                'duration': '5h',
-                'lessons': [
-                    {'id': 407, 'title': 'Building Your First Algorithm', 'duration': '40m', 'completed': False, 'type': 'video'},
-                    {'id': 408, 'title': 'Signal Generation', 'duration': '35m', 'completed': False, 'type': 'video'},
-                    {'id': 409, 'title': 'Position Management Logic', 'duration': '35m', 'completed': False, 'type': 'video'},
-                    {'id': 410, 'title': 'Risk Controls in Code', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 411, 'title': 'Strategy Optimization', 'duration': '40m', 'completed': False, 'type': 'video'},
-                    {'id': 412, 'title': 'Build Your Strategy', 'duration': '45m', 'completed': False, 'type': 'practice'}
-                ]
-            },
-            {
-                'id': 12, 
-                'title': 'Backtesting & Deployment', 
-                'duration': '3h 30m',
-                'lessons': [
-                    {'id': 413, 'title': 'Backtesting Fundamentals', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 414, 'title': 'Avoiding Overfitting', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 415, 'title': 'Walk-Forward Analysis', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 416, 'title': 'Paper Trading Setup', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 417, 'title': 'Going Live', 'duration': '30m', 'completed': False, 'type': 'video'},
-                    {'id': 418, 'title': 'Final Project', 'duration': '30m', 'completed': False, 'type': 'practice'}
-                ]
-            }
-        ]
-    },
-    {
-        'id': 5,
-        'title': 'Crypto Trading Essentials',
-        'description': 'Navigate the crypto markets with confidence. DeFi, NFTs, and more.',
-        'difficulty': 'Pro',
-        'duration_minutes': 320,
-        'duration': '5h 20m',
-        'xp_reward': 800,
-        'thumbnail_url': 'https://images.unsplash.com/photo-1621761191319-c6fb62004040?w=800',
-        'instructor': 'Jake Rivera',
-        'rating': 4.6,
-        'students': 3201,
-        'is_premium': False,
-        'user_progress': 0,
-        'modules': [
-            {
-                'id': 13, 
-                'title': 'Crypto Fundamentals', 
-                'duration': '1h 45m',
-                'lessons': [
-                    {'id': 501, 'title': 'Blockchain Basics', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 502, 'title': 'Understanding Bitcoin', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 503, 'title': 'Altcoins & Tokens', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 504, 'title': 'Crypto Wallets & Security', 'duration': '20m', 'completed': False, 'type': 'video'}
-                ]
-            },
-            {
-                'id': 14, 
-                'title': 'DeFi & NFTs', 
-                'duration': '1h 50m',
-                'lessons': [
-                    {'id': 505, 'title': 'Introduction to DeFi', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 506, 'title': 'Yield Farming & Staking', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 507, 'title': 'NFT Markets', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 508, 'title': 'DeFi Risks', 'duration': '20m', 'completed': False, 'type': 'video'}
-                ]
-            },
-            {
-                'id': 15, 
-                'title': 'Advanced Crypto Trading', 
-                'duration': '1h 45m',
-                'lessons': [
-                    {'id': 509, 'title': 'Crypto Technical Analysis', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 510, 'title': 'Market Cycles', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 511, 'title': 'Trading Crypto Volatility', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 512, 'title': 'Final Quiz', 'duration': '15m', 'completed': False, 'type': 'quiz'}
-                ]
-            }
-        ]
-    },
-    {
-        'id': 6,
-        'title': 'Risk & Psychology',
-        'description': 'Master your mind and money. Essential for consistent profitability.',
-        'difficulty': 'Beginner',
-        'duration_minutes': 225,
-        'duration': '3h 45m',
-        'xp_reward': 600,
-        'thumbnail_url': 'https://images.unsplash.com/photo-1507679799987-c73779587ccf?w=800',
-        'instructor': 'Dr. Lisa Park',
-        'rating': 4.8,
-        'students': 4102,
-        'is_premium': False,
-        'user_progress': 0,
-        'modules': [
-            {
-                'id': 16, 
-                'title': 'Trading Psychology', 
-                'duration': '1h 30m',
-                'lessons': [
-                    {'id': 601, 'title': 'The Trader Mindset', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 602, 'title': 'Emotions in Trading', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 603, 'title': 'Fear & Greed', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 604, 'title': 'Developing Discipline', 'duration': '25m', 'completed': False, 'type': 'video'}
-                ]
-            },
-            {
-                'id': 17, 
-                'title': 'Risk Management', 
-                'duration': '1h 15m',
-                'lessons': [
-                    {'id': 605, 'title': 'Capital Preservation', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 606, 'title': 'Drawdown Management', 'duration': '25m', 'completed': False, 'type': 'video'},
-                    {'id': 607, 'title': 'Portfolio Risk', 'duration': '25m', 'completed': False, 'type': 'video'}
-                ]
-            },
-            {
-                'id': 18, 
-                'title': 'Discipline & Routine', 
-                'duration': '1h',
-                'lessons': [
-                    {'id': 608, 'title': 'Building a Trading Routine', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 609, 'title': 'Journaling Best Practices', 'duration': '20m', 'completed': False, 'type': 'video'},
-                    {'id': 610, 'title': 'Long-term Success Habits', 'duration': '20m', 'completed': False, 'type': 'video'}
-                ]
-            }
-        ]
-    }
-]
+# Static course data (no database needed for MVP), kept in api/academy_courses.json
+with open(os.path.join(api_dir, 'academy_courses.json'), encoding='utf-8') as f:
+    ACADEMY_COURSES = json.load(f)
 
 
 @app.route('/api/v1/<tenant>/academy/courses', methods=['GET'])
@@ -1,7 +1,8 @@
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, jsonify
 from flask_cors import CORS
 from config import Config
 from models import db
+from database import init_database
 from routes.auth import auth_bp
 from routes.challenges import challenges_bp
 from routes.market import market_bp
@@ -21,7 +22,8 @@ def create_app():
         r"/static/*": {"origins": "*"}
     })
 
-    db.init_app(app)
+    # SQLite pragmas, pool sizing and the read-only engine
+    init_database(app)
 
     # Register Blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -47,13 +49,18 @@ def create_app():
     # Serve static files (for uploaded images, voice messages, etc.)
     @app.route('/static/uploads/<path:filename>')
     def serve_uploads(filename):
-        return send_from_directory(os.path.join(app.root_path, 'static', 'uploads'), filename)
+        from services.file_service import send_upload
+        return send_upload(filename)
 
     # Global Error Handler
     @app.errorhandler(404)
     def not_found(e):
         return jsonify(error="Resource not found"), 404
 
+    @app.errorhandler(413)
+    def too_large(e):
+        return jsonify(error="Upload too large"), 413
+
     @app.errorhandler(500)
     def server_error(e):
         return jsonify(error="Internal server error"), 500
@@ -61,9 +68,40 @@ def create_app():
     # Create tables if using SQLite (dev)
     with app.app_context():
         db.create_all()
+        # Indexes/columns that create_all() cannot add to existing tables
+        from migrations import run_migrations
+        run_migrations()
         # Seed initial data for community
         seed_initial_data()
     
+    # Batch equity / daily metric writes off the request path
+    from services.write_behind import start_write_behind
+    start_write_behind(app)
+
+    # Buffered like/vote counters
+    from services.counters import start_counters
+    start_counters(app)
+
+    # Coalesced video-progress heartbeats
+    from services.progress_buffer import start_progress_buffer
+    start_progress_buffer(app)
+
+    # Thumbnail / WebP derivatives for uploaded images
+    from services.media_worker import start_media_worker
+    start_media_worker(app)
+
+    # Nightly risk-adjusted leaderboard batch + intraday refresh
+    from services.leaderboard_engine import start_leaderboard_engine
+    start_leaderboard_engine(app)
+
+    # Nightly course recommendations for users with new trades
+    from services.recommendation_batch import start_recommendation_batch
+    start_recommendation_batch(app)
+
+    # Load resting orders so price ticks can trigger them
+    from services.order_book import init_order_book
+    init_order_book(app)
+
     # Initialize background price scheduler for <5ms price lookups
     from services.price_cache import start_price_scheduler
     start_price_scheduler(app)
@@ -218,10 +256,8 @@ def seed_initial_data():
     db.session.commit()
     print("✅ Community seed data created successfully!")
     
-    # Seed Academy data
-    from services.academy_service import seed_academy_data
-    result = seed_academy_data()
-    print(f"✅ Academy: {result}")
+    # Academy content is imported outside start-up:
+    #   python -m services.content_import
 
 if __name__ == '__main__':
     app = create_app()
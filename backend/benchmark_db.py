@@ -0,0 +1,135 @@
+"""
+SQLite concurrency benchmark: trade inserts vs equity polling reads.
+
+Runs the same workload twice against a throwaway database file:
+  1. "default"  - plain SQLAlchemy engine, rollback journal, no pragmas
+  2. "tuned"    - init_database(): WAL + pragmas, sized pool, read-only engine
+
+Usage:
+    python benchmark_db.py [--seconds 5] [--writers 4] [--readers 8]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+from models import db, User, Plan, Challenge, Trade
+from database import init_database, read_only
+
+CHALLENGES = 50
+
+
+def build_app(db_path, tuned):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if tuned:
+        init_database(app)
+    else:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'check_same_thread': False}}
+        db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        user = User(name='Bench', email='bench@tradesense.com', password_hash='x')
+        plan = Plan(slug='bench', price_dh=0)
+        db.session.add_all([user, plan])
+        db.session.flush()
+        db.session.add_all([
+            Challenge(user_id=user.id, plan_id=plan.id, start_balance=10000, equity=10000)
+            for _ in range(CHALLENGES)
+        ])
+        db.session.commit()
+    return app
+
+
+def run_workload(app, seconds, writers, readers):
+    counts = {'inserts': 0, 'reads': 0, 'errors': 0}
+    lock = threading.Lock()
+    stop = time.time() + seconds
+
+    def writer():
+        done = errors = 0
+        while time.time() < stop:
+            with app.app_context():
+                try:
+                    db.session.add(Trade(
+                        challenge_id=random.randint(1, CHALLENGES),
+                        symbol='BTC-USD',
+                        side=random.choice(['buy', 'sell']),
+                        qty=1,
+                        price=45000 + random.random() * 100
+                    ))
+                    db.session.commit()
+                    done += 1
+                except OperationalError:
+                    db.session.rollback()
+                    errors += 1
+        with lock:
+            counts['inserts'] += done
+            counts['errors'] += errors
+
+    @read_only
+    def read_equity():
+        challenge_id = random.randint(1, CHALLENGES)
+        challenge = db.session.get(Challenge, challenge_id)
+        Trade.query.filter_by(challenge_id=challenge_id).order_by(Trade.executed_at.desc()).limit(20).all()
+        return challenge.equity
+
+    def reader():
+        done = errors = 0
+        while time.time() < stop:
+            with app.app_context():
+                try:
+                    read_equity()
+                    done += 1
+                except OperationalError:
+                    db.session.rollback()
+                    errors += 1
+        with lock:
+            counts['reads'] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with app.app_context():
+        db.engine.dispose()
+    reader_engine = app.extensions.get('db_read_engine')
+    if reader_engine is not None:
+        reader_engine.dispose()
+
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"Workload: {args.writers} writer / {args.readers} reader threads for {args.seconds}s\n")
+    print(f"{'mode':<10}{'inserts/s':>12}{'reads/s':>12}{'errors':>10}")
+
+    for mode in ('default', 'tuned'):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'bench.db')
+            app = build_app(db_path, tuned=(mode == 'tuned'))
+            counts = run_workload(app, args.seconds, args.writers, args.readers)
+        print(f"{mode:<10}{counts['inserts'] / args.seconds:>12.0f}"
+              f"{counts['reads'] / args.seconds:>12.0f}{counts['errors']:>10}")
+
+
+if __name__ == '__main__':
+    main()
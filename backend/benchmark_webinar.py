@@ -0,0 +1,186 @@
+"""
+Webinar registration burst: capacity checks under concurrent sign-ups.
+
+Fires a burst of registrations for one capped webinar from many threads,
+then cancels some seats while the burst's waitlist is still queued. Runs
+the same workload twice against a throwaway database file:
+  1. "count"    - the old check-then-insert (COUNT(*) registrations, then INSERT)
+  2. "counter"  - services.webinar_seats: conditional UPDATE on the seat counter + waitlist
+
+Afterwards every mode is checked for oversubscription; "counter" must also
+keep registered_count equal to the registrations table and refill each
+cancelled seat from the waitlist.
+
+Usage:
+    python benchmark_webinar.py [--users 5000] [--capacity 500] [--threads 32] [--cancel 50]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from models import db, User, Webinar, WebinarRegistration, WebinarWaitlist
+from database import init_database
+from services import webinar_seats
+
+
+def build_app(db_path, users, capacity):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['DB_POOL_SIZE'] = 20
+    init_database(app)
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(User), [
+            {'name': f'User {i}', 'email': f'user{i}@tradesense.com', 'password_hash': 'x'}
+            for i in range(users)
+        ])
+        webinar = Webinar(title='Masterclass', scheduled_at=datetime.utcnow() + timedelta(days=1),
+                          max_attendees=capacity, status='upcoming')
+        db.session.add(webinar)
+        db.session.commit()
+        return app, webinar.id
+
+
+def count_register(user_id, webinar_id):
+    """The pre-counter implementation: count, compare, insert."""
+    webinar = db.session.get(Webinar, webinar_id)
+    if webinar.max_attendees:
+        current_count = WebinarRegistration.query.filter_by(webinar_id=webinar_id).count()
+        if current_count >= webinar.max_attendees:
+            return {'error': 'Webinar is full'}
+    db.session.add(WebinarRegistration(user_id=user_id, webinar_id=webinar_id))
+    db.session.commit()
+    return {'success': True}
+
+
+def count_release(user_id, webinar_id):
+    WebinarRegistration.query.filter_by(user_id=user_id, webinar_id=webinar_id).delete()
+    db.session.commit()
+
+
+MODES = {
+    'count': (count_register, count_release),
+    'counter': (webinar_seats.reserve, webinar_seats.release),
+}
+
+
+def run_parallel(app, func, user_ids, webinar_id, threads):
+    """Call func(user_id, webinar_id) for every user from `threads` threads. Returns (outcomes, seconds)."""
+    outcomes = {'registered': 0, 'waitlisted': 0, 'full': 0, 'errors': 0}
+    lock = threading.Lock()
+    start_gate = threading.Barrier(threads)
+
+    def worker(batch):
+        local = dict.fromkeys(outcomes, 0)
+        start_gate.wait()
+        for user_id in batch:
+            with app.app_context():
+                try:
+                    result = func(user_id, webinar_id) or {}
+                except (OperationalError, IntegrityError):
+                    db.session.rollback()
+                    local['errors'] += 1
+                    continue
+            if result.get('waitlisted'):
+                local['waitlisted'] += 1
+            elif result.get('success'):
+                local['registered'] += 1
+            else:
+                local['full'] += 1
+        with lock:
+            for key, n in local.items():
+                outcomes[key] += n
+
+    workers = [threading.Thread(target=worker, args=(user_ids[i::threads],)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return outcomes, time.perf_counter() - started
+
+
+def run_mode(mode, db_path, args):
+    register, release = MODES[mode]
+    app, webinar_id = build_app(db_path, args.users, args.capacity)
+    user_ids = list(range(1, args.users + 1))
+
+    burst, seconds = run_parallel(app, register, user_ids, webinar_id, args.threads)
+
+    with app.app_context():
+        seated = [r.user_id for r in WebinarRegistration.query.filter_by(webinar_id=webinar_id)
+                  .order_by(WebinarRegistration.id).limit(args.cancel)]
+    cancels, _ = run_parallel(app, release, seated, webinar_id, min(args.threads, max(len(seated), 1)))
+
+    with app.app_context():
+        registrations = WebinarRegistration.query.filter_by(webinar_id=webinar_id).count()
+        waiting = WebinarWaitlist.query.filter_by(webinar_id=webinar_id).count()
+        counter = db.session.get(Webinar, webinar_id).registered_count
+        db.engine.dispose()
+    reader_engine = app.extensions.get('db_read_engine')
+    if reader_engine is not None:
+        reader_engine.dispose()
+
+    return {
+        'burst': burst,
+        'seconds': seconds,
+        'cancelled': cancels['registered'],
+        'registrations': registrations,
+        'waiting': waiting,
+        'counter': counter,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--capacity', type=int, default=500, help='0 = unlimited')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--cancel', type=int, default=50, help='seats cancelled after the burst')
+    args = parser.parse_args()
+
+    print(f"Burst: {args.users} registrations for {args.capacity} seats from {args.threads} threads, "
+          f"then {args.cancel} cancellations\n")
+    print(f"{'mode':<10}{'req/s':>8}{'seated':>8}{'waitlist':>10}{'refused':>9}{'errors':>8}"
+          f"{'final':>7}{'counter':>9}  result")
+
+    failed = False
+    for mode in MODES:
+        with tempfile.TemporaryDirectory() as tmp:
+            r = run_mode(mode, os.path.join(tmp, 'bench.db'), args)
+        burst = r['burst']
+
+        problems = []
+        peak = max(burst['registered'], r['registrations'])
+        if args.capacity and peak > args.capacity:  # 0 = no cap
+            problems.append(f"oversubscribed by {peak - args.capacity}")
+        if mode == 'counter':
+            if r['counter'] != r['registrations']:
+                problems.append(f"counter drift {r['counter'] - r['registrations']:+d}")
+            refilled = min(r['cancelled'], burst['waitlisted'])
+            if r['registrations'] != burst['registered'] - r['cancelled'] + refilled:
+                problems.append('cancelled seats not refilled from the waitlist')
+            if r['waiting'] != burst['waitlisted'] - refilled:
+                problems.append('waitlist out of step')
+            failed = failed or bool(problems)
+
+        print(f"{mode:<10}{args.users / r['seconds']:>8.0f}{burst['registered']:>8}{burst['waitlisted']:>10}"
+              f"{burst['full']:>9}{burst['errors']:>8}{r['registrations']:>7}"
+              f"{r['counter'] if mode == 'counter' else '-':>9}  {'; '.join(problems) or 'ok'}")
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,4 +10,14 @@ class Config:
         f'sqlite:///{os.path.join(basedir, "instance", "tradesense.db")}'
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool per worker process (see database.py)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_READ_POOL_SIZE = int(os.environ.get('DB_READ_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    # Whole-request cap (Flask answers 413); per-type limits live in services/file_service.py
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_UPLOAD_MB', 20)) * 1024 * 1024
+    # Let nginx/Apache send upload bodies (X-Sendfile) instead of the Python worker
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true')
     DEBUG = True
@@ -0,0 +1,147 @@
+"""
+Database Engine Setup
+SQLite production tuning (WAL, pragmas), pool sizing and a read-only engine
+so polling reads never queue behind trade writes.
+
+Usage (instead of db.init_app):
+    from database import init_database
+    init_database(app)
+
+Read-only routes opt in with the @read_only decorator; anything the session
+flushes still goes to the read-write engine.
+"""
+
+import os
+from functools import wraps
+
+from flask import current_app
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+# Applied on every new SQLite connection
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',       # Readers and the writer no longer block each other
+    'synchronous': 'NORMAL',     # Durable at checkpoint, safe with WAL, far fewer fsyncs
+    'busy_timeout': 5000,        # Wait (ms) for the write lock instead of failing with "database is locked"
+    'mmap_size': 268435456,      # 256MB memory-mapped reads
+    'cache_size': -65536,        # 64MB page cache per connection (negative = KiB)
+    'temp_store': 'MEMORY',
+    'wal_autocheckpoint': 1000,
+}
+
+
+class RoutingSession(FlaskSession):
+    """
+    Session that sends reads to the read-only engine when the request opted in
+    (session.info['read_only']), and everything else - including flushes - to
+    the default read-write engine.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('read_only') and not self._flushing:
+            reader = current_app.extensions.get('db_read_engine')
+            if reader is not None:
+                return reader
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def is_sqlite_file(uri) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def engine_options(app) -> dict:
+    """Pool sizing for the read-write engine. In-memory SQLite keeps its static pool."""
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and not is_sqlite_file(uri):
+        return {}
+
+    options = {
+        'pool_size': app.config.get('DB_POOL_SIZE', 5),
+        'max_overflow': app.config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': app.config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': app.config.get('DB_POOL_RECYCLE', 1800),
+    }
+    if url.get_backend_name() == 'sqlite':
+        # Connections are handed between the request, price and flush threads
+        options['connect_args'] = {'check_same_thread': False}
+    else:
+        options['pool_pre_ping'] = True
+    return options
+
+
+def apply_sqlite_pragmas(engine, pragmas=None, query_only=False):
+    """Register a connect hook that applies the pragmas to each new DBAPI connection."""
+    pragmas = dict(SQLITE_PRAGMAS if pragmas is None else pragmas)
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if query_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def create_read_engine(app):
+    """Separate pool of query_only connections for polling reads."""
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    engine = create_engine(
+        uri,
+        pool_size=app.config.get('DB_READ_POOL_SIZE', 10),
+        max_overflow=app.config.get('DB_MAX_OVERFLOW', 10),
+        pool_timeout=app.config.get('DB_POOL_TIMEOUT', 30),
+        connect_args={'check_same_thread': False},
+    )
+    # journal_mode is persistent per database file and is set by the writer
+    reader_pragmas = {k: v for k, v in SQLITE_PRAGMAS.items() if k not in ('journal_mode', 'wal_autocheckpoint')}
+    apply_sqlite_pragmas(engine, reader_pragmas, query_only=True)
+    return engine
+
+
+def _dispose_after_fork(app):
+    """Each forked worker (e.g. gunicorn --preload) must open its own connections."""
+    def _reset():
+        with app.app_context():
+            from models import db
+            db.engine.dispose(close=False)
+        reader = app.extensions.get('db_read_engine')
+        if reader is not None:
+            reader.dispose(close=False)
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_reset)
+
+
+def init_database(app):
+    """Configure pools, register SQLite pragmas and the read-only engine, then init db."""
+    from models import db
+
+    options = engine_options(app)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    for key, value in options.items():
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'].setdefault(key, value)
+
+    db.init_app(app)
+
+    if is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        with app.app_context():
+            apply_sqlite_pragmas(db.engine)
+        app.extensions['db_read_engine'] = create_read_engine(app)
+
+    _dispose_after_fork(app)
+
+
+def read_only(f):
+    """Route this view's queries to the read-only engine."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        from models import db
+        db.session.info['read_only'] = True
+        try:
+            return f(*args, **kwargs)
+        finally:
+            db.session.info.pop('read_only', None)
+    return decorated
@@ -0,0 +1,205 @@
+"""
+Schema Migrations
+db.create_all() only creates missing tables - it never adds indexes or columns
+to tables that already exist. Each migration below runs once per database and
+is recorded in the schema_migrations table.
+
+Runs automatically from create_app(), or manually:
+    python migrations.py
+"""
+
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from models import db
+
+
+def add_column(table, column, ddl):
+    """ALTER TABLE ... ADD COLUMN, skipped when create_all() already made it."""
+    def _apply():
+        columns = {c['name'] for c in inspect(db.session.connection()).get_columns(table)}
+        if column not in columns:
+            db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return _apply
+
+
+def search_index(action):
+    """Deferred call into services.search_service (importing it registers the index hooks)."""
+    def _apply():
+        from services import search_service
+        getattr(search_service, action)()
+    return _apply
+
+
+# (name, [statements]) - append only, never edit a migration that has shipped.
+# A statement is SQL text or a callable (see add_column).
+MIGRATIONS = [
+    ('0001_hot_query_indexes', [
+        # Ordered trade replay per challenge (positions, realized PnL, history)
+        "CREATE INDEX IF NOT EXISTS idx_trade_challenge_executed ON trades (challenge_id, executed_at)",
+        # Community feed pages per tenant
+        "CREATE INDEX IF NOT EXISTS idx_post_tenant_created ON community_posts (tenant_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_comment_post ON community_comments (post_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_strategy_ranking ON strategies (win_rate, votes_count)",
+        # DM threads and unread counters
+        "CREATE INDEX IF NOT EXISTS idx_dm_pair_created ON direct_messages (sender_id, receiver_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_dm_receiver_unread ON direct_messages (receiver_id, is_read)",
+        "CREATE INDEX IF NOT EXISTS idx_conversation_user1 ON conversations (user1_id, user2_id)",
+        "CREATE INDEX IF NOT EXISTS idx_conversation_user2 ON conversations (user2_id, user1_id)",
+        # Academy progress and catalog relationships
+        "CREATE INDEX IF NOT EXISTS idx_user_progress_completed ON user_progress (user_id, completed)",
+        "CREATE INDEX IF NOT EXISTS idx_user_progress_lesson ON user_progress (lesson_id, completed)",
+        "CREATE INDEX IF NOT EXISTS idx_module_course ON course_modules (course_id, order_index)",
+        "CREATE INDEX IF NOT EXISTS idx_lesson_module ON lessons (module_id, order_index)",
+        "CREATE INDEX IF NOT EXISTS idx_quiz_lesson ON lesson_quizzes (lesson_id)",
+        "CREATE INDEX IF NOT EXISTS idx_recommendation_user ON ai_recommendations (user_id, is_dismissed)",
+        "CREATE INDEX IF NOT EXISTS idx_note_user_lesson ON user_notes (user_id, lesson_id)",
+        "CREATE INDEX IF NOT EXISTS idx_strategy_user ON strategies (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_webinar_schedule ON webinars (status, scheduled_at)",
+        "CREATE INDEX IF NOT EXISTS idx_webinar_registration_webinar ON webinar_registrations (webinar_id)",
+    ]),
+    ('0002_daily_metric_date', [
+        # Monthly leaderboard load: every challenge with a metric in the month
+        "CREATE INDEX IF NOT EXISTS idx_daily_metric_date ON daily_metrics (date)",
+    ]),
+    ('0003_post_comments_count', [
+        add_column('community_posts', 'comments_count', "INTEGER NOT NULL DEFAULT 0"),
+        "UPDATE community_posts SET comments_count = "
+        "(SELECT COUNT(*) FROM community_comments WHERE community_comments.post_id = community_posts.id)",
+    ]),
+    ('0004_conversation_summary', [
+        add_column('conversations', 'last_message_id', "INTEGER REFERENCES direct_messages(id)"),
+        add_column('conversations', 'last_message_preview', "VARCHAR(200)"),
+        add_column('conversations', 'last_message_media_type', "VARCHAR(20)"),
+        add_column('conversations', 'last_sender_id', "INTEGER"),
+        add_column('conversations', 'user1_unread', "INTEGER NOT NULL DEFAULT 0"),
+        add_column('conversations', 'user2_unread', "INTEGER NOT NULL DEFAULT 0"),
+        "CREATE INDEX IF NOT EXISTS idx_conversation_user1_recent ON conversations (user1_id, last_message_at)",
+        "CREATE INDEX IF NOT EXISTS idx_conversation_user2_recent ON conversations (user2_id, last_message_at)",
+        # Backfill the summaries from the message history
+        "UPDATE conversations SET last_message_id = ("
+        " SELECT d.id FROM direct_messages d"
+        " WHERE (d.sender_id = conversations.user1_id AND d.receiver_id = conversations.user2_id)"
+        " OR (d.sender_id = conversations.user2_id AND d.receiver_id = conversations.user1_id)"
+        " ORDER BY d.created_at DESC, d.id DESC LIMIT 1)",
+        "UPDATE conversations SET"
+        " last_message_preview = (SELECT substr(content, 1, 200) FROM direct_messages WHERE id = conversations.last_message_id),"
+        " last_message_media_type = (SELECT media_type FROM direct_messages WHERE id = conversations.last_message_id),"
+        " last_sender_id = (SELECT sender_id FROM direct_messages WHERE id = conversations.last_message_id)"
+        " WHERE last_message_id IS NOT NULL",
+        "UPDATE conversations SET"
+        " user1_unread = (SELECT COUNT(*) FROM direct_messages WHERE sender_id = conversations.user2_id"
+        " AND receiver_id = conversations.user1_id AND is_read = 0),"
+        " user2_unread = (SELECT COUNT(*) FROM direct_messages WHERE sender_id = conversations.user1_id"
+        " AND receiver_id = conversations.user2_id AND is_read = 0)",
+    ]),
+    ('0005_search_index', [
+        # FTS5 index over posts, strategies, courses and lessons (SQLite only)
+        search_index('create_index'),
+        search_index('rebuild_index'),
+    ]),
+    ('0006_media_variants', [
+        add_column('media_files', 'variants_status', "VARCHAR(20)"),
+        add_column('media_files', 'width', "INTEGER"),
+        add_column('media_files', 'height', "INTEGER"),
+        add_column('media_files', 'thumb_url', "VARCHAR(255)"),
+        add_column('media_files', 'webp_url', "VARCHAR(255)"),
+        # Feed serializers look files up by url
+        "CREATE INDEX IF NOT EXISTS idx_media_url ON media_files (url)",
+        "CREATE INDEX IF NOT EXISTS idx_media_variants_status ON media_files (variants_status)",
+        # Images uploaded before the worker existed get their derivatives on the next sweep
+        "UPDATE media_files SET variants_status = 'pending' WHERE kind = 'image' AND variants_status IS NULL",
+    ]),
+    ('0007_progress_bitmaps', [
+        add_column('lessons', 'ordinal', "INTEGER"),
+        "UPDATE lessons SET ordinal = (SELECT COUNT(*) FROM lessons AS earlier WHERE earlier.id < lessons.id) "
+        "WHERE ordinal IS NULL",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_lesson_ordinal ON lessons (ordinal)",
+        # Bitmaps are built lazily from user_progress on first read
+        add_column('user_xp', 'completed_bits', "BLOB"),
+        add_column('user_xp', 'quiz_passed_bits', "BLOB"),
+    ]),
+    ('0008_xp_event_log', [
+        "CREATE INDEX IF NOT EXISTS idx_xp_event_user ON xp_events (user_id, id)",
+        # XP earned before the log existed becomes one opening event, so totals stay rebuildable
+        "INSERT INTO xp_events (user_id, event_type, xp, created_at)"
+        " SELECT user_id, 'opening_balance', total_xp, CURRENT_TIMESTAMP FROM user_xp WHERE total_xp > 0",
+    ]),
+    ('0009_course_leaderboard', [
+        "CREATE INDEX IF NOT EXISTS idx_course_leaderboard_rank"
+        " ON course_leaderboard (course_id, completed_lessons, avg_score)",
+        # Standings so far; afterwards each completion / quiz refreshes one row
+        "INSERT INTO course_leaderboard (course_id, user_id, completed_lessons, avg_score, updated_at)"
+        " SELECT m.course_id, p.user_id, COUNT(p.id), COALESCE(AVG(p.quiz_score), 0), CURRENT_TIMESTAMP"
+        " FROM user_progress p"
+        " JOIN lessons l ON l.id = p.lesson_id"
+        " JOIN course_modules m ON m.id = l.module_id"
+        " WHERE p.completed = 1"
+        " GROUP BY m.course_id, p.user_id",
+    ]),
+    ('0010_content_import', [
+        add_column('courses', 'content_key', "VARCHAR(100)"),
+        add_column('courses', 'content_hash', "VARCHAR(64)"),
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_course_content_key ON courses (content_key)",
+    ]),
+    ('0011_webinar_capacity', [
+        add_column('webinars', 'registered_count', "INTEGER NOT NULL DEFAULT 0"),
+        "UPDATE webinars SET registered_count ="
+        " (SELECT COUNT(*) FROM webinar_registrations r WHERE r.webinar_id = webinars.id)",
+        "CREATE INDEX IF NOT EXISTS idx_webinar_waitlist_queue ON webinar_waitlist (webinar_id, id)",
+    ]),
+    ('0012_order_reduce_only', [
+        add_column('orders', 'reduce_only', "BOOLEAN DEFAULT 0"),
+        # Bracket legs so far; a lone SL or TP attached to a market fill has neither marker
+        "UPDATE orders SET reduce_only = 1 WHERE parent_id IS NOT NULL OR oco_group IS NOT NULL",
+    ]),
+]
+
+
+def _ensure_migrations_table():
+    db.session.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "name VARCHAR(100) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+    ))
+    db.session.commit()
+
+
+def run_migrations():
+    """Apply every migration not yet recorded. Must run inside an app context."""
+    _ensure_migrations_table()
+    applied = {row[0] for row in db.session.execute(text("SELECT name FROM schema_migrations"))}
+
+    ran = []
+    for name, statements in MIGRATIONS:
+        if name in applied:
+            continue
+        for statement in statements:
+            if callable(statement):
+                statement()
+            else:
+                db.session.execute(text(statement))
+        db.session.execute(
+            text("INSERT INTO schema_migrations (name, applied_at) VALUES (:name, :applied_at)"),
+            {'name': name, 'applied_at': datetime.utcnow()}
+        )
+        db.session.commit()
+        ran.append(name)
+        print(f"[Migrations] Applied {name}")
+
+    return ran
+
+
+if __name__ == '__main__':
+    from flask import Flask
+    from config import Config
+    from database import init_database
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    init_database(app)
+
+    with app.app_context():
+        db.create_all()
+        ran = run_migrations()
+    print(f"Migrations complete ({len(ran)} applied).")
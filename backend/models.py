@@ -1,8 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import RoutingSession
 import json
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -67,6 +70,32 @@ class Trade(db.Model):
 
     __table_args__ = (
         db.Index('idx_trade_challenge', 'challenge_id'),
+        db.Index('idx_trade_challenge_executed', 'challenge_id', 'executed_at'),
+    )
+
+class Order(db.Model):
+    """Resting limit/stop orders, including OCO bracket legs."""
+    __tablename__ = 'orders'
+    id = db.Column(db.Integer, primary_key=True)
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id'), nullable=False)
+    symbol = db.Column(db.String(20), nullable=False)
+    side = db.Column(db.String(10), nullable=False)  # 'buy', 'sell'
+    order_type = db.Column(db.String(10), nullable=False)  # 'limit', 'stop'
+    qty = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Float, nullable=False)  # Limit or stop trigger price
+    status = db.Column(db.String(20), default='open')  # 'pending', 'open', 'filled', 'cancelled'
+    parent_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=True)  # Bracket legs wait for their entry
+    oco_group = db.Column(db.String(32), nullable=True)  # Filling one leg cancels the others
+    reduce_only = db.Column(db.Boolean, default=False)  # SL/TP legs: only ever close the position
+    trade_id = db.Column(db.Integer, db.ForeignKey('trades.id'), nullable=True)
+    fill_price = db.Column(db.Float)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    filled_at = db.Column(db.DateTime)
+    cancelled_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('idx_order_symbol_status', 'symbol', 'status'),
+        db.Index('idx_order_challenge_status', 'challenge_id', 'status'),
     )
 
 class DailyMetric(db.Model):
@@ -82,6 +111,28 @@ class DailyMetric(db.Model):
 
     __table_args__ = (
         db.Index('idx_daily_metric_lookup', 'challenge_id', 'date'),
+        db.Index('idx_daily_metric_date', 'date'),
+    )
+
+class ChallengeStats(db.Model):
+    """Precomputed risk-adjusted metrics and leaderboard rank per challenge."""
+    __tablename__ = 'challenge_stats'
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    trading_days = db.Column(db.Integer, default=0)
+    total_return_pct = db.Column(db.Float)
+    sharpe = db.Column(db.Float)
+    sortino = db.Column(db.Float)
+    max_drawdown_pct = db.Column(db.Float)
+    profit_factor = db.Column(db.Float)
+    consistency_score = db.Column(db.Float)  # 0-100, 100 = profit spread evenly across days
+    score = db.Column(db.Float)  # Composite percentile score used for ranking
+    rank = db.Column(db.Integer)  # 1 = best; NULL = not ranked yet
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_challenge_stats_rank', 'rank'),
+        db.Index('idx_challenge_stats_user', 'user_id'),
     )
 
 class Transaction(db.Model):
@@ -108,6 +159,11 @@ class Strategy(db.Model):
     votes_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('idx_strategy_ranking', 'win_rate', 'votes_count'),
+        db.Index('idx_strategy_user', 'user_id', 'created_at'),
+    )
+
     # Relationship
     author = db.relationship('User', backref='strategies')
 
@@ -121,8 +177,13 @@ class CommunityPost(db.Model):
     media_url = db.Column(db.String(255), nullable=True)
     strategy_id = db.Column(db.Integer, db.ForeignKey('strategies.id'), nullable=True)
     likes_count = db.Column(db.Integer, default=0)
+    comments_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')  # Kept in sync by comment insert/delete events
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('idx_post_tenant_created', 'tenant_id', 'created_at'),
+    )
+
     # Relationships
     author = db.relationship('User', backref='posts')
     comments = db.relationship('CommunityComment', backref='post', cascade="all, delete-orphan")
@@ -137,9 +198,77 @@ class CommunityComment(db.Model):
     media_url = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('idx_comment_post', 'post_id', 'created_at'),
+    )
+
     # Relationships
     author = db.relationship('User', backref='comments')
 
+class PostLike(db.Model):
+    """One row per (post, user); likes_count is the buffered aggregate (services/counters.py)."""
+    __tablename__ = 'community_post_likes'
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('community_posts.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('post_id', 'user_id', name='unique_post_like'),
+    )
+
+class StrategyVote(db.Model):
+    """One row per (strategy, user); votes_count is the buffered aggregate."""
+    __tablename__ = 'strategy_votes'
+    id = db.Column(db.Integer, primary_key=True)
+    strategy_id = db.Column(db.Integer, db.ForeignKey('strategies.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('strategy_id', 'user_id', name='unique_strategy_vote'),
+    )
+
+class MediaFile(db.Model):
+    """One row per distinct uploaded file, keyed by content hash (services/file_service.py)."""
+    __tablename__ = 'media_files'
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # 'image', 'audio'
+    mime_type = db.Column(db.String(50), nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    storage_path = db.Column(db.String(255), nullable=False)  # Relative to static/uploads
+    url = db.Column(db.String(255), nullable=False)
+    upload_count = db.Column(db.Integer, default=1, nullable=False)
+    # Image derivatives (services/media_worker.py); the original url always stays valid
+    variants_status = db.Column(db.String(20), nullable=True)  # 'pending', 'ready', 'failed' (images only)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    thumb_url = db.Column(db.String(255), nullable=True)
+    webp_url = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_media_url', 'url'),
+        db.Index('idx_media_variants_status', 'variants_status'),
+    )
+
+@event.listens_for(CommunityComment, 'after_insert')
+def _increment_comments_count(mapper, connection, comment):
+    connection.execute(
+        CommunityPost.__table__.update()
+        .where(CommunityPost.id == comment.post_id)
+        .values(comments_count=CommunityPost.comments_count + 1)
+    )
+
+@event.listens_for(CommunityComment, 'after_delete')
+def _decrement_comments_count(mapper, connection, comment):
+    connection.execute(
+        CommunityPost.__table__.update()
+        .where(CommunityPost.id == comment.post_id)
+        .values(comments_count=CommunityPost.comments_count - 1)
+    )
+
 class DirectMessage(db.Model):
     __tablename__ = 'direct_messages'
     id = db.Column(db.Integer, primary_key=True)
@@ -151,6 +280,11 @@ class DirectMessage(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('idx_dm_pair_created', 'sender_id', 'receiver_id', 'created_at'),
+        db.Index('idx_dm_receiver_unread', 'receiver_id', 'is_read'),
+    )
+
     # Relationships
     sender = db.relationship('User', foreign_keys=[sender_id], backref='sent_messages')
     receiver = db.relationship('User', foreign_keys=[receiver_id], backref='received_messages')
@@ -162,11 +296,31 @@ class Conversation(db.Model):
     user2_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     last_message_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Inbox summary, maintained by services/dm_service.py
+    last_message_id = db.Column(db.Integer, db.ForeignKey('direct_messages.id'), nullable=True)
+    last_message_preview = db.Column(db.String(200), nullable=True)
+    last_message_media_type = db.Column(db.String(20), nullable=True)
+    last_sender_id = db.Column(db.Integer, nullable=True)
+    user1_unread = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    user2_unread = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+
+    __table_args__ = (
+        db.Index('idx_conversation_user1', 'user1_id', 'user2_id'),
+        db.Index('idx_conversation_user2', 'user2_id', 'user1_id'),
+        db.Index('idx_conversation_user1_recent', 'user1_id', 'last_message_at'),
+        db.Index('idx_conversation_user2_recent', 'user2_id', 'last_message_at'),
+    )
 
     # Relationships
     user1 = db.relationship('User', foreign_keys=[user1_id])
     user2 = db.relationship('User', foreign_keys=[user2_id])
 
+    def other_user(self, user_id):
+        return self.user2 if self.user1_id == user_id else self.user1
+
+    def unread_for(self, user_id):
+        return (self.user1_unread if self.user1_id == user_id else self.user2_unread) or 0
+
 # ==================== ACADEMY MODELS ====================
 
 class Course(db.Model):
@@ -182,7 +336,13 @@ class Course(db.Model):
     xp_reward = db.Column(db.Integer, default=100)
     duration_minutes = db.Column(db.Integer, default=0)
     order_index = db.Column(db.Integer, default=0)
+    content_key = db.Column(db.String(100), nullable=True)  # Stable id in content bundles (services/content_import.py)
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of the bundle entry last imported
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_course_content_key', 'content_key', unique=True),
+    )
     
     # Relationships
     modules = db.relationship('CourseModule', backref='course', cascade='all, delete-orphan', order_by='CourseModule.order_index')
@@ -193,6 +353,18 @@ class Course(db.Model):
     def set_tags(self, tags):
         self.tags_json = json.dumps(tags)
 
+class ContentImport(db.Model):
+    """One applied academy content bundle; re-importing the same content hash is a no-op."""
+    __tablename__ = 'content_imports'
+    id = db.Column(db.Integer, primary_key=True)
+    bundle = db.Column(db.String(100), nullable=False)
+    version = db.Column(db.String(50))
+    content_hash = db.Column(db.String(64), nullable=False, unique=True)
+    courses_created = db.Column(db.Integer, default=0)
+    courses_updated = db.Column(db.Integer, default=0)
+    courses_unchanged = db.Column(db.Integer, default=0)
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class CourseModule(db.Model):
     __tablename__ = 'course_modules'
     id = db.Column(db.Integer, primary_key=True)
@@ -201,6 +373,10 @@ class CourseModule(db.Model):
     description = db.Column(db.Text)
     order_index = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_module_course', 'course_id', 'order_index'),
+    )
     
     # Relationships
     lessons = db.relationship('Lesson', backref='module', cascade='all, delete-orphan', order_by='Lesson.order_index')
@@ -217,7 +393,13 @@ class Lesson(db.Model):
     chapter_markers_json = db.Column(db.Text)  # Video chapter markers
     xp_reward = db.Column(db.Integer, default=50)
     order_index = db.Column(db.Integer, default=0)
+    ordinal = db.Column(db.Integer, nullable=True)  # Dense, never reused: bit position in UserXP progress bitmaps
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_lesson_module', 'module_id', 'order_index'),
+        db.Index('idx_lesson_ordinal', 'ordinal', unique=True),
+    )
     
     # Relationships
     quizzes = db.relationship('LessonQuiz', backref='lesson', cascade='all, delete-orphan')
@@ -235,9 +417,23 @@ class LessonQuiz(db.Model):
     explanation = db.Column(db.Text)
     order_index = db.Column(db.Integer, default=0)
 
+    __table_args__ = (
+        db.Index('idx_quiz_lesson', 'lesson_id'),
+    )
+
     def get_options(self):
         return json.loads(self.options_json) if self.options_json else []
 
+@event.listens_for(Session, 'before_flush')
+def _assign_lesson_ordinals(session, flush_context, instances):
+    new_lessons = [obj for obj in session.new if isinstance(obj, Lesson) and obj.ordinal is None]
+    if not new_lessons:
+        return
+    with session.no_autoflush:
+        next_ordinal = session.query(db.func.coalesce(db.func.max(Lesson.ordinal), -1)).scalar() + 1
+    for offset, lesson in enumerate(new_lessons):
+        lesson.ordinal = next_ordinal + offset
+
 class UserProgress(db.Model):
     __tablename__ = 'user_progress'
     id = db.Column(db.Integer, primary_key=True)
@@ -254,23 +450,55 @@ class UserProgress(db.Model):
     __table_args__ = (
         db.UniqueConstraint('user_id', 'lesson_id', name='unique_user_lesson_progress'),
         db.Index('idx_user_progress_lookup', 'user_id', 'lesson_id'),
+        db.Index('idx_user_progress_completed', 'user_id', 'completed'),
+        db.Index('idx_user_progress_lesson', 'lesson_id', 'completed'),
     )
 
     # Relationships
     user = db.relationship('User', backref='lesson_progress')
     lesson = db.relationship('Lesson', backref='user_progress')
 
+class CourseLeaderboardEntry(db.Model):
+    """Per-course learner standing, refreshed when a lesson is completed or a quiz scored."""
+    __tablename__ = 'course_leaderboard'
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    completed_lessons = db.Column(db.Integer, nullable=False, default=0)
+    avg_score = db.Column(db.Float, nullable=False, default=0)  # Mean quiz_score of the completed lessons
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_course_leaderboard_rank', 'course_id', 'completed_lessons', 'avg_score'),
+    )
+
 class UserXP(db.Model):
     __tablename__ = 'user_xp'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
     total_xp = db.Column(db.Integer, default=0)
     level = db.Column(db.Integer, default=1)
+    # Little-endian bitmaps indexed by Lesson.ordinal (services/progress_bits.py); NULL = not built yet
+    completed_bits = db.Column(db.LargeBinary, nullable=True)
+    quiz_passed_bits = db.Column(db.LargeBinary, nullable=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     user = db.relationship('User', backref='xp_data')
 
+class XPEvent(db.Model):
+    """Append-only log of XP awards; UserXP.total_xp/level are rebuilt from it (services/xp_events.py)."""
+    __tablename__ = 'xp_events'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)  # 'lesson_completed', 'course_certified', ...
+    xp = db.Column(db.Integer, nullable=False, default=0)
+    ref_id = db.Column(db.Integer)  # Lesson / course id the event is about
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_xp_event_user', 'user_id', 'id'),
+    )
+
 class UserBadge(db.Model):
     __tablename__ = 'user_badges'
     id = db.Column(db.Integer, primary_key=True)
@@ -297,11 +525,31 @@ class AIRecommendation(db.Model):
     is_dismissed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('idx_recommendation_user', 'user_id', 'is_dismissed'),
+    )
+
     # Relationships
     user = db.relationship('User', backref='ai_recommendations')
     course = db.relationship('Course', backref='recommendations')
 
 
+class RecommendationState(db.Model):
+    """Watermark of the trades the stored recommendations were computed from."""
+    __tablename__ = 'recommendation_state'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    last_trade_id = db.Column(db.Integer, default=0)  # Highest trade id seen by the last run
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class BatchRun(db.Model):
+    """Last run day of a scheduled batch, shared by every worker process."""
+    __tablename__ = 'batch_runs'
+    name = db.Column(db.String(50), primary_key=True)
+    last_run_on = db.Column(db.Date)  # Claimed with a conditional UPDATE, so one worker runs per day
+    started_at = db.Column(db.DateTime)
+
+
 class CourseEnrollment(db.Model):
     """Track user enrollments in courses."""
     __tablename__ = 'course_enrollments'
@@ -354,11 +602,16 @@ class Webinar(db.Model):
     host_avatar_url = db.Column(db.String(500))
     is_premium = db.Column(db.Boolean, default=False)
     max_attendees = db.Column(db.Integer)
+    registered_count = db.Column(db.Integer, nullable=False, default=0)  # Seats taken, reserved atomically (services/webinar_seats.py)
     meeting_url = db.Column(db.String(500))  # Zoom/Teams link
     replay_url = db.Column(db.String(500))  # After webinar ends
     status = db.Column(db.String(20), default='upcoming')  # upcoming, live, completed, cancelled
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('idx_webinar_schedule', 'status', 'scheduled_at'),
+    )
+
 
 class WebinarRegistration(db.Model):
     """Track user registrations for webinars."""
@@ -372,6 +625,7 @@ class WebinarRegistration(db.Model):
     
     __table_args__ = (
         db.UniqueConstraint('user_id', 'webinar_id', name='unique_user_webinar_registration'),
+        db.Index('idx_webinar_registration_webinar', 'webinar_id'),
     )
     
     # Relationships
@@ -379,6 +633,20 @@ class WebinarRegistration(db.Model):
     webinar = db.relationship('Webinar', backref='registrations')
 
 
+class WebinarWaitlist(db.Model):
+    """Users waiting for a seat in a full webinar, promoted first-in first-out."""
+    __tablename__ = 'webinar_waitlist'
+    id = db.Column(db.Integer, primary_key=True)  # Queue order
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    webinar_id = db.Column(db.Integer, db.ForeignKey('webinars.id'), nullable=False)
+    joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'webinar_id', name='unique_user_webinar_waitlist'),
+        db.Index('idx_webinar_waitlist_queue', 'webinar_id', 'id'),
+    )
+
+
 class UserNote(db.Model):
     """User notes on lessons."""
     __tablename__ = 'user_notes'
@@ -389,6 +657,10 @@ class UserNote(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_note_user_lesson', 'user_id', 'lesson_id'),
+    )
     
     # Relationships
     user = db.relationship('User', backref='lesson_notes')
@@ -108,6 +108,8 @@ def update_lesson_progress(tenant, lesson_id):
     seconds = data.get('video_progress_seconds', 0)
     
     result = update_video_progress(g.user_id, lesson_id, seconds)
+    if 'error' in result:
+        return jsonify(result), 404
     return jsonify(result), 200
 
 
@@ -316,12 +318,14 @@ def get_past_webinars(tenant):
 @academy_bp.route('/<tenant>/academy/webinars/<int:webinar_id>/register', methods=['POST'])
 @token_required
 def register_for_webinar(tenant, webinar_id):
-    """Register for a webinar."""
+    """Register for a webinar (202 + waitlist position when it is full)."""
     from services.academy_service import register_for_webinar as do_register
     
     result = do_register(g.user_id, webinar_id)
     if 'error' in result:
         return jsonify(result), 400
+    if result.get('waitlisted'):
+        return jsonify(result), 202
     
     return jsonify(result), 201
 
@@ -339,6 +343,24 @@ def unregister_from_webinar(tenant, webinar_id):
     return jsonify(result), 200
 
 
+@academy_bp.route('/<tenant>/academy/webinars/<int:webinar_id>/capacity', methods=['PUT'])
+@token_required
+def set_webinar_capacity(tenant, webinar_id):
+    """Change a webinar's seat limit (admin only); waitlisted users fill new seats."""
+    from services.academy_service import set_webinar_capacity as do_set_capacity
+    
+    user = User.query.get(g.user_id)
+    if not user or user.role != 'admin':
+        return jsonify(error='Unauthorized'), 403
+    
+    data = request.get_json() or {}
+    result = do_set_capacity(webinar_id, data.get('max_attendees'))
+    if 'error' in result:
+        return jsonify(result), 400
+    
+    return jsonify(result), 200
+
+
 @academy_bp.route('/<tenant>/academy/me/webinars', methods=['GET'])
 @token_required
 def get_my_webinar_registrations(tenant):
@@ -481,6 +503,18 @@ def get_course_leaderboard(tenant, course_id):
     return jsonify(leaderboard), 200
 
 
+@academy_bp.route('/<tenant>/academy/courses/<int:course_id>/leaderboard/me', methods=['GET'])
+@token_required
+def get_my_course_rank(tenant, course_id):
+    """Get current user's rank on a course leaderboard."""
+    from services.academy_service import get_course_rank
+    
+    rank = get_course_rank(g.user_id, course_id)
+    if not rank:
+        return jsonify(error='Not ranked on this course yet'), 404
+    return jsonify(rank), 200
+
+
 # ==================== SEED DATA ====================
 
 @academy_bp.route('/<tenant>/academy/seed', methods=['POST'])
@@ -1,9 +1,15 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, jsonify, g, Response
+from sqlalchemy.orm import joinedload
 from models import db, CommunityPost, CommunityComment, User, Strategy, DirectMessage, Conversation
 from utils import token_required
 from services.file_service import save_voice_message, save_image
 from services.strategy_service import create_strategy
-from services.feed_manager import get_nexus_feed
+from services.feed_manager import get_nexus_feed, get_feed_page, load_media, serialize_feed_post
+from services import timeline_cache, counters, search_service
+from services.dm_service import (
+    get_inbox, mark_read, record_message, get_thread, wait_for_messages,
+    notify_new_message, serialize_message, PAGE_SIZE
+)
 
 community_bp = Blueprint('community', __name__)
 
@@ -13,36 +19,16 @@ def get_feed(tenant):
     """
     Retrieves the community feed for a specific tenant.
     """
-    page = request.args.get('page', 1, type=int)
-    per_page = 20
-    
-    posts_pagination = CommunityPost.query.filter_by(tenant_id=tenant)\
-        .order_by(CommunityPost.created_at.desc())\
-        .paginate(page=page, per_page=per_page, error_out=False)
-    
-    feed = []
-    for post in posts_pagination.items:
-        feed.append({
-            'id': post.id,
-            'content': post.content,
-            'media_type': post.media_type,
-            'media_url': post.media_url,
-            'likes_count': post.likes_count,
-            'created_at': post.created_at.isoformat(),
-            'author': {
-                'id': post.author.id,
-                'name': post.author.name,
-                'avatar_url': post.author.avatar_url,
-                'role': post.author.role
-            },
-            'comments_count': len(post.comments)
-        })
+    cursor = request.args.get('cursor')
+    posts, next_cursor = get_feed_page(tenant_id=tenant, cursor=cursor)
+    
+    media = load_media(posts)
+    feed = [serialize_feed_post(post, include_strategy=False, media=media) for post in posts]
         
     return jsonify({
         'posts': feed,
-        'has_next': posts_pagination.has_next,
-        'next_page': posts_pagination.next_num if posts_pagination.has_next else None,
-        'total': posts_pagination.total
+        'has_next': next_cursor is not None,
+        'next_cursor': next_cursor
     }), 200
 
 @community_bp.route('/<tenant>/community/posts', methods=['POST'])
@@ -87,6 +73,7 @@ def create_post(tenant):
     
     db.session.add(new_post)
     db.session.commit()
+    timeline_cache.push_post(new_post)
     
     # Return the created post with author info
     return jsonify({
@@ -133,6 +120,7 @@ def add_comment(tenant, post_id):
     
     db.session.add(new_comment)
     db.session.commit()
+    timeline_cache.refresh_post(post_id)
     
     return jsonify({
         'message': 'Comment added successfully',
@@ -145,8 +133,14 @@ def get_nexus(tenant):
     """
     Unified feed for the Community Nexus.
     """
-    page = request.args.get('page', 1, type=int)
-    feed_data = get_nexus_feed(tenant_id=tenant, page=page)
+    cursor = request.args.get('cursor')
+    
+    # Recent pages come pre-serialized from the tenant's timeline ring
+    cached = timeline_cache.get_cached_page(tenant, cursor)
+    if cached is not None:
+        return Response(cached, status=200, mimetype='application/json')
+    
+    feed_data = get_nexus_feed(tenant_id=tenant, cursor=cursor)
     return jsonify(feed_data), 200
 
 @community_bp.route('/<tenant>/community/strategies', methods=['POST'])
@@ -185,6 +179,7 @@ def share_strategy(tenant):
     
     db.session.add(new_post)
     db.session.commit()
+    timeline_cache.push_post(new_post)
     
     return jsonify({
         'message': 'Strategy shared successfully',
@@ -218,34 +213,88 @@ def get_top_strategies(tenant):
         })
     return jsonify(result), 200
 
+@community_bp.route('/<tenant>/community/search', methods=['GET'])
+@token_required
+def search_community(tenant):
+    """
+    Full-text search over the tenant's posts and shared strategies.
+    ?q=<terms>&type=post|strategy (default: both), best matches first.
+    """
+    query = request.args.get('q', '').strip()
+    kinds = [request.args['type']] if request.args.get('type') in ('post', 'strategy') else ['post', 'strategy']
+    if not query:
+        return jsonify({'error': 'Missing search query'}), 400
+
+    if search_service.is_ready():
+        hits = search_service.search(query, kinds, tenant=tenant, limit=40)
+    else:
+        term = f"%{query}%"
+        hits = []
+        if 'post' in kinds:
+            hits += [{'kind': 'post', 'id': pid, 'snippet': None} for (pid,) in db.session.query(CommunityPost.id)
+                     .filter(CommunityPost.tenant_id == tenant, CommunityPost.content.ilike(term)).limit(20)]
+        if 'strategy' in kinds:
+            hits += [{'kind': 'strategy', 'id': sid, 'snippet': None} for (sid,) in db.session.query(Strategy.id)
+                     .filter((Strategy.symbol.ilike(term)) | (Strategy.description.ilike(term))).limit(20)]
+
+    post_ids = [hit['id'] for hit in hits if hit['kind'] == 'post']
+    strategy_ids = [hit['id'] for hit in hits if hit['kind'] == 'strategy']
+    posts = {p.id: p for p in CommunityPost.query.options(
+        joinedload(CommunityPost.author), joinedload(CommunityPost.strategy)
+    ).filter(CommunityPost.id.in_(post_ids)).all()} if post_ids else {}
+    strategies = {s.id: s for s in Strategy.query.options(joinedload(Strategy.author))
+                  .filter(Strategy.id.in_(strategy_ids)).all()} if strategy_ids else {}
+    media = load_media(posts.values())
+
+    results = []
+    for hit in hits:
+        if hit['kind'] == 'post' and hit['id'] in posts:
+            item = serialize_feed_post(posts[hit['id']], media=media)
+        elif hit['kind'] == 'strategy' and hit['id'] in strategies:
+            s = strategies[hit['id']]
+            item = {
+                'id': s.id,
+                'symbol': s.symbol,
+                'description': s.description,
+                'win_rate': s.win_rate,
+                'votes_count': s.votes_count,
+                'author': s.author.name
+            }
+        else:
+            continue
+        item['type'] = hit['kind']
+        item['snippet'] = hit['snippet']
+        results.append(item)
+
+    return jsonify({'query': query, 'results': results}), 200
+
 @community_bp.route('/<tenant>/community/posts/<int:post_id>/like', methods=['POST'])
 @token_required
 def like_post(tenant, post_id):
     """
-    Likes a community post.
+    Likes a community post (once per user). The increment is buffered and
+    flushed in batches by services/counters.py.
     """
     post = CommunityPost.query.get_or_404(post_id)
-    post.likes_count = (post.likes_count or 0) + 1
-    db.session.commit()
+    liked = counters.add('like', post_id, g.user_id)
     
     return jsonify({
-        'message': 'Post liked successfully',
-        'likes_count': post.likes_count
+        'message': 'Post liked successfully' if liked else 'Already liked',
+        'likes_count': (post.likes_count or 0) + counters.pending('like', post_id)
     }), 200
 
 @community_bp.route('/<tenant>/community/strategies/<int:strategy_id>/vote', methods=['POST'])
 @token_required
 def vote_strategy(tenant, strategy_id):
     """
-    Votes for a strategy.
+    Votes for a strategy (once per user).
     """
     strategy = Strategy.query.get_or_404(strategy_id)
-    strategy.votes_count = (strategy.votes_count or 0) + 1
-    db.session.commit()
+    voted = counters.add('vote', strategy_id, g.user_id)
     
     return jsonify({
-        'message': 'Vote recorded successfully',
-        'votes_count': strategy.votes_count
+        'message': 'Vote recorded successfully' if voted else 'Already voted',
+        'votes_count': (strategy.votes_count or 0) + counters.pending('vote', strategy_id)
     }), 200
 
 @community_bp.route('/<tenant>/community/posts/<int:post_id>/comments', methods=['GET'])
@@ -254,9 +303,11 @@ def get_comments(tenant, post_id):
     """
     Retrieves all comments for a specific post.
     """
-    post = CommunityPost.query.get_or_404(post_id)
+    CommunityPost.query.get_or_404(post_id)
     comments = []
-    for comment in post.comments:
+    post_comments = CommunityComment.query.options(joinedload(CommunityComment.author))\
+        .filter_by(post_id=post_id).order_by(CommunityComment.created_at.asc()).all()
+    for comment in post_comments:
         comments.append({
             'id': comment.id,
             'content': comment.content,
@@ -276,86 +327,50 @@ def get_comments(tenant, post_id):
 def get_conversations(tenant):
     """
     Get all conversations for the current user.
+    Served from the summary columns on Conversation (one query).
     """
-    from sqlalchemy import or_
-    
-    conversations = Conversation.query.filter(
-        or_(Conversation.user1_id == g.user_id, Conversation.user2_id == g.user_id)
-    ).order_by(Conversation.last_message_at.desc()).all()
-    
-    result = []
-    for conv in conversations:
-        other_user = conv.user2 if conv.user1_id == g.user_id else conv.user1
-        
-        # Get last message
-        last_msg = DirectMessage.query.filter(
-            or_(
-                (DirectMessage.sender_id == g.user_id) & (DirectMessage.receiver_id == other_user.id),
-                (DirectMessage.sender_id == other_user.id) & (DirectMessage.receiver_id == g.user_id)
-            )
-        ).order_by(DirectMessage.created_at.desc()).first()
-        
-        # Count unread messages
-        unread_count = DirectMessage.query.filter(
-            DirectMessage.sender_id == other_user.id,
-            DirectMessage.receiver_id == g.user_id,
-            DirectMessage.is_read == False
-        ).count()
-        
-        result.append({
-            'id': conv.id,
-            'user': {
-                'id': other_user.id,
-                'name': other_user.name,
-                'avatar_url': other_user.avatar_url
-            },
-            'last_message': {
-                'content': last_msg.content if last_msg else None,
-                'media_type': last_msg.media_type if last_msg else None,
-                'created_at': last_msg.created_at.isoformat() if last_msg else None
-            } if last_msg else None,
-            'unread_count': unread_count,
-            'last_message_at': conv.last_message_at.isoformat()
-        })
-    
-    return jsonify(result), 200
+    return jsonify(get_inbox(g.user_id)), 200
 
 @community_bp.route('/<tenant>/dm/messages/<int:user_id>', methods=['GET'])
 @token_required
 def get_messages(tenant, user_id):
     """
-    Get all messages between current user and specified user.
+    Get messages between current user and specified user, oldest first.
+    
+    Query params (all optional):
+        before: message id - page of older messages (scroll back)
+        after / since: message id - only newer messages (incremental sync)
+        wait: seconds - with since, long-poll until a new message arrives
+        limit: page size (default 50)
+    The X-Has-More header tells whether more messages exist in that direction.
     """
-    from sqlalchemy import or_, and_
-    
-    messages = DirectMessage.query.filter(
-        or_(
-            and_(DirectMessage.sender_id == g.user_id, DirectMessage.receiver_id == user_id),
-            and_(DirectMessage.sender_id == user_id, DirectMessage.receiver_id == g.user_id)
+    before = request.args.get('before', type=int)
+    after = request.args.get('after', type=int)
+    since = request.args.get('since', type=int)
+    wait = request.args.get('wait', 0, type=float)
+    limit = request.args.get('limit', PAGE_SIZE, type=int)
+    
+    if since is not None and wait > 0:
+        messages, has_more = wait_for_messages(g.user_id, user_id, since, wait, limit)
+    else:
+        messages, has_more = get_thread(
+            g.user_id, user_id, before=before,
+            after=since if since is not None else after, limit=limit
         )
-    ).order_by(DirectMessage.created_at.asc()).all()
-    
-    # Mark messages as read
-    DirectMessage.query.filter(
-        DirectMessage.sender_id == user_id,
-        DirectMessage.receiver_id == g.user_id,
-        DirectMessage.is_read == False
-    ).update({'is_read': True})
-    db.session.commit()
     
-    result = []
-    for msg in messages:
-        result.append({
-            'id': msg.id,
-            'content': msg.content,
-            'media_type': msg.media_type,
-            'media_url': msg.media_url,
-            'is_mine': msg.sender_id == g.user_id,
-            'is_read': msg.is_read,
-            'created_at': msg.created_at.isoformat()
-        })
+    result = [serialize_message(msg, g.user_id) for msg in messages]
     
-    return jsonify(result), 200
+    # Mark messages as read (and reset this user's unread counter) - only when needed
+    if any(not msg['is_mine'] and not msg['is_read'] for msg in result):
+        mark_read(g.user_id, user_id)
+        db.session.commit()
+        for msg in result:
+            if not msg['is_mine']:
+                msg['is_read'] = True
+    
+    response = jsonify(result)
+    response.headers['X-Has-More'] = 'true' if has_more else 'false'
+    return response, 200
 
 @community_bp.route('/<tenant>/dm/messages/<int:user_id>', methods=['POST'])
 @token_required
@@ -363,8 +378,6 @@ def send_message(tenant, user_id):
     """
     Send a direct message to a user.
     """
-    from sqlalchemy import or_, and_
-    
     # Check if receiver exists
     receiver = User.query.get(user_id)
     if not receiver:
@@ -400,25 +413,11 @@ def send_message(tenant, user_id):
     )
     db.session.add(new_message)
     
-    # Update or create conversation
-    conversation = Conversation.query.filter(
-        or_(
-            and_(Conversation.user1_id == g.user_id, Conversation.user2_id == user_id),
-            and_(Conversation.user1_id == user_id, Conversation.user2_id == g.user_id)
-        )
-    ).first()
-    
-    if not conversation:
-        conversation = Conversation(
-            user1_id=g.user_id,
-            user2_id=user_id
-        )
-        db.session.add(conversation)
-    
-    from datetime import datetime
-    conversation.last_message_at = datetime.utcnow()
+    # Update or create the conversation summary
+    record_message(new_message)
     
     db.session.commit()
+    notify_new_message(g.user_id, user_id)
     
     return jsonify({
         'message': 'Message sent successfully',
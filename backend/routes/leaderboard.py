@@ -1,29 +1,55 @@
 from flask import Blueprint, jsonify, request, g
+import re
 from models import db, Challenge, User, PayPalSettings
 from sqlalchemy import func
 from routes.challenges import token_required
+from database import read_only
+from services.leaderboard_service import current_period, get_top, get_user_rank
+from services.leaderboard_engine import get_ranked
 
 leaderboard_bp = Blueprint('leaderboard', __name__)
 admin_bp = Blueprint('admin', __name__)
 
+PERIOD_RE = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+
+def _period_arg():
+    """Optional ?period=YYYY-MM, defaults to the current month."""
+    period = request.args.get('period')
+    if period and not PERIOD_RE.match(period):
+        return None, (jsonify(error="period must be YYYY-MM"), 400)
+    if period and period > current_period():
+        return None, (jsonify(error="period cannot be in the future"), 400)
+    return period, None
+
+
 @leaderboard_bp.route('/monthly-top10', methods=['GET'])
+@read_only
 def top10():
-    # Sort by % profit: (equity - start_balance) / start_balance
-    results = db.session.query(
-        User.name, 
-        Challenge.equity, 
-        Challenge.start_balance
-    ).join(Challenge).filter(Challenge.status != 'failed').all()
-    
-    # Calculate performance in python (easier for MVP than complex SQL division)
-    leaderboard = []
-    for name, eq, start in results:
-        pct = ((eq - start) / start) * 100
-        leaderboard.append({'name': name, 'profit_pct': round(pct, 2)})
-    
-    # Sort and take top 10
-    leaderboard.sort(key=lambda x: x['profit_pct'], reverse=True)
-    return jsonify(leaderboard[:10])
+    # Served from the incrementally maintained monthly board (services/leaderboard_service.py)
+    period, error = _period_arg()
+    if error:
+        return error
+    return jsonify(get_top(10, period))
+
+@leaderboard_bp.route('/monthly-rank', methods=['GET'])
+@token_required
+@read_only
+def my_rank():
+    """Current user's best rank on the monthly board."""
+    period, error = _period_arg()
+    if error:
+        return error
+    challenge_ids = [cid for (cid,) in db.session.query(Challenge.id).filter_by(user_id=g.user_id).all()]
+    return jsonify(get_user_rank(g.user_id, challenge_ids, period))
+
+@leaderboard_bp.route('/risk-adjusted', methods=['GET'])
+@read_only
+def risk_adjusted():
+    """Precomputed Sharpe/Sortino/drawdown/profit factor/consistency ranking."""
+    limit = min(request.args.get('limit', 50, type=int), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    return jsonify(get_ranked(limit, offset))
 
 @admin_bp.route('/paypal-settings', methods=['GET', 'PUT'])
 @token_required
@@ -7,8 +7,12 @@ from services.price_cache import get_cached_price
 from services.equity_service import calculate_equity, update_challenge_equity
 from services.watchdog_service import execute_watchdog, get_watchdog_status
 from utils import token_required
+from database import read_only
 from datetime import date, datetime
 from services.challenge_service import check_risk_exposure
+from services.order_book import (
+    place_order, attach_bracket, cancel_flat_brackets, cancel_order, get_open_orders, validate_bracket
+)
 
 trades_bp = Blueprint('trades', __name__)
 
@@ -20,7 +24,7 @@ def place_trade():
     1. Validate Challenge Status
     2. PRE-TRADE Watchdog Check (prevent trading if violation imminent)
     3. Get Price from Cache (<5ms)
-    4. Save Trade
+    4. Save Trade (+ optional OCO stop_loss/take_profit bracket)
     5. POST-TRADE Watchdog Check (auto-fail if limits breached)
     6. Return fresh equity data
     """
@@ -28,7 +32,12 @@ def place_trade():
     challenge_id = data.get('challenge_id')
     symbol = data.get('symbol')
     side = data.get('side')  # buy/sell
-    qty = float(data.get('qty', 0))
+    try:
+        qty = float(data.get('qty', 0))
+        stop_loss = float(data['stop_loss']) if data.get('stop_loss') else None
+        take_profit = float(data['take_profit']) if data.get('take_profit') else None
+    except (TypeError, ValueError):
+        return jsonify(error="Invalid numeric trade field"), 400
     
     print(f"DEBUG: Placing trade for Challenge {challenge_id}, User {g.user_id}, Symbol {symbol}, Qty {qty}")
 
@@ -100,6 +109,10 @@ def place_trade():
     price = float(price)
     print(f"DEBUG: Final execution price for {symbol}: {price}")
 
+    bracket_error = validate_bracket(side, price, stop_loss, take_profit)
+    if bracket_error:
+        return jsonify(error=bracket_error), 400
+
     # Calculate commission
     commission = qty * price * 0.001  # 0.1% spread
     
@@ -113,6 +126,12 @@ def place_trade():
     )
     db.session.add(new_trade)
     db.session.commit()
+
+    # A trade that flattens the position retires its old SL/TP legs
+    cancel_flat_brackets(challenge_id, symbol)
+
+    # Rest the SL/TP legs on the order book so price ticks close the position
+    bracket = attach_bracket(challenge_id, symbol, side, qty, price, stop_loss, take_profit)
     
     # POST-TRADE Watchdog: Check status (warnings only, no auto-fail)
     watchdog_result = get_watchdog_status(challenge_id)
@@ -141,11 +160,13 @@ def place_trade():
         'equity': equity_data,
         'new_equity': equity_data['equity'] if equity_data else challenge.equity,
         'status': challenge.status,
-        'watchdog': watchdog_result
+        'watchdog': watchdog_result,
+        'bracket': bracket.get('bracket', [])
     }), 201
 
 @trades_bp.route('', methods=['GET'])
 @token_required
+@read_only
 def get_trades():
     challenge_id = request.args.get('challenge_id')
     trades = Trade.query.filter_by(challenge_id=challenge_id).order_by(Trade.executed_at.desc()).all()
@@ -159,6 +180,79 @@ def get_trades():
     } for t in trades])
 
 
+# ==================== RESTING ORDERS ====================
+
+@trades_bp.route('/orders', methods=['POST'])
+@token_required
+def create_order():
+    """
+    Rest a limit or stop order on the order book.
+    Optional stop_loss/take_profit attach an OCO bracket once the entry fills.
+    """
+    data = request.get_json()
+    challenge_id = data.get('challenge_id')
+
+    challenge = Challenge.query.get(challenge_id)
+    if not challenge or challenge.user_id != g.user_id:
+        return jsonify(error="Challenge not found"), 404
+
+    if challenge.status not in ('active', 'passed'):
+        return jsonify(error="Challenge is not active"), 400
+
+    try:
+        qty = float(data.get('qty', 0))
+        price = float(data.get('price', 0))
+        stop_loss = float(data['stop_loss']) if data.get('stop_loss') else None
+        take_profit = float(data['take_profit']) if data.get('take_profit') else None
+    except (TypeError, ValueError):
+        return jsonify(error="Invalid numeric order field"), 400
+
+    result = place_order(
+        challenge_id=challenge.id,
+        symbol=data.get('symbol'),
+        side=data.get('side'),
+        order_type=data.get('order_type', 'limit'),
+        qty=qty,
+        price=price,
+        stop_loss=stop_loss,
+        take_profit=take_profit
+    )
+    if 'error' in result:
+        return jsonify(result), 400
+
+    return jsonify(result), 201
+
+
+@trades_bp.route('/orders', methods=['GET'])
+@token_required
+def list_orders():
+    """Get open and pending orders for a challenge."""
+    challenge_id = request.args.get('challenge_id', type=int)
+
+    challenge = Challenge.query.get(challenge_id)
+    if not challenge or challenge.user_id != g.user_id:
+        return jsonify(error="Challenge not found"), 404
+
+    return jsonify(get_open_orders(challenge.id)), 200
+
+
+@trades_bp.route('/orders/<int:order_id>', methods=['DELETE'])
+@token_required
+def delete_order(order_id):
+    """Cancel a resting order (and its pending bracket legs)."""
+    challenge_id = request.args.get('challenge_id', type=int)
+
+    challenge = Challenge.query.get(challenge_id)
+    if not challenge or challenge.user_id != g.user_id:
+        return jsonify(error="Challenge not found"), 404
+
+    result = cancel_order(order_id, challenge.id)
+    if 'error' in result:
+        return jsonify(result), 409 if result['error'] == 'Order is being filled' else 400
+
+    return jsonify(result), 200
+
+
 @trades_bp.route('/validate-account', methods=['POST'])
 @token_required
 def validate_account_status():
@@ -300,6 +394,7 @@ def close_all_trades():
 
 @trades_bp.route('/risk/<int:challenge_id>', methods=['GET'])
 @token_required
+@read_only
 def get_challenge_risk(challenge_id):
     """
     Get the risk sentinel status for a specific challenge.
@@ -314,6 +409,7 @@ def get_challenge_risk(challenge_id):
 
 @trades_bp.route('/equity/<int:challenge_id>', methods=['GET'])
 @token_required
+@read_only
 def get_realtime_equity(challenge_id):
     """
     Get real-time equity calculation using cached prices.
@@ -332,6 +428,7 @@ def get_realtime_equity(challenge_id):
 
 @trades_bp.route('/positions/<int:challenge_id>', methods=['GET'])
 @token_required
+@read_only
 def get_positions(challenge_id):
     """
     Get current open positions for a challenge.
@@ -358,6 +455,7 @@ def get_positions(challenge_id):
 
 @trades_bp.route('/watchdog/<int:challenge_id>', methods=['GET'])
 @token_required
+@read_only
 def get_watchdog(challenge_id):
     """
     Get current watchdog status for a challenge.
@@ -0,0 +1,135 @@
+"""
+Course Catalog Snapshot
+The course -> modules -> lessons tree (with per-course lesson id arrays,
+progress bitmap masks and quiz flags) is loaded in four queries into an in-memory snapshot that is
+never mutated. Any committed write to a course, module, lesson or quiz
+drops it; the next read rebuilds it. Other worker processes pick up the
+change within MAX_AGE. Per-user progress is overlaid on a copy from a single
+UserProgress query.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, Course, CourseModule, Lesson, LessonQuiz
+
+CATALOG_MODELS = (Course, CourseModule, Lesson, LessonQuiz)
+MAX_AGE = 300.0  # Seconds; bounds staleness for writes committed by another process
+
+_lock = threading.Lock()
+_snapshot = None
+_generation = 0  # Bumped on every invalidation; a build started before one is discarded
+
+
+class CatalogSnapshot:
+    """Read-only catalog tree. Callers copy the dicts before adding user fields."""
+    def __init__(self, courses, modules, lessons, quiz_lesson_ids):
+        self.built_at = time.time()
+        self.lessons = {}            # {lesson_id: lesson summary}
+        lessons_by_module = {}
+        for lesson in lessons:
+            self.lessons[lesson.id] = summary = {
+                'id': lesson.id,
+                'title': lesson.title,
+                'description': lesson.description,
+                'duration_minutes': lesson.duration_minutes,
+                'xp_reward': lesson.xp_reward,
+                'has_quiz': lesson.id in quiz_lesson_ids
+            }
+            lessons_by_module.setdefault(lesson.module_id, []).append(summary)
+
+        modules_by_course = {}
+        for module in modules:
+            modules_by_course.setdefault(module.course_id, []).append({
+                'id': module.id,
+                'title': module.title,
+                'description': module.description,
+                'lessons': tuple(lessons_by_module.get(module.id, ()))
+            })
+
+        self.courses = []            # Catalog order
+        self.courses_by_id = {}
+        self.lesson_ids = {}         # {course_id: (lesson_id, ...)} in course order
+        self.lesson_course = {}      # {lesson_id: course_id}
+        self.course_masks = {}       # {course_id: bitmask of lesson ordinals} (progress_bits)
+        self.all_mask = 0
+        ordinals = {lesson.id: lesson.ordinal for lesson in lessons if lesson.ordinal is not None}
+        for course in courses:
+            course_modules = tuple(modules_by_course.get(course.id, ()))
+            lesson_ids = tuple(lesson['id'] for module in course_modules for lesson in module['lessons'])
+            entry = {
+                'id': course.id,
+                'title': course.title,
+                'description': course.description,
+                'thumbnail_url': course.thumbnail_url,
+                'preview_video_url': course.preview_video_url,
+                'difficulty': course.difficulty,
+                'tags': tuple(course.get_tags()),
+                'is_premium': course.is_premium,
+                'xp_reward': course.xp_reward,
+                'duration_minutes': course.duration_minutes,
+                'modules': course_modules
+            }
+            self.courses.append(entry)
+            self.courses_by_id[course.id] = entry
+            self.lesson_ids[course.id] = lesson_ids
+            mask = 0
+            for lesson_id in lesson_ids:
+                self.lesson_course[lesson_id] = course.id
+                if lesson_id in ordinals:
+                    mask |= 1 << ordinals[lesson_id]
+            self.course_masks[course.id] = mask
+            self.all_mask |= mask
+
+
+def _build():
+    courses = Course.query.order_by(Course.order_index).all()
+    modules = CourseModule.query.order_by(CourseModule.course_id, CourseModule.order_index).all()
+    lessons = Lesson.query.order_by(Lesson.module_id, Lesson.order_index).all()
+    quiz_lesson_ids = {row[0] for row in db.session.query(LessonQuiz.lesson_id).distinct()}
+    return CatalogSnapshot(courses, modules, lessons, quiz_lesson_ids)
+
+
+def get_catalog() -> CatalogSnapshot:
+    """Current snapshot, built on first use after an invalidation. Must run inside an app context."""
+    global _snapshot
+    with _lock:
+        snapshot, generation = _snapshot, _generation
+    if snapshot is not None and time.time() - snapshot.built_at < MAX_AGE:
+        return snapshot
+
+    snapshot = _build()
+    with _lock:
+        if generation == _generation:
+            _snapshot = snapshot
+    return snapshot
+
+
+def invalidate():
+    global _snapshot, _generation
+    with _lock:
+        _snapshot = None
+        _generation += 1
+
+
+# Drop the snapshot once a transaction that touched the catalog commits
+@event.listens_for(Session, 'after_flush')
+def _track_catalog_writes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, CATALOG_MODELS):
+            session.info['catalog_dirty'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('catalog_dirty', False):
+        invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_after_rollback(session):
+    session.info.pop('catalog_dirty', None)
@@ -0,0 +1,345 @@
+"""
+Academy Content Import
+Loads courses, modules, lessons and quizzes from a versioned JSON (or YAML)
+bundle with bulk statements in one transaction. Runs as a command, not at app
+start-up:
+    python -m services.content_import [bundle.json]       # default: content/academy.json
+    python -m services.content_import --export out.json   # dump the current catalog as a bundle
+
+Idempotent: a bundle whose SHA-256 is already recorded in content_imports is
+skipped, and each course entry carries its own hash, so a new bundle version
+only writes the courses that changed. Changed courses are updated in place -
+modules and lessons are matched by order_index, so lesson ids (and the user
+progress pointing at them) survive; their quizzes are replaced. Nothing is
+deleted.
+
+Bundle layout:
+    {"bundle": "academy", "version": "1", "courses": [
+        {"key": "...", "title": "...", "tags": [...], "modules": [
+            {"title": "...", "lessons": [
+                {"title": "...", "chapter_markers": [...], "quizzes": [
+                    {"question": "...", "options": [...], "correct_answer_index": 0}]}]}]}]}
+"""
+
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+from sqlalchemy import delete, func, insert, update
+
+from models import db, ContentImport, Course, CourseModule, Lesson, LessonQuiz
+from services import catalog_cache, search_service
+
+try:
+    import yaml
+except ImportError:  # Optional dependency, only needed for .yaml bundles
+    yaml = None
+
+DEFAULT_BUNDLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'content', 'academy.json')
+
+# Bundle field -> default (the model defaults)
+COURSE_FIELDS = {'title': None, 'description': None, 'thumbnail_url': None, 'preview_video_url': None,
+                 'difficulty': 'Beginner', 'is_premium': False, 'xp_reward': 100, 'duration_minutes': 0}
+MODULE_FIELDS = {'title': None, 'description': None}
+LESSON_FIELDS = {'title': None, 'description': None, 'video_url': None, 'duration_minutes': 10,
+                 'content_markdown': None, 'xp_reward': 50}
+QUIZ_FIELDS = {'question': None, 'correct_answer_index': None, 'explanation': None}
+
+
+class BundleError(ValueError):
+    """The bundle is malformed; nothing was written."""
+
+
+def content_hash(value) -> str:
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def slugify(text) -> str:
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+def load_bundle(path):
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise BundleError('YAML bundles require PyYAML (pip install pyyaml)')
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+# ==================== VALIDATION ====================
+
+def _require(entry, field, where):
+    if entry.get(field) in (None, ''):
+        raise BundleError(f"{where}: missing '{field}'")
+
+
+def _validate(bundle):
+    """Check the structure and return the course entries."""
+    if not isinstance(bundle, dict) or not isinstance(bundle.get('courses'), list) or not bundle['courses']:
+        raise BundleError("bundle needs a non-empty 'courses' list")
+
+    keys = set()
+    for c, course in enumerate(bundle['courses']):
+        where = f"courses[{c}]"
+        _require(course, 'title', where)
+        key = course.get('key') or slugify(course['title'])
+        if key in keys:
+            raise BundleError(f"{where}: duplicate key '{key}'")
+        keys.add(key)
+        for m, module in enumerate(course.get('modules', [])):
+            _require(module, 'title', f"{where}.modules[{m}]")
+            for l, lesson in enumerate(module.get('lessons', [])):
+                lesson_where = f"{where}.modules[{m}].lessons[{l}]"
+                _require(lesson, 'title', lesson_where)
+                for q, quiz in enumerate(lesson.get('quizzes', [])):
+                    quiz_where = f"{lesson_where}.quizzes[{q}]"
+                    _require(quiz, 'question', quiz_where)
+                    options = quiz.get('options') or []
+                    if not isinstance(quiz.get('correct_answer_index'), int) \
+                            or not 0 <= quiz['correct_answer_index'] < len(options):
+                        raise BundleError(f"{quiz_where}: correct_answer_index must point into 'options'")
+    return bundle['courses']
+
+
+# ==================== IMPORT ====================
+
+def _values(entry, fields):
+    return {field: entry.get(field, default) for field, default in fields.items()}
+
+
+def _write(model, inserts, updates):
+    """Bulk INSERT ... RETURNING id (in parameter order) and bulk UPDATE by primary key."""
+    ids = []
+    if inserts:
+        ids = db.session.execute(
+            insert(model).returning(model.id, sort_by_parameter_order=True), inserts
+        ).scalars().all()
+    if updates:
+        db.session.execute(update(model), updates)
+    return ids
+
+
+def _place(parents, children_field, model, parent_column, fields, existing, extra=None):
+    """
+    Insert or update the children of each (parent_id, entry) pair, matching
+    existing rows on (parent_id, order_index). Returns [(child_id, child_entry)].
+    """
+    inserts, updates, new_entries, placed = [], [], [], []
+    for parent_id, parent in parents:
+        for position, child in enumerate(parent.get(children_field, []), 1):
+            values = _values(child, fields)
+            values[parent_column] = parent_id
+            values['order_index'] = child.get('order_index', position)
+            if extra:
+                values.update(extra(child))
+            child_id = existing.get((parent_id, values['order_index']))
+            if child_id is None:
+                inserts.append(values)
+                new_entries.append(child)
+            else:
+                values['id'] = child_id
+                updates.append(values)
+                placed.append((child_id, child))
+
+    if model is Lesson and inserts:
+        # Core inserts skip the before_flush listener that assigns bitmap ordinals
+        next_ordinal = db.session.query(func.coalesce(func.max(Lesson.ordinal), -1)).scalar() + 1
+        for offset, values in enumerate(inserts):
+            values['ordinal'] = next_ordinal + offset
+
+    ids = _write(model, inserts, updates)
+    return placed + list(zip(ids, new_entries))
+
+
+def _apply(courses):
+    existing = db.session.query(Course.id, Course.content_key, Course.content_hash, Course.title).all()
+    by_key = {row.content_key: row for row in existing if row.content_key}
+    by_title = {row.title: row for row in existing if not row.content_key}  # Seeded before bundles existed
+
+    inserts, updates, new_entries, placed = [], [], [], []
+    unchanged = 0
+    for position, course in enumerate(courses, 1):
+        key = course.get('key') or slugify(course['title'])
+        course_hash = content_hash(course)
+        row = by_key.get(key) or by_title.get(course['title'])
+        if row is not None and row.content_hash == course_hash:
+            unchanged += 1
+            continue
+
+        values = _values(course, COURSE_FIELDS)
+        values.update(tags_json=json.dumps(course.get('tags', []), ensure_ascii=False),
+                      order_index=course.get('order_index', position),
+                      content_key=key, content_hash=course_hash)
+        if row is None:
+            inserts.append(values)
+            new_entries.append(course)
+        else:
+            values['id'] = row.id
+            updates.append(values)
+            placed.append((row.id, course))
+
+    updated_ids = [course_id for course_id, _ in placed]
+    placed += list(zip(_write(Course, inserts, updates), new_entries))
+
+    # Rows of updated courses that bundle entries may map onto
+    existing_modules, existing_lessons = {}, {}
+    if updated_ids:
+        existing_modules = {
+            (row.course_id, row.order_index): row.id
+            for row in db.session.query(CourseModule.id, CourseModule.course_id, CourseModule.order_index)
+            .filter(CourseModule.course_id.in_(updated_ids))
+        }
+        if existing_modules:
+            existing_lessons = {
+                (row.module_id, row.order_index): row.id
+                for row in db.session.query(Lesson.id, Lesson.module_id, Lesson.order_index)
+                .filter(Lesson.module_id.in_(list(existing_modules.values())))
+            }
+
+    modules = _place(placed, 'modules', CourseModule, 'course_id', MODULE_FIELDS, existing_modules)
+    lessons = _place(modules, 'lessons', Lesson, 'module_id', LESSON_FIELDS, existing_lessons,
+                     extra=lambda lesson: {'chapter_markers_json': json.dumps(lesson['chapter_markers'], ensure_ascii=False)
+                                           if lesson.get('chapter_markers') else None})
+
+    # Quizzes of updated lessons are replaced wholesale
+    existing_lesson_ids = set(existing_lessons.values())
+    reused_lesson_ids = [lesson_id for lesson_id, _ in lessons if lesson_id in existing_lesson_ids]
+    if reused_lesson_ids:
+        db.session.execute(delete(LessonQuiz).where(LessonQuiz.lesson_id.in_(reused_lesson_ids))
+                           .execution_options(synchronize_session=False))
+    quizzes = []
+    for lesson_id, lesson in lessons:
+        for position, quiz in enumerate(lesson.get('quizzes', []), 1):
+            values = _values(quiz, QUIZ_FIELDS)
+            values.update(lesson_id=lesson_id, options_json=json.dumps(quiz['options'], ensure_ascii=False),
+                          order_index=quiz.get('order_index', position))
+            quizzes.append(values)
+    if quizzes:
+        db.session.execute(insert(LessonQuiz), quizzes)
+
+    # Core statements skip the search index hooks
+    course_ids = [course_id for course_id, _ in placed]
+    lesson_ids = [lesson_id for lesson_id, _ in lessons]
+    if course_ids:
+        search_service.index_many('course', Course.query.filter(Course.id.in_(course_ids)).all())
+    if lesson_ids:
+        search_service.index_many('lesson', Lesson.query.filter(Lesson.id.in_(lesson_ids)).all())
+
+    return {
+        'courses_created': len(new_entries),
+        'courses_updated': len(updated_ids),
+        'courses_unchanged': unchanged,
+        'modules': len(modules),
+        'lessons': len(lessons),
+        'quizzes': len(quizzes),
+    }
+
+
+def import_bundle(bundle, name=None):
+    """Apply a bundle (already parsed) in one transaction. Must run inside an app context."""
+    try:
+        courses = _validate(bundle)
+    except BundleError as e:
+        return {'error': str(e)}
+
+    bundle_hash = content_hash(bundle)
+    name = bundle.get('bundle') or name or 'academy'
+    if ContentImport.query.filter_by(content_hash=bundle_hash).first():
+        return {'success': True, 'skipped': True, 'bundle': name, 'content_hash': bundle_hash}
+
+    try:
+        counts = _apply(courses)
+        db.session.add(ContentImport(
+            bundle=name, version=str(bundle.get('version', '')), content_hash=bundle_hash,
+            courses_created=counts['courses_created'], courses_updated=counts['courses_updated'],
+            courses_unchanged=counts['courses_unchanged']
+        ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[ContentImport] Import of {name} failed: {e}")
+        return {'error': str(e)}
+
+    # Core writes bypass the catalog's session hooks
+    catalog_cache.invalidate()
+    print(f"[ContentImport] {name} v{bundle.get('version', '?')}: {counts}")
+    return {'success': True, 'skipped': False, 'bundle': name, 'content_hash': bundle_hash, **counts}
+
+
+def import_file(path=DEFAULT_BUNDLE):
+    try:
+        bundle = load_bundle(path)
+    except (OSError, ValueError) as e:
+        return {'error': f"Cannot read {path}: {e}"}
+    return import_bundle(bundle, name=os.path.splitext(os.path.basename(path))[0])
+
+
+# ==================== EXPORT ====================
+
+def _drop_none(values):
+    return {field: value for field, value in values.items() if value is not None}
+
+
+def export_bundle(name='academy', version='1'):
+    """The current catalog as a bundle (e.g. to edit content by hand and re-import it)."""
+    quizzes_by_lesson = {}
+    for quiz in LessonQuiz.query.order_by(LessonQuiz.lesson_id, LessonQuiz.order_index, LessonQuiz.id):
+        quizzes_by_lesson.setdefault(quiz.lesson_id, []).append(_drop_none({
+            'question': quiz.question,
+            'options': quiz.get_options(),
+            'correct_answer_index': quiz.correct_answer_index,
+            'explanation': quiz.explanation,
+            'order_index': quiz.order_index,
+        }))
+    lessons_by_module = {}
+    for lesson in Lesson.query.order_by(Lesson.module_id, Lesson.order_index, Lesson.id):
+        entry = _drop_none({field: getattr(lesson, field) for field in LESSON_FIELDS})
+        entry.update(order_index=lesson.order_index, chapter_markers=lesson.get_chapter_markers(),
+                     quizzes=quizzes_by_lesson.get(lesson.id, []))
+        lessons_by_module.setdefault(lesson.module_id, []).append(entry)
+    modules_by_course = {}
+    for module in CourseModule.query.order_by(CourseModule.course_id, CourseModule.order_index, CourseModule.id):
+        entry = _drop_none({field: getattr(module, field) for field in MODULE_FIELDS})
+        entry.update(order_index=module.order_index, lessons=lessons_by_module.get(module.id, []))
+        modules_by_course.setdefault(module.course_id, []).append(entry)
+
+    courses = []
+    for course in Course.query.order_by(Course.order_index, Course.id):
+        entry = {'key': course.content_key or slugify(course.title)}
+        entry.update(_drop_none({field: getattr(course, field) for field in COURSE_FIELDS}))
+        entry.update(tags=course.get_tags(), order_index=course.order_index,
+                     modules=modules_by_course.get(course.id, []))
+        courses.append(entry)
+    return {'bundle': name, 'version': version, 'courses': courses}
+
+
+if __name__ == '__main__':
+    import sys
+    from flask import Flask
+    from config import Config
+    from database import init_database
+    from migrations import run_migrations
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    init_database(app)
+
+    args = sys.argv[1:]
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        if args[:1] == ['--export']:
+            bundle = export_bundle()
+            output = json.dumps(bundle, ensure_ascii=False, indent=2)
+            if len(args) > 1:
+                with open(args[1], 'w', encoding='utf-8') as f:
+                    f.write(output + '\n')
+            else:
+                print(output)
+        else:
+            print(import_file(args[0] if args else DEFAULT_BUNDLE))
@@ -0,0 +1,193 @@
+"""
+Like / Vote Counter Service
+Buffers like and vote increments in sharded in-memory counters and flushes
+them as atomic `UPDATE ... SET x = x + n` batches, so clicks never hold the
+write lock or lose increments to a read-modify-write race.
+
+Each user counts once per post/strategy: the sets of users who already
+liked/voted are loaded lazily per target and backed by the
+community_post_likes / strategy_votes tables. Those sets are per process,
+so a flush advances each counter by the membership rows it actually
+inserted; duplicates from other workers are ignored by the table.
+"""
+
+import atexit
+import threading
+
+from sqlalchemy import insert, select, text
+
+from models import db, PostLike, StrategyVote
+
+FLUSH_INTERVAL = 1.0  # Seconds
+SHARDS = 16
+
+# kind -> (membership model, target column, counter UPDATE)
+KINDS = {
+    'like': (PostLike, 'post_id',
+             "UPDATE community_posts SET likes_count = COALESCE(likes_count, 0) + :n WHERE id = :id"),
+    'vote': (StrategyVote, 'strategy_id',
+             "UPDATE strategies SET votes_count = COALESCE(votes_count, 0) + :n WHERE id = :id"),
+}
+
+
+class _Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.deltas = {}    # {(kind, target_id): n}
+        self.members = {}   # {(kind, target_id): set(user_id)} - loaded lazily
+        self.new_rows = []  # [(kind, target_id, user_id)] not yet in the DB
+
+
+_shards = [_Shard() for _ in range(SHARDS)]
+
+_app = None
+_flush_thread = None
+_flush_running = False
+_wake = threading.Event()
+
+
+def _shard_for(kind, target_id) -> _Shard:
+    return _shards[hash((kind, target_id)) % SHARDS]
+
+
+def _load_members(kind, target_id) -> set:
+    model, column, _ = KINDS[kind]
+    rows = db.session.execute(
+        select(model.user_id).where(getattr(model, column) == target_id)
+    ).scalars().all()
+    return set(rows)
+
+
+def add(kind: str, target_id: int, user_id: int) -> bool:
+    """
+    Record a like/vote. Returns False if this user already counted for the target.
+    Must run inside an app context (the first hit on a target loads its members).
+    """
+    key = (kind, target_id)
+    shard = _shard_for(kind, target_id)
+
+    with shard.lock:
+        members = shard.members.get(key)
+    if members is None:
+        loaded = _load_members(kind, target_id)
+        with shard.lock:
+            members = shard.members.setdefault(key, loaded)
+
+    with shard.lock:
+        if user_id in members:
+            return False
+        members.add(user_id)
+        shard.deltas[key] = shard.deltas.get(key, 0) + 1
+        shard.new_rows.append((kind, target_id, user_id))
+
+    if not _flush_running:
+        flush()
+    return True
+
+
+def pending(kind: str, target_id: int) -> int:
+    """Increments not yet flushed; add to the stored count for an up-to-date value."""
+    shard = _shard_for(kind, target_id)
+    with shard.lock:
+        return shard.deltas.get((kind, target_id), 0)
+
+
+def flush():
+    """Write all buffered increments in one transaction. Must run inside an app context."""
+    deltas, new_rows = {}, []
+    for shard in _shards:
+        with shard.lock:
+            if shard.deltas:
+                for key, n in shard.deltas.items():
+                    deltas[key] = deltas.get(key, 0) + n
+                shard.deltas = {}
+            if shard.new_rows:
+                new_rows.extend(shard.new_rows)
+                shard.new_rows = []
+
+    if not deltas and not new_rows:
+        return 0
+
+    try:
+        for kind, (model, column, counter_sql) in KINDS.items():
+            by_target = {}
+            for row_kind, target_id, user_id in new_rows:
+                if row_kind == kind:
+                    by_target.setdefault(target_id, []).append({column: target_id, 'user_id': user_id})
+
+            # Count what the membership table accepted, not the buffered deltas: another
+            # worker may already have written the same (target, user) row.
+            batch = []
+            for target_id, rows in by_target.items():
+                inserted = db.session.execute(
+                    insert(model.__table__).prefix_with('OR IGNORE', dialect='sqlite'), rows
+                ).rowcount
+                if inserted:
+                    batch.append({'id': target_id, 'n': inserted})
+            if batch:
+                db.session.execute(text(counter_sql), batch)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[Counters] Flush failed, re-queueing: {e}")
+        _requeue(deltas, new_rows)
+        return 0
+
+    # Re-serialize liked posts that sit in a timeline ring
+    from services import timeline_cache
+    for kind, target_id in deltas:
+        if kind == 'like':
+            timeline_cache.refresh_post(target_id)
+
+    return len(deltas)
+
+
+def _requeue(deltas, new_rows):
+    for (kind, target_id), n in deltas.items():
+        shard = _shard_for(kind, target_id)
+        with shard.lock:
+            shard.deltas[(kind, target_id)] = shard.deltas.get((kind, target_id), 0) + n
+    for kind, target_id, user_id in new_rows:
+        shard = _shard_for(kind, target_id)
+        with shard.lock:
+            shard.new_rows.append((kind, target_id, user_id))
+
+
+def _flush_loop():
+    print("[Counters] Flush thread started")
+    while _flush_running:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        with _app.app_context():
+            flush()
+    print("[Counters] Flush thread stopped")
+
+
+def start_counters(app):
+    """Start the background flusher and register a final flush on shutdown."""
+    global _app, _flush_thread, _flush_running
+
+    if _flush_running:
+        return
+
+    _app = app
+    _flush_running = True
+    _flush_thread = threading.Thread(target=_flush_loop, daemon=True)
+    _flush_thread.start()
+    atexit.register(stop_counters)
+
+
+def stop_counters():
+    global _flush_running
+
+    if not _flush_running:
+        return
+
+    _flush_running = False
+    _wake.set()
+    if _flush_thread and _flush_thread is not threading.current_thread():
+        _flush_thread.join(timeout=FLUSH_INTERVAL * 2)
+
+    with _app.app_context():
+        written = flush()
+    print(f"[Counters] Final flush wrote {written} counters")
@@ -0,0 +1,110 @@
+"""
+Course Leaderboard
+Materialized per-course standings (completed lessons, average quiz score) in
+course_leaderboard. A learner's row is recomputed from their own UserProgress
+rows whenever they complete a lesson or get a quiz score, so reads are an
+index range scan instead of a GROUP BY over every learner of the course.
+
+Ranking: most completed lessons first, then best average score; learners
+with equal values share a rank.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_
+
+from models import db, CourseLeaderboardEntry, User, UserProgress
+from services.catalog_cache import get_catalog
+
+
+def refresh(user_id, course_id):
+    """Recompute one learner's standing in a course. Caller commits."""
+    lesson_ids = get_catalog().lesson_ids.get(course_id)
+    if not lesson_ids:
+        return None
+
+    completed, avg_score = db.session.query(
+        func.count(UserProgress.id), func.avg(UserProgress.quiz_score)
+    ).filter(
+        UserProgress.user_id == user_id,
+        UserProgress.lesson_id.in_(lesson_ids),
+        UserProgress.completed == True
+    ).one()
+
+    entry = db.session.get(CourseLeaderboardEntry, (course_id, user_id))
+    if not completed:
+        if entry is not None:
+            db.session.delete(entry)
+        return None
+
+    if entry is None:
+        entry = CourseLeaderboardEntry(course_id=course_id, user_id=user_id)
+        db.session.add(entry)
+    entry.completed_lessons = completed
+    entry.avg_score = round(avg_score or 0, 4)
+    entry.updated_at = datetime.utcnow()
+    return entry
+
+
+def refresh_lesson(user_id, lesson_id):
+    """refresh() for the course a lesson belongs to."""
+    course_id = get_catalog().lesson_course.get(lesson_id)
+    return refresh(user_id, course_id) if course_id else None
+
+
+def _ahead_of(course_id, completed, avg_score):
+    """Learners ranked strictly above the given standing."""
+    return db.session.query(func.count()).select_from(CourseLeaderboardEntry).filter(
+        CourseLeaderboardEntry.course_id == course_id,
+        or_(
+            CourseLeaderboardEntry.completed_lessons > completed,
+            and_(CourseLeaderboardEntry.completed_lessons == completed,
+                 CourseLeaderboardEntry.avg_score > avg_score)
+        )
+    ).scalar()
+
+
+def top(course_id, limit=10):
+    """Best learners of a course, with competition ranks (ties share a rank)."""
+    rows = db.session.query(
+        CourseLeaderboardEntry.user_id, User.name, User.avatar_url,
+        CourseLeaderboardEntry.completed_lessons, CourseLeaderboardEntry.avg_score
+    ).join(User, User.id == CourseLeaderboardEntry.user_id).filter(
+        CourseLeaderboardEntry.course_id == course_id
+    ).order_by(
+        CourseLeaderboardEntry.completed_lessons.desc(),
+        CourseLeaderboardEntry.avg_score.desc()
+    ).limit(limit).all()
+
+    result = []
+    previous = None
+    for idx, (user_id, name, avatar_url, completed, avg_score) in enumerate(rows, 1):
+        if previous is None or (completed, avg_score) != previous:
+            rank = idx
+            previous = (completed, avg_score)
+        result.append({
+            'rank': rank,
+            'user_id': user_id,
+            'name': name,
+            'avatar_url': avatar_url,
+            'completed_lessons': completed,
+            'avg_score': round(avg_score or 0, 1)
+        })
+    return result
+
+
+def rank_of(user_id, course_id):
+    """A learner's standing in a course, or None if they have not completed a lesson of it."""
+    entry = db.session.get(CourseLeaderboardEntry, (course_id, user_id))
+    if entry is None:
+        return None
+
+    total = db.session.query(func.count()).select_from(CourseLeaderboardEntry)\
+        .filter(CourseLeaderboardEntry.course_id == course_id).scalar()
+    return {
+        'rank': _ahead_of(course_id, entry.completed_lessons, entry.avg_score) + 1,
+        'total_learners': total,
+        'user_id': user_id,
+        'completed_lessons': entry.completed_lessons,
+        'avg_score': round(entry.avg_score or 0, 1)
+    }
@@ -0,0 +1,193 @@
+"""
+Direct Message Service
+Conversation lookup and the denormalized inbox summary (last message preview
+and per-participant unread counters) kept on Conversation.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+
+from models import db, Conversation, DirectMessage
+
+PREVIEW_LENGTH = 200
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_WAIT = 25.0      # Long-poll cap (seconds)
+RECHECK_EVERY = 5.0  # Re-query while waiting, for messages sent through another worker
+
+_new_message = threading.Condition()
+_pair_versions = {}  # {(low_user_id, high_user_id): messages sent in this process}
+
+
+def find_conversation(user_a, user_b):
+    return Conversation.query.filter(
+        or_(
+            and_(Conversation.user1_id == user_a, Conversation.user2_id == user_b),
+            and_(Conversation.user1_id == user_b, Conversation.user2_id == user_a)
+        )
+    ).first()
+
+
+def record_message(message):
+    """
+    Update (or create) the pair's conversation summary for a new message.
+    The unread counter is incremented in SQL so concurrent sends never lose a count.
+    Caller commits.
+    """
+    db.session.flush()  # Assigns message.id / created_at
+
+    conversation = find_conversation(message.sender_id, message.receiver_id)
+    if not conversation:
+        conversation = Conversation(
+            user1_id=message.sender_id,
+            user2_id=message.receiver_id,
+            user1_unread=0,
+            user2_unread=1
+        )
+        db.session.add(conversation)
+
+    conversation.last_message_at = message.created_at or datetime.utcnow()
+    conversation.last_message_id = message.id
+    conversation.last_message_preview = (message.content or '')[:PREVIEW_LENGTH] or None
+    conversation.last_message_media_type = message.media_type
+    conversation.last_sender_id = message.sender_id
+
+    if conversation.id is None:
+        return conversation
+    if conversation.user1_id == message.receiver_id:
+        conversation.user1_unread = Conversation.user1_unread + 1
+    else:
+        conversation.user2_unread = Conversation.user2_unread + 1
+
+    return conversation
+
+
+def mark_read(reader_id, other_id):
+    """Mark everything other_id sent to reader_id as read and reset the reader's counter. Caller commits."""
+    updated = DirectMessage.query.filter(
+        DirectMessage.sender_id == other_id,
+        DirectMessage.receiver_id == reader_id,
+        DirectMessage.is_read == False
+    ).update({'is_read': True}, synchronize_session=False)
+
+    if updated:
+        Conversation.query.filter(Conversation.user1_id == reader_id, Conversation.user2_id == other_id)\
+            .update({'user1_unread': 0}, synchronize_session=False)
+        Conversation.query.filter(Conversation.user2_id == reader_id, Conversation.user1_id == other_id)\
+            .update({'user2_unread': 0}, synchronize_session=False)
+    return updated
+
+
+def get_inbox(user_id):
+    """All conversations of a user, most recent first, in a single query."""
+    conversations = Conversation.query.options(
+        joinedload(Conversation.user1),
+        joinedload(Conversation.user2)
+    ).filter(
+        or_(Conversation.user1_id == user_id, Conversation.user2_id == user_id)
+    ).order_by(Conversation.last_message_at.desc()).all()
+
+    return [serialize_conversation(conv, user_id) for conv in conversations]
+
+
+def serialize_conversation(conv, user_id):
+    other_user = conv.other_user(user_id)
+    return {
+        'id': conv.id,
+        'user': {
+            'id': other_user.id,
+            'name': other_user.name,
+            'avatar_url': other_user.avatar_url
+        },
+        'last_message': {
+            'content': conv.last_message_preview,
+            'media_type': conv.last_message_media_type,
+            'created_at': conv.last_message_at.isoformat() if conv.last_message_at else None
+        } if conv.last_message_id else None,
+        'unread_count': conv.unread_for(user_id),
+        'last_message_at': conv.last_message_at.isoformat()
+    }
+
+
+# ==================== MESSAGE HISTORY ====================
+
+def _pair_filter(user_a, user_b):
+    return or_(
+        and_(DirectMessage.sender_id == user_a, DirectMessage.receiver_id == user_b),
+        and_(DirectMessage.sender_id == user_b, DirectMessage.receiver_id == user_a)
+    )
+
+
+def get_thread(user_id, other_id, before=None, after=None, limit=PAGE_SIZE):
+    """
+    One page of a conversation in ascending id order.
+    - default: the latest `limit` messages
+    - before:  the `limit` messages older than that id (scrolling up)
+    - after:   the `limit` messages newer than that id (sync)
+    Returns (messages, has_more).
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = DirectMessage.query.filter(_pair_filter(user_id, other_id))
+
+    if after is not None:
+        rows = query.filter(DirectMessage.id > after)\
+            .order_by(DirectMessage.id.asc()).limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit
+
+    if before is not None:
+        query = query.filter(DirectMessage.id < before)
+    rows = query.order_by(DirectMessage.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    return list(reversed(rows[:limit])), has_more
+
+
+def wait_for_messages(user_id, other_id, since, timeout, limit=PAGE_SIZE):
+    """
+    Long-poll: return messages newer than `since`, waiting up to `timeout`
+    seconds for one to arrive. The session is closed while waiting so no
+    connection (or SQLite read snapshot) is held.
+    """
+    deadline = time.time() + max(0.0, min(timeout, MAX_WAIT))
+    pair = _pair_key(user_id, other_id)
+
+    while True:
+        with _new_message:
+            version = _pair_versions.get(pair, 0)
+        messages, has_more = get_thread(user_id, other_id, after=since, limit=limit)
+        remaining = deadline - time.time()
+        if messages or remaining <= 0:
+            return messages, has_more
+        db.session.close()
+        with _new_message:
+            _new_message.wait_for(
+                lambda: _pair_versions.get(pair, 0) != version,
+                timeout=min(remaining, RECHECK_EVERY)
+            )
+
+
+def _pair_key(user_a, user_b):
+    return (user_a, user_b) if user_a < user_b else (user_b, user_a)
+
+
+def notify_new_message(sender_id, receiver_id):
+    """Wake long-polls waiting on this pair (call after commit)."""
+    pair = _pair_key(sender_id, receiver_id)
+    with _new_message:
+        _pair_versions[pair] = _pair_versions.get(pair, 0) + 1
+        _new_message.notify_all()
+
+
+def serialize_message(msg, user_id):
+    return {
+        'id': msg.id,
+        'content': msg.content,
+        'media_type': msg.media_type,
+        'media_url': msg.media_url,
+        'is_mine': msg.sender_id == user_id,
+        'is_read': msg.is_read,
+        'created_at': msg.created_at.isoformat()
+    }
@@ -235,15 +235,25 @@ def calculate_equity(challenge_id: int) -> dict:
 def update_challenge_equity(challenge_id: int) -> float:
     """
     Update challenge equity in database with fresh calculation.
+    The write is queued on the write-behind flusher when it is running,
+    otherwise it is committed immediately.
     Returns the new equity value.
     """
+    from services.write_behind import queue_equity, get_pending_equity
+    from services.leaderboard_service import record_equity
+
     equity_data = calculate_equity(challenge_id)
     if not equity_data:
         return None
     
     challenge = Challenge.query.get(challenge_id)
-    if challenge:
-        challenge.equity = equity_data['equity']
-        db.session.commit()
+    previous = get_pending_equity(challenge_id)
+    record_equity(challenge, equity_data['equity'], previous if previous is not None else challenge.equity)
+    
+    if queue_equity(challenge_id, equity_data['equity']):
+        return equity_data['equity']
+    
+    challenge.equity = equity_data['equity']
+    db.session.commit()
     
     return equity_data['equity']
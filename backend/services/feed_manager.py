@@ -1,45 +1,124 @@
-from models import CommunityPost, Strategy, User
+import base64
+from datetime import datetime
 
-def get_nexus_feed(tenant_id=None, page=1, per_page=20):
-    query = CommunityPost.query
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+
+from models import CommunityPost, MediaFile, Strategy, User
+
+FEED_PAGE_SIZE = 20
+
+
+def encode_cursor(post):
+    """Opaque keyset cursor for the position right after `post`."""
+    raw = f"{post.created_at.isoformat()}|{post.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns (created_at, id), or None for a missing/invalid cursor."""
+    if not cursor:
+        return None
+    try:
+        created_at, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def get_feed_page(tenant_id=None, cursor=None, per_page=FEED_PAGE_SIZE):
+    """
+    One page of posts, newest first, keyed on (created_at, id).
+    Deep pages cost the same as the first one: no COUNT, no OFFSET, and
+    authors/strategies come from the same query.
+    """
+    query = CommunityPost.query.options(
+        joinedload(CommunityPost.author),
+        joinedload(CommunityPost.strategy)
+    )
     if tenant_id:
-        query = query.filter_by(tenant_id=tenant_id)
-    
-    posts_pagination = query.order_by(CommunityPost.created_at.desc())\
-        .paginate(page=page, per_page=per_page, error_out=False)
-    
-    feed = []
-    for post in posts_pagination.items:
-        post_data = {
-            'id': post.id,
-            'content': post.content,
-            'media_type': post.media_type,
-            'media_url': post.media_url,
-            'likes_count': post.likes_count,
-            'created_at': post.created_at.isoformat(),
-            'author': {
-                'id': post.author.id,
-                'name': post.author.name,
-                'avatar_url': post.author.avatar_url,
-                'role': post.author.role
-            },
-            'comments_count': len(post.comments)
+        query = query.filter(CommunityPost.tenant_id == tenant_id)
+
+    position = decode_cursor(cursor)
+    if position:
+        created_at, post_id = position
+        query = query.filter(or_(
+            CommunityPost.created_at < created_at,
+            and_(CommunityPost.created_at == created_at, CommunityPost.id < post_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    posts = query.order_by(CommunityPost.created_at.desc(), CommunityPost.id.desc())\
+        .limit(per_page + 1).all()
+    has_next = len(posts) > per_page
+    posts = posts[:per_page]
+
+    return posts, (encode_cursor(posts[-1]) if has_next else None)
+
+
+def post_media_urls(post):
+    """Uploaded files a feed entry shows: the post's own media and a shared strategy's screenshot."""
+    urls = [post.media_url]
+    if post.strategy_id and post.strategy:
+        urls.append(post.strategy.screenshot_url)
+    return [url for url in urls if url]
+
+
+def load_media(posts):
+    """{url: MediaFile} for every uploaded file shown by these posts, in one query."""
+    urls = {url for post in posts for url in post_media_urls(post)}
+    if not urls:
+        return {}
+    return {m.url: m for m in MediaFile.query.filter(MediaFile.url.in_(urls)).all()}
+
+
+def _variant(media, url, attr):
+    entry = media.get(url) if url else None
+    return getattr(entry, attr) if entry is not None else None
+
+
+def serialize_feed_post(post, include_strategy=True, media=None):
+    """`media` ({url: MediaFile}, see load_media) adds thumbnail/WebP URLs; clients fall back to the originals."""
+    media = media or {}
+    post_data = {
+        'id': post.id,
+        'content': post.content,
+        'media_type': post.media_type,
+        'media_url': post.media_url,
+        'media_thumb_url': _variant(media, post.media_url, 'thumb_url'),
+        'media_webp_url': _variant(media, post.media_url, 'webp_url'),
+        'likes_count': post.likes_count,
+        'created_at': post.created_at.isoformat(),
+        'author': {
+            'id': post.author.id,
+            'name': post.author.name,
+            'avatar_url': post.author.avatar_url,
+            'role': post.author.role
+        },
+        'comments_count': post.comments_count or 0
+    }
+
+    if include_strategy and post.media_type == 'STRATEGY' and post.strategy:
+        post_data['strategy'] = {
+            'id': post.strategy.id,
+            'symbol': post.strategy.symbol,
+            'description': post.strategy.description,
+            'screenshot_url': post.strategy.screenshot_url,
+            'screenshot_thumb_url': _variant(media, post.strategy.screenshot_url, 'thumb_url'),
+            'screenshot_webp_url': _variant(media, post.strategy.screenshot_url, 'webp_url'),
+            'win_rate': post.strategy.win_rate,
+            'config_json': post.strategy.config_json
         }
-        
-        if post.media_type == 'STRATEGY' and post.strategy:
-            post_data['strategy'] = {
-                'id': post.strategy.id,
-                'symbol': post.strategy.symbol,
-                'description': post.strategy.description,
-                'screenshot_url': post.strategy.screenshot_url,
-                'win_rate': post.strategy.win_rate,
-                'config_json': post.strategy.config_json
-            }
-            
-        feed.append(post_data)
-        
+
+    return post_data
+
+
+def get_nexus_feed(tenant_id=None, cursor=None, per_page=FEED_PAGE_SIZE):
+    posts, next_cursor = get_feed_page(tenant_id, cursor, per_page)
+    media = load_media(posts)
+
     return {
-        'posts': feed,
-        'has_next': posts_pagination.has_next,
-        'total': posts_pagination.total
+        'posts': [serialize_feed_post(post, media=media) for post in posts],
+        'has_next': next_cursor is not None,
+        'next_cursor': next_cursor
     }
@@ -1,99 +1,225 @@
+"""
+Media Upload Service
+Uploads are copied to disk in fixed-size chunks while being hashed (SHA-256),
+with size and type limits checked as the bytes arrive. Files are stored
+content-addressed under static/uploads/media/<aa>/<sha256>.<ext>, so the same
+file uploaded twice is stored once, and every distinct file gets a row in the
+media_files table.
+
+send_upload() serves them back with strong ETags, byte ranges and immutable
+caching: a stored file's name is its content (or a random UUID), so a URL
+never changes meaning.
+"""
+
+import hashlib
 import os
+import re
 import uuid
-from werkzeug.utils import secure_filename
+
+from flask import abort, current_app, send_from_directory
+from sqlalchemy.exc import IntegrityError
+
+from models import db, MediaFile
 
 # Configuration
-UPLOAD_FOLDER = os.path.join('static', 'uploads', 'voice_messages')
-ALLOWED_EXTENSIONS = {'mp3', 'wav', 'webm', 'ogg', 'm4a', 'mpeg'}
+UPLOAD_ROOT = os.path.join('static', 'uploads')
+MEDIA_FOLDER = 'media'
+TMP_FOLDER = 'tmp'
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# sha256 (media/) or uuid4 hex (older uploads) names, optionally with a variant suffix
+_IMMUTABLE_NAME = re.compile(r'^[0-9a-f]{32}(?:[0-9a-f]{32})?(?:\.[a-z0-9]+)+$')
+
+MAX_BYTES = {
+    'image': 10 * 1024 * 1024,
+    'audio': 15 * 1024 * 1024,
+}
+
+# Image extensions accepted from the client filename (the stored type comes from the file's magic bytes)
+ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+
+class UploadRejected(Exception):
+    """The upload is too large or not an accepted media type."""
+
+
+def sniff_type(head: bytes):
+    """(kind, mime_type, ext) from the first bytes of a file, or None if unrecognized."""
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image', 'image/png', 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image', 'image/jpeg', 'jpg'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image', 'image/gif', 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image', 'image/webp', 'webp'
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'audio', 'audio/wav', 'wav'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'audio', 'audio/webm', 'webm'
+    if head.startswith(b'OggS'):
+        return 'audio', 'audio/ogg', 'ogg'
+    if head.startswith(b'ID3') or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return 'audio', 'audio/mpeg', 'mp3'
+    if head[4:8] == b'ftyp':
+        return 'audio', 'audio/mp4', 'm4a'
+    return None
+
+
+def _stream_to_disk(file_obj, kind):
+    """
+    Copy the upload to a temp file chunk by chunk, hashing as it goes.
+    Returns (tmp_path, sha256, size, mime_type, ext). Raises UploadRejected.
+    """
+    stream = getattr(file_obj, 'stream', file_obj)
+    limit = MAX_BYTES[kind]
+
+    tmp_dir = os.path.join(os.getcwd(), UPLOAD_ROOT, TMP_FOLDER)
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, f"{uuid.uuid4().hex}.part")
+
+    digest = hashlib.sha256()
+    size = 0
+    detected = None
+    try:
+        with open(tmp_path, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if detected is None:
+                    detected = sniff_type(chunk[:16])
+                    if detected is None or detected[0] != kind:
+                        raise UploadRejected(f"Unsupported {kind} type")
+                size += len(chunk)
+                if size > limit:
+                    raise UploadRejected(f"File exceeds {limit / (1024 * 1024):g} MB limit")
+                digest.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise UploadRejected("Empty file")
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    _, mime_type, ext = detected
+    return tmp_path, digest.hexdigest(), size, mime_type, ext
+
+
+def store_upload(file_obj, kind):
+    """
+    Stream an upload into content-addressed storage and record it in media_files.
+    Returns the MediaFile (an existing one if this content was uploaded before).
+    Raises UploadRejected for oversized or unsupported files.
+    """
+    tmp_path, sha256, size, mime_type, ext = _stream_to_disk(file_obj, kind)
+
+    storage_path = f"{MEDIA_FOLDER}/{sha256[:2]}/{sha256}.{ext}"
+    final_path = os.path.join(os.getcwd(), UPLOAD_ROOT, *storage_path.split('/'))
+    if os.path.exists(final_path):
+        os.remove(tmp_path)  # Duplicate content: already on disk
+    else:
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
+
+    media = MediaFile.query.filter_by(sha256=sha256).first()
+    if media is None:
+        media = MediaFile(
+            sha256=sha256,
+            kind=kind,
+            mime_type=mime_type,
+            size_bytes=size,
+            storage_path=storage_path,
+            url=f"/static/uploads/{storage_path}",
+            variants_status='pending' if kind == 'image' else None
+        )
+        db.session.add(media)
+        try:
+            db.session.commit()
+            if kind == 'image':
+                from services import media_worker
+                media_worker.enqueue(media.id)  # Thumbnail / WebP off the request thread
+            return media
+        except IntegrityError:
+            # Same content committed concurrently by another request
+            db.session.rollback()
+            media = MediaFile.query.filter_by(sha256=sha256).first()
+
+    MediaFile.query.filter_by(id=media.id).update(
+        {'upload_count': MediaFile.upload_count + 1}, synchronize_session=False
+    )
+    db.session.commit()
+    return media
+
+
+def _save(file_obj, kind, label):
+    if not file_obj:
+        return None
+    try:
+        return store_upload(file_obj, kind).url
+    except UploadRejected as e:
+        print(f"[Uploads] Rejected {label}: {e}")
+        return None
+    except OSError as e:
+        print(f"Error saving {label}: {e}")
+        return None
 
-def allowed_file(filename):
-    """Check if file extension is allowed."""
-    if not filename or '.' not in filename:
-        return False
-    return filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def save_voice_message(file_obj, tenant_id=None):
     """
     Saves a voice message file and returns the relative URL.
-    
+
     Args:
         file_obj: The uploaded file object
         tenant_id: Optional tenant ID for multi-tenant support
-        
+
     Returns:
         The URL path to access the file, or None if save failed
     """
-    if not file_obj:
-        return None
-    
-    # Get filename - handle both filename and name attributes
-    filename = getattr(file_obj, 'filename', None) or getattr(file_obj, 'name', None)
-    if not filename or filename == '':
-        # Generate a default filename for blob uploads
-        filename = 'voice_message.webm'
-
-    # Check file extension or default to webm for blob uploads
-    if allowed_file(filename):
-        ext = filename.rsplit('.', 1)[1].lower()
-    else:
-        # Default to webm for browser recordings
-        ext = 'webm'
-    
-    # Generate unique filename using UUID to prevent collisions
-    unique_filename = f"{uuid.uuid4().hex}.{ext}"
-    
-    # Ensure directory exists
-    path = os.path.join(os.getcwd(), UPLOAD_FOLDER)
-    if not os.path.exists(path):
-        os.makedirs(path)
-        
-    file_path = os.path.join(path, unique_filename)
-    
-    try:
-        file_obj.save(file_path)
-        # Return relative URL for static serving
-        return f"/static/uploads/voice_messages/{unique_filename}"
-    except Exception as e:
-        print(f"Error saving voice message: {e}")
-        return None
+    return _save(file_obj, 'audio', 'voice message')
+
 
 def save_image(file_obj, subfolder='images'):
     """
     Saves an image file and returns the relative URL.
-    
+
     Args:
         file_obj: The uploaded file object
-        subfolder: Subfolder within uploads directory
-        
+        subfolder: Kept for callers; storage is content-addressed
+
     Returns:
         The URL path to access the file, or None if save failed
     """
-    if not file_obj:
-        return None
-        
     filename = getattr(file_obj, 'filename', None)
-    if not filename:
-        return None
-    
-    allowed_image_ext = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-    if '.' not in filename:
-        return None
-        
-    ext = filename.rsplit('.', 1)[1].lower()
-    if ext not in allowed_image_ext:
+    if not filename or '.' not in filename:
         return None
-    
-    unique_filename = f"{uuid.uuid4().hex}.{ext}"
-    
-    path = os.path.join(os.getcwd(), 'static', 'uploads', subfolder)
-    if not os.path.exists(path):
-        os.makedirs(path)
-        
-    file_path = os.path.join(path, unique_filename)
-    
-    try:
-        file_obj.save(file_path)
-        return f"/static/uploads/{subfolder}/{unique_filename}"
-    except Exception as e:
-        print(f"Error saving image: {e}")
+    if filename.rsplit('.', 1)[1].lower() not in ALLOWED_IMAGE_EXTENSIONS:
         return None
+    return _save(file_obj, 'image', 'image')
+
+
+def send_upload(filename):
+    """
+    Response for /static/uploads/<filename>. Conditional requests (304),
+    Range requests (audio seeking) and wsgi.file_wrapper / X-Sendfile
+    (USE_X_SENDFILE) come from send_file; immutable names get a strong
+    ETag and a one-year immutable Cache-Control.
+    """
+    if filename.split('/', 1)[0] == TMP_FOLDER:
+        abort(404)
+
+    name = filename.rsplit('/', 1)[-1]
+    immutable = bool(_IMMUTABLE_NAME.match(name))
+    response = send_from_directory(
+        os.path.join(current_app.root_path, UPLOAD_ROOT),
+        filename,
+        conditional=True,
+        etag=name if immutable else True,
+        max_age=IMMUTABLE_MAX_AGE if immutable else None
+    )
+    response.headers.setdefault('Accept-Ranges', 'bytes')
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
@@ -0,0 +1,366 @@
+"""
+Risk-Adjusted Leaderboard Engine
+Computes Sharpe, Sortino, max drawdown, profit factor and consistency per
+challenge from DailyMetric series and trades, stores them in challenge_stats
+and ranks every challenge on a composite score.
+
+- Nightly: full batch over all challenges (vectorized with pandas groupby).
+- Intraday: only challenges with a DailyMetric today are recomputed, then
+  the whole table is re-ranked from the stored metrics.
+
+Manual run:
+    python -m services.leaderboard_engine [--intraday]
+"""
+
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, update
+
+from models import db, Challenge, ChallengeStats, DailyMetric, Trade
+
+TRADING_DAYS_PER_YEAR = 252
+MIN_RANKED_DAYS = 2          # Sharpe/Sortino need at least two daily returns
+INTRADAY_INTERVAL = 15 * 60  # Seconds between intraday refreshes
+
+# Composite score = weighted percentile of each metric across ranked challenges
+SCORE_WEIGHTS = {
+    'sharpe': 0.30,
+    'sortino': 0.20,
+    'max_drawdown_pct': 0.20,   # Lower is better
+    'profit_factor': 0.15,
+    'consistency_score': 0.15,
+}
+
+METRIC_COLUMNS = [
+    'trading_days', 'total_return_pct', 'sharpe', 'sortino',
+    'max_drawdown_pct', 'profit_factor', 'consistency_score',
+]
+
+_engine_thread = None
+_engine_running = False
+_last_full_batch = None
+
+
+# ==================== DATA LOADING ====================
+
+def _load_frames(challenge_ids=None):
+    """Challenges, their daily metrics and their trades as DataFrames."""
+    challenge_query = db.session.query(
+        Challenge.id.label('challenge_id'), Challenge.user_id, Challenge.start_balance,
+        Challenge.equity, Challenge.status
+    )
+    daily_query = db.session.query(
+        DailyMetric.challenge_id, DailyMetric.date, DailyMetric.day_start_equity,
+        DailyMetric.day_end_equity, DailyMetric.max_intraday_drawdown_pct
+    )
+    trade_query = db.session.query(
+        Trade.challenge_id, Trade.symbol, Trade.side, Trade.qty, Trade.price, Trade.executed_at
+    )
+    if challenge_ids is not None:
+        challenge_query = challenge_query.filter(Challenge.id.in_(challenge_ids))
+        daily_query = daily_query.filter(DailyMetric.challenge_id.in_(challenge_ids))
+        trade_query = trade_query.filter(Trade.challenge_id.in_(challenge_ids))
+
+    challenges = pd.DataFrame(challenge_query.all(),
+                              columns=['challenge_id', 'user_id', 'start_balance', 'equity', 'status'])
+    daily = pd.DataFrame(daily_query.all(),
+                         columns=['challenge_id', 'date', 'day_start_equity', 'day_end_equity',
+                                  'max_intraday_drawdown_pct'])
+    trades = pd.DataFrame(trade_query.order_by(Trade.challenge_id, Trade.executed_at, Trade.id).all(),
+                          columns=['challenge_id', 'symbol', 'side', 'qty', 'price', 'executed_at'])
+    return challenges, daily, trades
+
+
+# ==================== METRICS ====================
+
+def _closed_trade_pnls(trades: pd.DataFrame) -> pd.DataFrame:
+    """
+    Gross profit and gross loss of closed trades per challenge (average-cost
+    replay, same rules as equity_service.calculate_realized_pnl). Position
+    replay is path dependent, so this is one linear pass rather than vectorized.
+    """
+    totals = {}
+    positions = {}
+
+    for challenge_id, symbol, side, qty, price in trades[
+        ['challenge_id', 'symbol', 'side', 'qty', 'price']
+    ].itertuples(index=False):
+        pos = positions.setdefault((challenge_id, symbol), [0.0, 0.0])  # [qty, avg_entry]
+        total = totals.setdefault(challenge_id, [0.0, 0.0])              # [gross_profit, gross_loss]
+        signed_qty = qty if side == 'buy' else -qty
+
+        if pos[0] != 0 and (pos[0] > 0) != (signed_qty > 0):
+            close_qty = min(abs(signed_qty), abs(pos[0]))
+            pnl = (price - pos[1]) * close_qty if pos[0] > 0 else (pos[1] - price) * close_qty
+            if pnl >= 0:
+                total[0] += pnl
+            else:
+                total[1] -= pnl
+
+            remaining = pos[0] + signed_qty
+            if abs(remaining) < 0.000001:
+                pos[0], pos[1] = 0.0, 0.0
+            elif (remaining > 0) != (pos[0] > 0):
+                pos[0], pos[1] = remaining, price  # Flipped: the rest opens at this price
+            else:
+                pos[0] = remaining
+        else:
+            new_qty = pos[0] + signed_qty
+            pos[1] = abs((pos[0] * pos[1] + signed_qty * price) / new_qty) if new_qty else 0.0
+            pos[0] = new_qty
+
+    return pd.DataFrame.from_dict(
+        totals, orient='index', columns=['gross_profit', 'gross_loss']
+    ).rename_axis('challenge_id')
+
+
+def compute_metrics(challenges: pd.DataFrame, daily: pd.DataFrame, trades: pd.DataFrame) -> pd.DataFrame:
+    """Risk-adjusted metrics for every challenge in the frames, indexed by challenge_id."""
+    stats = challenges.set_index('challenge_id')[['user_id', 'start_balance', 'equity', 'status']].copy()
+    stats['total_return_pct'] = (stats['equity'] - stats['start_balance']) / stats['start_balance'] * 100
+
+    if daily.empty:
+        for column in METRIC_COLUMNS:
+            if column not in stats:
+                stats[column] = np.nan
+        stats['trading_days'] = 0
+    else:
+        daily = daily.merge(stats[['start_balance', 'equity']], left_on='challenge_id', right_index=True)
+        daily = daily.sort_values(['challenge_id', 'date'])
+        # Today's row is only closed by the write-behind flush; fall back to live equity
+        daily['day_end_equity'] = daily['day_end_equity'].fillna(daily['equity'])
+        daily['ret'] = (daily['day_end_equity'] - daily['day_start_equity']) / daily['day_start_equity']
+        daily['pnl'] = daily['day_end_equity'] - daily['day_start_equity']
+        daily['downside'] = daily['ret'].clip(upper=0)
+
+        # Equity curve drawdown, seeded with the starting balance
+        peak = daily.groupby('challenge_id')['day_end_equity'].cummax()
+        peak = np.maximum(peak, daily['start_balance'])
+        daily['drawdown_pct'] = (peak - daily['day_end_equity']) / peak * 100
+
+        grouped = daily.groupby('challenge_id')
+        mean = grouped['ret'].mean()
+        std = grouped['ret'].std()
+        downside_dev = np.sqrt((daily['downside'] ** 2).groupby(daily['challenge_id']).mean())
+        annualize = np.sqrt(TRADING_DAYS_PER_YEAR)
+
+        stats['trading_days'] = grouped.size()
+        stats['sharpe'] = (mean / std.replace(0, np.nan)) * annualize
+        stats['sortino'] = (mean / downside_dev.replace(0, np.nan)) * annualize
+        stats['max_drawdown_pct'] = np.maximum(
+            grouped['drawdown_pct'].max(), grouped['max_intraday_drawdown_pct'].max().fillna(0)
+        )
+
+        # Consistency: 100 when no single day dominates the positive PnL
+        positive = daily['pnl'].clip(lower=0).groupby(daily['challenge_id'])
+        best_day, total_positive = positive.max(), positive.sum()
+        stats['consistency_score'] = (1 - best_day / total_positive.replace(0, np.nan)) * 100
+
+        stats['trading_days'] = stats['trading_days'].fillna(0).astype(int)
+
+    # Profit factor: gross profit / gross loss of closed trades
+    pnls = _closed_trade_pnls(trades) if not trades.empty else pd.DataFrame(
+        columns=['gross_profit', 'gross_loss'])
+    stats = stats.join(pnls)
+    stats['profit_factor'] = stats['gross_profit'] / stats['gross_loss'].replace(0, np.nan)
+    stats.loc[(stats['gross_loss'] == 0) & (stats['gross_profit'] > 0), 'profit_factor'] = np.inf
+
+    return stats.drop(columns=['gross_profit', 'gross_loss'])
+
+
+def rank_stats(stats: pd.DataFrame) -> pd.DataFrame:
+    """Composite score and rank; failed or too-young challenges are left unranked."""
+    stats = stats.copy()
+    eligible = (stats['status'] != 'failed') & (stats['trading_days'] >= MIN_RANKED_DAYS)
+    ranked = stats[eligible]
+
+    score = pd.Series(0.0, index=ranked.index)
+    for column, weight in SCORE_WEIGHTS.items():
+        ascending = column != 'max_drawdown_pct'
+        values = ranked[column].replace([np.inf, -np.inf], [1e9, -1e9])
+        score += values.rank(pct=True, ascending=ascending).fillna(0) * weight
+
+    stats['score'] = np.nan
+    stats['rank'] = np.nan
+    stats.loc[ranked.index, 'score'] = (score * 100).round(2)
+    order = stats.loc[ranked.index].sort_values(
+        ['score', 'total_return_pct'], ascending=False
+    ).index
+    stats.loc[order, 'rank'] = np.arange(1, len(order) + 1)
+    return stats
+
+
+# ==================== PERSISTENCE ====================
+
+def _clean(value):
+    """NaN -> None and inf -> a large finite number, so rows fit in the DB."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, float) and np.isinf(value):
+        return 999.0 if value > 0 else -999.0
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (np.floating,)):
+        return _clean(float(value))
+    return round(value, 4) if isinstance(value, float) else value
+
+
+def _save_metrics(stats: pd.DataFrame):
+    """Upsert the metric columns (not the ranks) for the given challenges."""
+    if stats.empty:
+        return
+    now = datetime.utcnow()
+    existing = {
+        cid for (cid,) in db.session.query(ChallengeStats.challenge_id).filter(
+            ChallengeStats.challenge_id.in_([int(cid) for cid in stats.index])
+        )
+    }
+    updates, inserts = [], []
+    for challenge_id, row in stats.iterrows():
+        values = {column: _clean(row[column]) for column in METRIC_COLUMNS}
+        values.update(challenge_id=int(challenge_id), user_id=int(row['user_id']), computed_at=now)
+        (updates if challenge_id in existing else inserts).append(values)
+
+    if updates:
+        db.session.execute(update(ChallengeStats), updates)
+    if inserts:
+        db.session.execute(insert(ChallengeStats), inserts)
+
+
+def rerank():
+    """Recompute score/rank for the whole table from the stored metrics."""
+    rows = db.session.query(
+        ChallengeStats.challenge_id, ChallengeStats.user_id, Challenge.status,
+        *[getattr(ChallengeStats, column) for column in METRIC_COLUMNS]
+    ).join(Challenge, Challenge.id == ChallengeStats.challenge_id).all()
+    if not rows:
+        return 0
+
+    stats = pd.DataFrame(rows, columns=['challenge_id', 'user_id', 'status'] + METRIC_COLUMNS)
+    stats = stats.set_index('challenge_id')
+    stats['profit_factor'] = stats['profit_factor'].astype(float)
+    stats = rank_stats(stats)
+
+    db.session.execute(update(ChallengeStats), [
+        {'challenge_id': int(cid), 'score': _clean(row['score']), 'rank': _clean(row['rank'])}
+        for cid, row in stats.iterrows()
+    ])
+    return int(stats['rank'].notna().sum())
+
+
+def run_full_batch():
+    """Nightly: recompute every challenge and re-rank. Must run inside an app context."""
+    global _last_full_batch
+    try:
+        stats = compute_metrics(*_load_frames())
+        _save_metrics(stats)
+        ranked = rerank()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[LeaderboardEngine] Full batch failed: {e}")
+        return {'error': str(e)}
+
+    _last_full_batch = date.today()
+    print(f"[LeaderboardEngine] Full batch: {len(stats)} challenges, {ranked} ranked")
+    return {'success': True, 'computed': len(stats), 'ranked': ranked}
+
+
+def refresh_intraday():
+    """Recompute challenges that traded today, then re-rank everyone from stored metrics."""
+    active_ids = [
+        cid for (cid,) in db.session.query(DailyMetric.challenge_id).filter(
+            DailyMetric.date == date.today()
+        ).distinct()
+    ]
+    if not active_ids:
+        return {'success': True, 'computed': 0, 'ranked': 0}
+
+    try:
+        stats = compute_metrics(*_load_frames(active_ids))
+        _save_metrics(stats)
+        ranked = rerank()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[LeaderboardEngine] Intraday refresh failed: {e}")
+        return {'error': str(e)}
+
+    return {'success': True, 'computed': len(stats), 'ranked': ranked}
+
+
+def get_ranked(limit: int = 50, offset: int = 0) -> list:
+    """Precomputed leaderboard rows, best rank first."""
+    from models import User
+
+    rows = db.session.query(ChallengeStats, User.name, User.avatar_url)\
+        .join(User, User.id == ChallengeStats.user_id)\
+        .filter(ChallengeStats.rank.isnot(None))\
+        .order_by(ChallengeStats.rank.asc())\
+        .offset(offset).limit(limit).all()
+
+    return [{
+        'rank': stats.rank,
+        'challenge_id': stats.challenge_id,
+        'user': {'id': stats.user_id, 'name': name, 'avatar_url': avatar_url},
+        'score': stats.score,
+        'sharpe': stats.sharpe,
+        'sortino': stats.sortino,
+        'max_drawdown_pct': stats.max_drawdown_pct,
+        'profit_factor': stats.profit_factor,
+        'consistency_score': stats.consistency_score,
+        'total_return_pct': stats.total_return_pct,
+        'trading_days': stats.trading_days,
+        'computed_at': stats.computed_at.isoformat() if stats.computed_at else None,
+    } for stats, name, avatar_url in rows]
+
+
+# ==================== SCHEDULER ====================
+
+def _engine_loop(app):
+    """Full batch once per day (first run after midnight), intraday refresh in between."""
+    print("[LeaderboardEngine] Scheduler started")
+    while _engine_running:
+        with app.app_context():
+            if _last_full_batch != date.today():
+                run_full_batch()
+            else:
+                refresh_intraday()
+        time.sleep(INTRADAY_INTERVAL)
+
+
+def start_leaderboard_engine(app):
+    """Start the background batch/refresh thread."""
+    global _engine_thread, _engine_running
+
+    if _engine_running:
+        return
+
+    _engine_running = True
+    _engine_thread = threading.Thread(target=_engine_loop, args=(app,), daemon=True)
+    _engine_thread.start()
+
+
+def stop_leaderboard_engine():
+    global _engine_running
+    _engine_running = False
+
+
+if __name__ == '__main__':
+    import sys
+    from flask import Flask
+    from config import Config
+    from database import init_database
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    init_database(app)
+
+    with app.app_context():
+        db.create_all()
+        result = refresh_intraday() if '--intraday' in sys.argv else run_full_batch()
+    print(result)
@@ -0,0 +1,206 @@
+"""
+Monthly Leaderboard Service
+In-memory sorted leaderboard per calendar month, updated incrementally from
+update_challenge_equity() instead of re-ranking every challenge per request.
+
+A challenge enters a month's board the first time its equity is updated (or
+it has a DailyMetric) in that month. Its monthly return is measured from the
+equity it started the month with.
+
+Each worker process keeps its own boards and only sees its own updates
+incrementally, so a board is rebuilt from the database once it is older than
+MAX_AGE_SECONDS; other workers' trades show up within that window.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import date
+
+from models import db, Challenge, DailyMetric, User
+
+KEEP_PERIODS = 2  # Current and previous month
+MAX_AGE_SECONDS = 60
+
+_lock = threading.Lock()
+_boards = {}  # {'YYYY-MM': PeriodBoard}
+
+
+def current_period() -> str:
+    return date.today().strftime('%Y-%m')
+
+
+class PeriodBoard:
+    """
+    Challenges of one month kept sorted by profit_pct (descending).
+    Rank lookups are a binary search; top-K is a slice.
+    """
+    def __init__(self, period: str):
+        self.period = period
+        self.loaded_at = time.monotonic()
+        self._sorted = []   # [(-profit_pct, challenge_id)]
+        self._entries = {}  # {challenge_id: {'user_id', 'month_start_equity', 'equity', 'profit_pct'}}
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def get(self, challenge_id: int):
+        return self._entries.get(challenge_id)
+
+    def upsert(self, challenge_id: int, user_id: int, month_start_equity: float, equity: float):
+        self.remove(challenge_id)
+        profit_pct = ((equity - month_start_equity) / month_start_equity * 100) if month_start_equity else 0
+        profit_pct = round(profit_pct, 2)
+        self._entries[challenge_id] = {
+            'user_id': user_id,
+            'month_start_equity': month_start_equity,
+            'equity': equity,
+            'profit_pct': profit_pct,
+        }
+        insort(self._sorted, (-profit_pct, challenge_id))
+
+    def remove(self, challenge_id: int):
+        entry = self._entries.pop(challenge_id, None)
+        if entry is None:
+            return
+        key = (-entry['profit_pct'], challenge_id)
+        index = bisect_left(self._sorted, key)
+        if index < len(self._sorted) and self._sorted[index] == key:
+            del self._sorted[index]
+
+    def rank(self, challenge_id: int):
+        """1-based rank, or None if the challenge is not on this board."""
+        entry = self._entries.get(challenge_id)
+        if entry is None:
+            return None
+        return bisect_left(self._sorted, (-entry['profit_pct'], challenge_id)) + 1
+
+    def top(self, k: int = 10) -> list:
+        return [(cid, self._entries[cid]) for _, cid in self._sorted[:k]]
+
+
+def _load_period(period: str) -> PeriodBoard:
+    """
+    Build a board from the DailyMetric rows of that month: the first row is the
+    month start. The current month ends at the live equity, a past month at its
+    last recorded day_end_equity.
+    """
+    board = PeriodBoard(period)
+    year, month = (int(part) for part in period.split('-'))
+    month_start = date(year, month, 1)
+    month_end = date(year + (month == 12), month % 12 + 1, 1)
+    is_current = period == current_period()
+
+    rows = db.session.query(
+        Challenge.id, Challenge.user_id, Challenge.equity,
+        DailyMetric.day_start_equity, DailyMetric.day_end_equity
+    ).join(DailyMetric, DailyMetric.challenge_id == Challenge.id).filter(
+        Challenge.status != 'failed',
+        DailyMetric.date >= month_start,
+        DailyMetric.date < month_end
+    ).order_by(DailyMetric.date.asc()).all()
+
+    starts = {}  # {challenge_id: (user_id, month_start_equity)}
+    ends = {}    # {challenge_id: equity at the end of the period}
+    for challenge_id, user_id, equity, day_start_equity, day_end_equity in rows:
+        starts.setdefault(challenge_id, (user_id, day_start_equity))
+        if is_current:
+            ends[challenge_id] = equity
+        else:  # Rows are in date order: the last one wins
+            ends[challenge_id] = day_end_equity if day_end_equity is not None else day_start_equity
+
+    for challenge_id, (user_id, start_equity) in starts.items():
+        board.upsert(challenge_id, user_id, start_equity, ends[challenge_id])
+
+    return board
+
+
+def get_board(period: str = None) -> PeriodBoard:
+    """
+    Board for a period, loaded from the database on first access and rebuilt
+    once older than MAX_AGE_SECONDS. Needs an app context.
+    """
+    period = period or current_period()
+    with _lock:
+        board = _boards.get(period)
+    if board is not None and time.monotonic() - board.loaded_at < MAX_AGE_SECONDS:
+        return board
+
+    # Loaded outside the lock so record_equity() never waits on a month's query
+    loaded = _load_period(period)
+    with _lock:
+        # Keep a board another thread swapped in meanwhile; replace a missing or stale one
+        if _boards.get(period) is board:
+            _boards[period] = loaded
+        board = _boards[period]
+        # The current month is never evicted; older boards are reloaded on demand
+        current = current_period()
+        others = sorted(p for p in _boards if p != current)
+        for old in others[:len(others) - (KEEP_PERIODS - 1)]:
+            del _boards[old]
+        return board
+
+
+def record_equity(challenge, equity: float, previous_equity: float = None):
+    """
+    Incrementally move a challenge on the current month's board.
+    previous_equity is the equity before this update; it becomes the month
+    start when the challenge is seen for the first time this month.
+    """
+    board = get_board()
+    with _lock:
+        if challenge.status == 'failed':
+            board.remove(challenge.id)
+            return
+
+        entry = board.get(challenge.id)
+        if entry:
+            month_start = entry['month_start_equity']
+        else:
+            month_start = previous_equity if previous_equity is not None else challenge.equity
+        board.upsert(challenge.id, challenge.user_id, month_start, equity)
+
+
+def remove_challenge(challenge_id: int):
+    """Drop a challenge from every loaded board (e.g. when it fails)."""
+    with _lock:
+        for board in _boards.values():
+            board.remove(challenge_id)
+
+
+def get_top(k: int = 10, period: str = None) -> list:
+    board = get_board(period)
+    with _lock:
+        top = board.top(k)
+
+    names = dict(
+        db.session.query(User.id, User.name).filter(
+            User.id.in_({entry['user_id'] for _, entry in top})
+        ).all()
+    ) if top else {}
+
+    return [
+        {'name': names.get(entry['user_id']), 'profit_pct': entry['profit_pct']}
+        for _, entry in top
+    ]
+
+
+def get_user_rank(user_id: int, challenge_ids, period: str = None):
+    """Best rank among the user's challenges on the board, or None if unranked."""
+    board = get_board(period)
+    with _lock:
+        ranked = [
+            (board.rank(cid), cid) for cid in challenge_ids
+            if board.get(cid) and board.get(cid)['user_id'] == user_id
+        ]
+        if not ranked:
+            return {'period': board.period, 'rank': None, 'total': len(board)}
+
+        rank, challenge_id = min(ranked)
+        return {
+            'period': board.period,
+            'rank': rank,
+            'total': len(board),
+            'challenge_id': challenge_id,
+            'profit_pct': board.get(challenge_id)['profit_pct'],
+        }
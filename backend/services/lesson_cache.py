@@ -0,0 +1,97 @@
+"""
+Lesson Payload Cache
+The static part of a lesson response (quiz without answers, chapter markers,
+course/module breadcrumb, markdown pre-rendered to HTML) is serialized once
+per lesson and shared by every request. Payloads are versioned by the catalog
+snapshot: any committed course/module/lesson/quiz edit replaces the snapshot
+(see catalog_cache), which drops them all. Per-user progress is merged into a
+copy at request time.
+
+Markdown rendering needs the 'markdown' package - without it content_html is
+None and clients fall back to content_markdown.
+"""
+
+import json
+import threading
+
+from models import db, Lesson, LessonQuiz
+from services.catalog_cache import get_catalog
+
+try:
+    import markdown
+except ImportError:  # Optional dependency
+    markdown = None
+
+MARKDOWN_EXTENSIONS = ['extra', 'sane_lists']
+
+_lock = threading.Lock()
+_catalog = None   # Snapshot the cached payloads were built against
+_payloads = {}    # {lesson_id: payload}
+
+
+def render_markdown(text):
+    if not text or markdown is None:
+        return None
+    return markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+
+
+def _breadcrumb(catalog, lesson_id):
+    course = catalog.courses_by_id.get(catalog.lesson_course.get(lesson_id))
+    if course is None:
+        return None, None
+    for module in course['modules']:
+        if any(lesson['id'] == lesson_id for lesson in module['lessons']):
+            return {'id': course['id'], 'title': course['title']}, {'id': module['id'], 'title': module['title']}
+    return {'id': course['id'], 'title': course['title']}, None
+
+
+def _build(catalog, lesson_id):
+    lesson = db.session.get(Lesson, lesson_id)
+    if lesson is None:
+        return None
+    quizzes = LessonQuiz.query.filter_by(lesson_id=lesson_id)\
+        .order_by(LessonQuiz.order_index, LessonQuiz.id).all()
+    course, module = _breadcrumb(catalog, lesson_id)
+
+    return {
+        'id': lesson.id,
+        'title': lesson.title,
+        'description': lesson.description,
+        'video_url': lesson.video_url,
+        'duration_minutes': lesson.duration_minutes,
+        'content_markdown': lesson.content_markdown,
+        'content_html': render_markdown(lesson.content_markdown),
+        'chapter_markers': lesson.get_chapter_markers(),
+        'xp_reward': lesson.xp_reward,
+        # Don't send correct answer to frontend
+        'quiz': [{
+            'id': quiz.id,
+            'question': quiz.question,
+            'options': json.loads(quiz.options_json) if quiz.options_json else []
+        } for quiz in quizzes],
+        'course': course,
+        'module': module
+    }
+
+
+def get_payload(lesson_id):
+    """Shared, read-only lesson payload (or None). Callers copy it before adding fields."""
+    global _catalog, _payloads
+
+    catalog = get_catalog()
+    if lesson_id not in catalog.lessons:
+        return None
+
+    with _lock:
+        if _catalog is not catalog:
+            _catalog, _payloads = catalog, {}
+        payload = _payloads.get(lesson_id)
+    if payload is not None:
+        return payload
+
+    payload = _build(catalog, lesson_id)
+    if payload is not None:
+        with _lock:
+            if _catalog is catalog:
+                _payloads[lesson_id] = payload
+    return payload
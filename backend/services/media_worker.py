@@ -0,0 +1,185 @@
+"""
+Image Derivative Worker
+After an image upload, a small thread pool writes a thumbnail and a WebP
+variant next to the content-addressed original:
+    media/<aa>/<sha256>.thumb.webp  (fits THUMB_SIZE)
+    media/<aa>/<sha256>.webp        (fits MAX_WEBP_SIZE, skipped for WebP originals)
+
+Jobs go through a bounded queue; when it is full the image simply stays
+'pending' and is picked up by the periodic sweep. Requires Pillow - without
+it uploads keep working and only the original URL is served.
+"""
+
+import atexit
+import os
+import queue
+import threading
+
+from models import db, MediaFile
+from services.file_service import UPLOAD_ROOT
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional dependency
+    Image = None
+
+WORKERS = 2
+QUEUE_SIZE = 100
+SWEEP_INTERVAL = 60.0  # Seconds between re-queues of pending images
+SWEEP_BATCH = 50
+
+THUMB_SIZE = (480, 480)
+MAX_WEBP_SIZE = (1600, 1600)
+WEBP_QUALITY = 80
+
+_jobs = queue.Queue(maxsize=QUEUE_SIZE)
+_queued = set()  # media ids in the queue or being processed
+_queued_lock = threading.Lock()
+
+_app = None
+_workers = []
+_sweep_thread = None
+_running = False
+_stop = threading.Event()
+
+
+def is_available() -> bool:
+    return Image is not None
+
+
+def enqueue(media_id: int) -> bool:
+    """Queue derivative generation. Returns False if the pool is not running or the queue is full."""
+    if not _running:
+        return False
+    with _queued_lock:
+        if media_id in _queued:
+            return True
+        _queued.add(media_id)
+    try:
+        _jobs.put_nowait(media_id)
+        return True
+    except queue.Full:
+        with _queued_lock:
+            _queued.discard(media_id)
+        return False
+
+
+def _absolute(storage_path):
+    return os.path.join(os.getcwd(), UPLOAD_ROOT, *storage_path.split('/'))
+
+
+def _save_webp(image, storage_path, size):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    path = _absolute(storage_path)
+    tmp_path = f"{path}.part"
+    variant.save(tmp_path, 'WEBP', quality=WEBP_QUALITY, method=4)
+    os.replace(tmp_path, path)
+    return f"/static/uploads/{storage_path}"
+
+
+def generate_variants(media):
+    """Write the derivatives for one MediaFile and fill in its URLs. Caller commits."""
+    base = media.storage_path.rsplit('.', 1)[0]
+
+    with Image.open(_absolute(media.storage_path)) as source:
+        source = ImageOps.exif_transpose(source)
+        media.width, media.height = source.size
+        image = source.convert('RGBA' if source.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    media.thumb_url = _save_webp(image, f"{base}.thumb.webp", THUMB_SIZE)
+    if media.mime_type == 'image/webp':
+        media.webp_url = media.url
+    else:
+        media.webp_url = _save_webp(image, f"{base}.webp", MAX_WEBP_SIZE)
+    media.variants_status = 'ready'
+
+
+def process(media_id):
+    """Generate one image's derivatives. Must run inside an app context."""
+    media = db.session.get(MediaFile, media_id)
+    if media is None or media.variants_status != 'pending':
+        return False
+
+    try:
+        generate_variants(media)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[Media] Derivatives failed for media {media_id}: {e}")
+        MediaFile.query.filter_by(id=media_id).update({'variants_status': 'failed'}, synchronize_session=False)
+        db.session.commit()
+        return False
+
+    # Cached feed entries were serialized without the derivative URLs
+    from services import timeline_cache
+    timeline_cache.refresh_media(media.url)
+    return True
+
+
+def _worker_loop():
+    while True:
+        media_id = _jobs.get()
+        if media_id is None:
+            break
+        try:
+            with _app.app_context():
+                process(media_id)
+        finally:
+            with _queued_lock:
+                _queued.discard(media_id)
+            _jobs.task_done()
+
+
+def sweep():
+    """Queue images still waiting for derivatives (queue overflow, restarts, old uploads)."""
+    with _app.app_context():
+        pending_ids = [row[0] for row in db.session.query(MediaFile.id)
+                       .filter(MediaFile.variants_status == 'pending')
+                       .order_by(MediaFile.id).limit(SWEEP_BATCH)]
+        db.session.remove()
+    return sum(1 for media_id in pending_ids if enqueue(media_id))
+
+
+def _sweep_loop():
+    while not _stop.is_set():
+        sweep()
+        _stop.wait(SWEEP_INTERVAL)
+
+
+def start_media_worker(app):
+    """Start the derivative pool (no-op without Pillow)."""
+    global _app, _sweep_thread, _running
+
+    if _running:
+        return
+    if not is_available():
+        print("[Media] Pillow not installed - image derivatives disabled")
+        return
+
+    _app = app
+    _running = True
+    _stop.clear()
+    for _ in range(WORKERS):
+        worker = threading.Thread(target=_worker_loop, daemon=True)
+        worker.start()
+        _workers.append(worker)
+    _sweep_thread = threading.Thread(target=_sweep_loop, daemon=True)
+    _sweep_thread.start()
+    atexit.register(stop_media_worker)
+    print(f"[Media] Derivative worker started ({WORKERS} threads)")
+
+
+def stop_media_worker(timeout=5.0):
+    global _running
+
+    if not _running:
+        return
+
+    _running = False
+    _stop.set()
+    for _ in _workers:
+        _jobs.put(None)  # Unblocks once queued jobs ahead of it are done
+    for worker in _workers:
+        worker.join(timeout=timeout)
+    _workers.clear()
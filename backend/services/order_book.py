@@ -0,0 +1,486 @@
+"""
+Order Book Service - Resting Order Matching Simulator
+Keeps limit, stop and OCO bracket orders in price-sorted heaps per symbol
+so each price tick only touches the orders it actually crossed.
+"""
+
+import heapq
+import itertools
+import threading
+import uuid
+from datetime import datetime
+
+from sqlalchemy import case, func, tuple_
+
+from models import db, Order, Trade, Challenge
+
+
+ORDER_TYPES = ('limit', 'stop')
+ORDER_SIDES = ('buy', 'sell')
+EPSILON = 1e-9
+
+
+class RestingOrder:
+    """Lightweight in-memory copy of an open Order row."""
+    def __init__(self, order_id, challenge_id, symbol, side, order_type, qty, price, oco_group=None,
+                 reduce_only=False):
+        self.id = order_id
+        self.challenge_id = challenge_id
+        self.symbol = symbol
+        self.side = side
+        self.order_type = order_type
+        self.qty = qty
+        self.price = price
+        self.oco_group = oco_group
+        self.reduce_only = reduce_only
+
+    @classmethod
+    def from_model(cls, order):
+        return cls(
+            order.id, order.challenge_id, order.symbol, order.side,
+            order.order_type, order.qty, order.price, order.oco_group, bool(order.reduce_only)
+        )
+
+    @property
+    def triggers_on_rise(self) -> bool:
+        """Sell limits and buy stops fire when price rises to them; the rest fire on a fall."""
+        return (self.side == 'sell') == (self.order_type == 'limit')
+
+    def fill_price(self, tick_price: float) -> float:
+        """Limits fill at their price or better, stops fill at the tick that triggered them."""
+        if self.order_type == 'limit':
+            if self.side == 'buy':
+                return min(self.price, tick_price)
+            return max(self.price, tick_price)
+        return tick_price
+
+
+class Fill:
+    """A matched order waiting to be written back as a Trade."""
+    def __init__(self, order, price, cancelled_ids):
+        self.order = order
+        self.price = price
+        self.cancelled_ids = cancelled_ids
+
+
+class SymbolBook:
+    """
+    Two heaps per symbol:
+    - rising: min-heap of trigger prices hit when price goes up (sell limit, buy stop)
+    - falling: max-heap of trigger prices hit when price goes down (buy limit, sell stop)
+    Cancelled orders are removed lazily when they reach the top of a heap.
+    """
+    def __init__(self):
+        self.rising = []
+        self.falling = []
+
+    def push(self, order, seq):
+        if order.triggers_on_rise:
+            heapq.heappush(self.rising, (order.price, seq, order.id))
+        else:
+            heapq.heappush(self.falling, (-order.price, seq, order.id))
+
+    def pop_crossed(self, tick_price, live):
+        """Pop every live order whose trigger was crossed by tick_price - O(k log n)."""
+        crossed = []
+        while self.rising and self.rising[0][0] <= tick_price:
+            _, _, order_id = heapq.heappop(self.rising)
+            if order_id in live:
+                crossed.append(live[order_id])
+        while self.falling and -self.falling[0][0] >= tick_price:
+            _, _, order_id = heapq.heappop(self.falling)
+            if order_id in live:
+                crossed.append(live[order_id])
+        return crossed
+
+    def __len__(self):
+        return len(self.rising) + len(self.falling)
+
+
+class OrderBook:
+    """Thread-safe collection of per-symbol books shared by request and price threads."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._books = {}
+        self._live = {}
+        self._oco = {}
+        self._seq = itertools.count()
+
+    def add(self, order: RestingOrder):
+        with self._lock:
+            self._live[order.id] = order
+            if order.oco_group:
+                self._oco.setdefault(order.oco_group, set()).add(order.id)
+            self._books.setdefault(order.symbol, SymbolBook()).push(order, next(self._seq))
+
+    def remove(self, order_id) -> bool:
+        """Remove an order before it triggers. Returns False if it already filled or is unknown."""
+        with self._lock:
+            order = self._live.pop(order_id, None)
+            if not order:
+                return False
+            self._discard_oco(order)
+            return True
+
+    def _discard_oco(self, order):
+        if order.oco_group and order.oco_group in self._oco:
+            group = self._oco[order.oco_group]
+            group.discard(order.id)
+            if not group:
+                del self._oco[order.oco_group]
+
+    def match(self, prices: dict) -> list:
+        """Match a batch of ticks and return the resulting fills."""
+        fills = []
+        with self._lock:
+            for symbol, tick_price in prices.items():
+                book = self._books.get(symbol)
+                if not book or not tick_price:
+                    continue
+                for order in book.pop_crossed(tick_price, self._live):
+                    # An earlier leg of the same OCO group may have filled in this tick
+                    if order.id not in self._live:
+                        continue
+                    del self._live[order.id]
+                    cancelled = []
+                    if order.oco_group:
+                        siblings = self._oco.pop(order.oco_group, set())
+                        for sibling_id in siblings:
+                            if sibling_id != order.id and self._live.pop(sibling_id, None):
+                                cancelled.append(sibling_id)
+                    fills.append(Fill(order, order.fill_price(tick_price), cancelled))
+        return fills
+
+    def clear(self):
+        with self._lock:
+            self._books.clear()
+            self._live.clear()
+            self._oco.clear()
+
+    def open_count(self) -> int:
+        with self._lock:
+            return len(self._live)
+
+
+order_book = OrderBook()
+
+
+def serialize_order(order):
+    """Serialize an Order row for API response."""
+    return {
+        'id': order.id,
+        'challenge_id': order.challenge_id,
+        'symbol': order.symbol,
+        'side': order.side,
+        'order_type': order.order_type,
+        'qty': order.qty,
+        'price': order.price,
+        'status': order.status,
+        'parent_id': order.parent_id,
+        'oco_group': order.oco_group,
+        'reduce_only': bool(order.reduce_only),
+        'trade_id': order.trade_id,
+        'fill_price': order.fill_price,
+        'created_at': order.created_at.isoformat() if order.created_at else None,
+        'filled_at': order.filled_at.isoformat() if order.filled_at else None
+    }
+
+
+def validate_bracket(side, reference_price, stop_loss=None, take_profit=None):
+    """Check that SL/TP sit on the correct side of the entry. Returns an error message or None."""
+    if stop_loss is not None and stop_loss <= 0:
+        return 'Stop loss must be positive'
+    if take_profit is not None and take_profit <= 0:
+        return 'Take profit must be positive'
+    if side == 'buy':
+        if stop_loss is not None and stop_loss >= reference_price:
+            return 'Stop loss must be below the entry price for a buy'
+        if take_profit is not None and take_profit <= reference_price:
+            return 'Take profit must be above the entry price for a buy'
+    else:
+        if stop_loss is not None and stop_loss <= reference_price:
+            return 'Stop loss must be above the entry price for a sell'
+        if take_profit is not None and take_profit >= reference_price:
+            return 'Take profit must be below the entry price for a sell'
+    return None
+
+
+def _bracket_legs(challenge_id, symbol, entry_side, qty, stop_loss, take_profit, status, parent_id=None):
+    """Build the closing SL (stop) and TP (limit) legs sharing one OCO group. Legs are reduce-only."""
+    exit_side = 'sell' if entry_side == 'buy' else 'buy'
+    group = uuid.uuid4().hex if stop_loss is not None and take_profit is not None else None
+    legs = []
+    if stop_loss is not None:
+        legs.append(Order(
+            challenge_id=challenge_id, symbol=symbol, side=exit_side, order_type='stop',
+            qty=qty, price=stop_loss, status=status, parent_id=parent_id, oco_group=group,
+            reduce_only=True
+        ))
+    if take_profit is not None:
+        legs.append(Order(
+            challenge_id=challenge_id, symbol=symbol, side=exit_side, order_type='limit',
+            qty=qty, price=take_profit, status=status, parent_id=parent_id, oco_group=group,
+            reduce_only=True
+        ))
+    return legs
+
+
+def place_order(challenge_id, symbol, side, order_type, qty, price, stop_loss=None, take_profit=None):
+    """
+    Rest a limit or stop order on the book.
+    Optional stop_loss/take_profit become an OCO bracket activated when the entry fills.
+    """
+    if not symbol:
+        return {'error': 'Symbol is required'}
+    if order_type not in ORDER_TYPES:
+        return {'error': f"Invalid order type '{order_type}'"}
+    if side not in ORDER_SIDES:
+        return {'error': f"Invalid side '{side}'"}
+    if not qty or qty <= 0:
+        return {'error': 'Quantity must be positive'}
+    if not price or price <= 0:
+        return {'error': 'Order price must be positive'}
+
+    error = validate_bracket(side, price, stop_loss, take_profit)
+    if error:
+        return {'error': error}
+
+    entry = Order(
+        challenge_id=challenge_id, symbol=symbol, side=side, order_type=order_type,
+        qty=qty, price=price, status='open'
+    )
+    db.session.add(entry)
+    db.session.flush()
+
+    legs = _bracket_legs(challenge_id, symbol, side, qty, stop_loss, take_profit, 'pending', entry.id)
+    db.session.add_all(legs)
+    db.session.commit()
+
+    order_book.add(RestingOrder.from_model(entry))
+
+    return {
+        'success': True,
+        'order': serialize_order(entry),
+        'bracket': [serialize_order(leg) for leg in legs]
+    }
+
+
+def attach_bracket(challenge_id, symbol, entry_side, qty, entry_price, stop_loss=None, take_profit=None):
+    """Attach live SL/TP legs to a position that was just opened with a market fill."""
+    if stop_loss is None and take_profit is None:
+        return {'success': True, 'bracket': []}
+
+    error = validate_bracket(entry_side, entry_price, stop_loss, take_profit)
+    if error:
+        return {'error': error}
+
+    legs = _bracket_legs(challenge_id, symbol, entry_side, qty, stop_loss, take_profit, 'open')
+    db.session.add_all(legs)
+    db.session.commit()
+
+    for leg in legs:
+        order_book.add(RestingOrder.from_model(leg))
+
+    return {'success': True, 'bracket': [serialize_order(leg) for leg in legs]}
+
+
+def cancel_order(order_id, challenge_id):
+    """Cancel a resting order together with any bracket legs still waiting on it."""
+    order = Order.query.filter_by(id=order_id, challenge_id=challenge_id).first()
+    if not order:
+        return {'error': 'Order not found'}
+    if order.status not in ('open', 'pending'):
+        return {'error': f"Order is already {order.status}"}
+
+    if order.status == 'open' and not order_book.remove(order.id):
+        # The price thread matched it first; the fill is being written back
+        return {'error': 'Order is being filled'}
+
+    now = datetime.utcnow()
+    order.status = 'cancelled'
+    order.cancelled_at = now
+    Order.query.filter(
+        Order.parent_id == order.id,
+        Order.status == 'pending'
+    ).update({'status': 'cancelled', 'cancelled_at': now}, synchronize_session=False)
+    db.session.commit()
+
+    return {'success': True, 'order': serialize_order(order)}
+
+
+def _net_positions(keys):
+    """Net signed qty (long > 0, short < 0) per (challenge_id, symbol) key, in one query."""
+    if not keys:
+        return {}
+    signed = case((Trade.side == 'buy', Trade.qty), else_=-Trade.qty)
+    rows = db.session.query(Trade.challenge_id, Trade.symbol, func.sum(signed)).filter(
+        tuple_(Trade.challenge_id, Trade.symbol).in_(list(keys))
+    ).group_by(Trade.challenge_id, Trade.symbol).all()
+    positions = dict.fromkeys(keys, 0.0)
+    positions.update({(c, s): qty or 0.0 for c, s, qty in rows})
+    return positions
+
+
+def _reducible(side, held):
+    """How much a closing order on `side` can take off a net position of `held`."""
+    return max(held if side == 'sell' else -held, 0.0)
+
+
+def cancel_flat_brackets(challenge_id, symbol):
+    """
+    Cancel the open reduce-only legs of a position that was closed by hand,
+    so a later tick can't reopen it the other way. Returns the cancelled ids. Commits.
+    """
+    held = _net_positions([(challenge_id, symbol)])[(challenge_id, symbol)]
+    if abs(held) > EPSILON:
+        return []
+    legs = Order.query.filter_by(
+        challenge_id=challenge_id, symbol=symbol, status='open', reduce_only=True
+    ).all()
+    cancelled = [leg.id for leg in legs if order_book.remove(leg.id)]
+    if cancelled:
+        Order.query.filter(
+            Order.id.in_(cancelled),
+            Order.status == 'open'
+        ).update({'status': 'cancelled', 'cancelled_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+    return cancelled
+
+
+def get_open_orders(challenge_id):
+    """Get open and pending orders for a challenge."""
+    orders = Order.query.filter(
+        Order.challenge_id == challenge_id,
+        Order.status.in_(['open', 'pending'])
+    ).order_by(Order.created_at.asc()).all()
+    return [serialize_order(o) for o in orders]
+
+
+def load_open_orders():
+    """Rebuild the in-memory book from the database (startup or after a failed flush)."""
+    order_book.clear()
+    orders = Order.query.filter_by(status='open').all()
+    for order in orders:
+        order_book.add(RestingOrder.from_model(order))
+    return len(orders)
+
+
+def write_fills(fills):
+    """
+    Write a batch of fills back in a single transaction:
+    insert Trade rows, mark orders filled, cancel OCO siblings, activate bracket legs.
+    Reduce-only legs are capped at the open position and cancelled when it is already flat.
+    Returns the number of trades written.
+    """
+    if not fills:
+        return 0
+
+    from services.equity_service import update_challenge_equity
+
+    now = datetime.utcnow()
+    order_ids = [f.order.id for f in fills]
+    rows = {o.id: o for o in Order.query.filter(Order.id.in_(order_ids)).all()}
+    challenge_ids = {f.order.challenge_id for f in fills}
+    statuses = dict(
+        db.session.query(Challenge.id, Challenge.status)
+        .filter(Challenge.id.in_(challenge_ids)).all()
+    )
+    positions = _net_positions({(f.order.challenge_id, f.order.symbol) for f in fills})
+
+    executed = []
+    cancelled_ids = []
+    for fill in fills:
+        row = rows.get(fill.order.id)
+        if not row or row.status != 'open':
+            continue
+        if statuses.get(row.challenge_id) == 'failed':
+            # Locked accounts never trade; drop the order instead of filling it
+            cancelled_ids.append(row.id)
+            cancelled_ids.extend(fill.cancelled_ids)
+            continue
+        key = (row.challenge_id, row.symbol)
+        qty = row.qty
+        if row.reduce_only:
+            qty = min(qty, _reducible(row.side, positions[key]))
+            if qty <= EPSILON:
+                # Position already closed: the leg has nothing left to protect
+                cancelled_ids.append(row.id)
+                cancelled_ids.extend(fill.cancelled_ids)
+                continue
+        trade = Trade(
+            challenge_id=row.challenge_id,
+            symbol=row.symbol,
+            side=row.side,
+            qty=qty,
+            price=fill.price,
+            executed_at=now
+        )
+        positions[key] += qty if row.side == 'buy' else -qty
+        executed.append((row, trade, fill))
+        cancelled_ids.extend(fill.cancelled_ids)
+
+    db.session.add_all([trade for _, trade, _ in executed])
+    db.session.flush()
+
+    filled_ids = []
+    for row, trade, fill in executed:
+        row.status = 'filled'
+        row.trade_id = trade.id
+        row.fill_price = fill.price
+        row.filled_at = now
+        filled_ids.append(row.id)
+
+    if cancelled_ids:
+        Order.query.filter(
+            Order.id.in_(cancelled_ids),
+            Order.status == 'open'
+        ).update({'status': 'cancelled', 'cancelled_at': now}, synchronize_session=False)
+
+    activated = []
+    if filled_ids:
+        activated = Order.query.filter(
+            Order.parent_id.in_(filled_ids),
+            Order.status == 'pending'
+        ).all()
+        for leg in activated:
+            leg.status = 'open'
+
+    db.session.commit()
+
+    for leg in activated:
+        order_book.add(RestingOrder.from_model(leg))
+
+    for challenge_id in {row.challenge_id for row, _, _ in executed}:
+        update_challenge_equity(challenge_id)
+
+    return len(executed)
+
+
+def process_tick(prices: dict):
+    """Match a batch of ticks against the book and persist the fills."""
+    fills = order_book.match(prices)
+    if not fills:
+        return 0
+    try:
+        return write_fills(fills)
+    except Exception as e:
+        db.session.rollback()
+        print(f"[OrderBook] Failed to write {len(fills)} fills: {e}")
+        # Matched orders were popped from memory; resync with what is really open
+        load_open_orders()
+        return 0
+
+
+def init_order_book(app):
+    """Load open orders and subscribe the book to price cache ticks."""
+    from services.price_cache import register_tick_listener
+
+    with app.app_context():
+        count = load_open_orders()
+    print(f"[OrderBook] Loaded {count} resting orders")
+
+    def on_tick(prices):
+        with app.app_context():
+            process_tick(prices)
+
+    register_tick_listener(on_tick)
@@ -23,6 +23,9 @@ UPDATE_INTERVAL = 30  # Increased to 30 seconds to avoid rate limits
 _scheduler_thread = None
 _scheduler_running = False
 
+# Callbacks notified with {symbol: price} after each batch refresh
+_tick_listeners = []
+
 
 def get_cached_price(symbol: str) -> dict:
     """
@@ -92,6 +95,26 @@ def update_price(symbol: str, price: float):
         }
 
 
+def register_tick_listener(callback):
+    """
+    Register a callable invoked with {symbol: price} after every batch refresh.
+    Used by the order book to trigger resting orders on each tick.
+    """
+    if callback not in _tick_listeners:
+        _tick_listeners.append(callback)
+
+
+def _notify_tick_listeners(prices: dict):
+    """Dispatch a batch of fresh prices to all registered listeners."""
+    if not prices:
+        return
+    for callback in list(_tick_listeners):
+        try:
+            callback(prices)
+        except Exception as e:
+            print(f"[PriceCache] Tick listener error: {e}")
+
+
 def _fetch_prices_batch(symbols: list) -> dict:
     """Fetch prices for multiple symbols in one call."""
     prices = {}
@@ -136,6 +159,7 @@ def _background_price_updater():
             # Update cache
             for symbol, price in prices.items():
                 update_price(symbol, price)
+            _notify_tick_listeners(prices)
             
             # Log update
             print(f"[PriceCache] Updated {len(prices)} prices at {datetime.now().strftime('%H:%M:%S')}")
@@ -165,6 +189,7 @@ def start_price_scheduler(app=None):
     prices = _fetch_prices_batch(WATCHED_SYMBOLS)
     for symbol, price in prices.items():
         update_price(symbol, price)
+    _notify_tick_listeners(prices)
     print(f"[PriceCache] Pre-populated cache with {len(prices)} prices")
 
 
@@ -195,4 +220,5 @@ def init_scheduler():
     prices = _fetch_prices_batch(WATCHED_SYMBOLS)
     for symbol, price in prices.items():
         update_price(symbol, price)
+    _notify_tick_listeners(prices)
     print(f"[PriceCache] Pre-populated cache with {len(prices)} prices")
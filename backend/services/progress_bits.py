@@ -0,0 +1,108 @@
+"""
+Academy Progress Bitmaps
+Each user's completed and quiz-passed lessons are kept as two bitmaps on the
+UserXP row, indexed by Lesson.ordinal. A user's progress is then one row read,
+and per-course progress is a popcount over the course's mask (see
+catalog_cache).
+
+UserProgress stays the source of truth: a NULL bitmap is rebuilt from it on
+first read, and writes use compare-and-set so concurrent updates for the same
+user never drop a bit.
+"""
+
+from sqlalchemy import select, update
+
+from models import db, Lesson, UserProgress, UserXP
+
+CAS_RETRIES = 5
+
+
+def to_int(blob) -> int:
+    return int.from_bytes(blob, 'little') if blob else 0
+
+
+def to_blob(bits: int) -> bytes:
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def popcount(bits: int) -> int:
+    return bits.bit_count()
+
+
+def _read(user_id):
+    return db.session.execute(
+        select(UserXP.id, UserXP.completed_bits, UserXP.quiz_passed_bits).where(UserXP.user_id == user_id)
+    ).first()
+
+
+def rebuild(user_id):
+    """Recompute both bitmaps from UserProgress and store them. Returns (completed, quiz_passed). Caller commits."""
+    completed = quiz_passed = 0
+    rows = db.session.query(Lesson.ordinal, UserProgress.completed, UserProgress.quiz_passed)\
+        .join(Lesson, Lesson.id == UserProgress.lesson_id)\
+        .filter(UserProgress.user_id == user_id, Lesson.ordinal.isnot(None)).all()
+    for ordinal, is_completed, is_passed in rows:
+        if is_completed:
+            completed |= 1 << ordinal
+        if is_passed:
+            quiz_passed |= 1 << ordinal
+
+    user_xp = UserXP.query.filter_by(user_id=user_id).first()
+    if not user_xp:
+        user_xp = UserXP(user_id=user_id, total_xp=0, level=1)
+        db.session.add(user_xp)
+    user_xp.completed_bits = to_blob(completed)
+    user_xp.quiz_passed_bits = to_blob(quiz_passed)
+    db.session.flush()
+    return completed, quiz_passed
+
+
+def load(user_id):
+    """(completed, quiz_passed) bitmaps as ints - a single row read once built."""
+    row = _read(user_id)
+    if row is None or row.completed_bits is None or row.quiz_passed_bits is None:
+        bits = rebuild(user_id)
+        db.session.commit()
+        return bits
+    return to_int(row.completed_bits), to_int(row.quiz_passed_bits)
+
+
+def _apply(bits, mask, value):
+    if value is None:
+        return bits
+    return bits | mask if value else bits & ~mask
+
+
+def mark(user_id, ordinal, completed=None, quiz_passed=None):
+    """
+    Set (True) or clear (False) a lesson's bits after its UserProgress row
+    changed; None leaves a bitmap alone. Caller commits.
+    """
+    if ordinal is None:
+        return
+    mask = 1 << ordinal
+
+    for _ in range(CAS_RETRIES):
+        row = _read(user_id)
+        if row is None or row.completed_bits is None or row.quiz_passed_bits is None:
+            rebuild(user_id)  # Reads the (autoflushed) UserProgress change too
+            return
+
+        new_completed = _apply(to_int(row.completed_bits), mask, completed)
+        new_passed = _apply(to_int(row.quiz_passed_bits), mask, quiz_passed)
+        if (new_completed, new_passed) == (to_int(row.completed_bits), to_int(row.quiz_passed_bits)):
+            return
+
+        result = db.session.execute(
+            update(UserXP)
+            .where(UserXP.id == row.id,
+                   UserXP.completed_bits == row.completed_bits,
+                   UserXP.quiz_passed_bits == row.quiz_passed_bits)
+            .values(completed_bits=to_blob(new_completed), quiz_passed_bits=to_blob(new_passed))
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            return
+
+    # Lost every race: fall back to the source of truth
+    rebuild(user_id)
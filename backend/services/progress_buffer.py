@@ -0,0 +1,173 @@
+"""
+Video Progress Heartbeat Buffer
+Player heartbeats only move a (user, lesson) position forward, so the buffer
+keeps the furthest position per pair in memory and a background thread
+upserts them in one batch every FLUSH_INTERVAL seconds.
+
+Heartbeats are write-only positions: they never complete a lesson or award
+XP, so losing a few seconds of them on a crash is harmless.
+"""
+
+import atexit
+import threading
+from datetime import datetime
+
+from sqlalchemy import func
+
+from models import db, UserProgress
+
+FLUSH_INTERVAL = 5.0   # Max staleness (seconds) of a stored video position
+MAX_PENDING = 2000     # Flush early once this many pairs are dirty
+
+_lock = threading.Lock()
+_pending = {}          # {(user_id, lesson_id): seconds}
+
+_app = None
+_flush_thread = None
+_flush_running = False
+_wake = threading.Event()
+
+
+def is_running() -> bool:
+    return _flush_running
+
+
+def queue(user_id: int, lesson_id: int, seconds: int) -> bool:
+    """
+    Keep the furthest position for the pair. Returns False if the flusher is
+    not running; caller must write synchronously.
+    """
+    if not _flush_running:
+        return False
+
+    key = (user_id, lesson_id)
+    with _lock:
+        if seconds > _pending.get(key, -1):
+            _pending[key] = seconds
+        dirty = len(_pending)
+
+    if dirty >= MAX_PENDING:
+        _wake.set()
+    return True
+
+
+def pending(user_id: int, lesson_id: int):
+    """Buffered position for the pair, or None."""
+    with _lock:
+        return _pending.get((user_id, lesson_id))
+
+
+def pending_for_user(user_id: int) -> dict:
+    """{lesson_id: seconds} buffered for one user (overlay on stored progress)."""
+    with _lock:
+        return {lesson_id: seconds for (uid, lesson_id), seconds in _pending.items() if uid == user_id}
+
+
+def _upsert_statement():
+    """INSERT ... ON CONFLICT (user_id, lesson_id) DO UPDATE keeping the furthest position."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        furthest = func.greatest
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        furthest = func.max
+    else:
+        return None
+
+    stmt = insert(UserProgress)
+    return stmt.on_conflict_do_update(
+        index_elements=['user_id', 'lesson_id'],
+        set_={
+            'video_progress_seconds': furthest(
+                func.coalesce(UserProgress.video_progress_seconds, 0),
+                stmt.excluded.video_progress_seconds
+            ),
+            'updated_at': stmt.excluded.updated_at,
+        }
+    )
+
+
+def flush():
+    """Upsert all buffered positions in one transaction. Must run inside an app context."""
+    global _pending
+
+    with _lock:
+        batch, _pending = _pending, {}
+
+    if not batch:
+        return 0
+
+    now = datetime.utcnow()
+    try:
+        stmt = _upsert_statement()
+        if stmt is not None:
+            db.session.execute(stmt, [
+                {'user_id': user_id, 'lesson_id': lesson_id, 'video_progress_seconds': seconds,
+                 'completed': False, 'quiz_score': 0, 'quiz_passed': False,
+                 'created_at': now, 'updated_at': now}
+                for (user_id, lesson_id), seconds in batch.items()
+            ])
+        else:
+            for (user_id, lesson_id), seconds in batch.items():
+                progress = UserProgress.query.filter_by(user_id=user_id, lesson_id=lesson_id).first()
+                if not progress:
+                    progress = UserProgress(user_id=user_id, lesson_id=lesson_id, video_progress_seconds=0)
+                    db.session.add(progress)
+                progress.video_progress_seconds = max(progress.video_progress_seconds or 0, seconds)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[ProgressBuffer] Flush failed, re-queueing: {e}")
+        _requeue(batch)
+        return 0
+
+    return len(batch)
+
+
+def _requeue(batch):
+    with _lock:
+        for key, seconds in batch.items():
+            if seconds > _pending.get(key, -1):
+                _pending[key] = seconds
+
+
+def _flush_loop():
+    print("[ProgressBuffer] Flush thread started")
+    while _flush_running:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        with _app.app_context():
+            flush()
+    print("[ProgressBuffer] Flush thread stopped")
+
+
+def start_progress_buffer(app):
+    """Start the background flusher and register a final flush on shutdown."""
+    global _app, _flush_thread, _flush_running
+
+    if _flush_running:
+        return
+
+    _app = app
+    _flush_running = True
+    _flush_thread = threading.Thread(target=_flush_loop, daemon=True)
+    _flush_thread.start()
+    atexit.register(stop_progress_buffer)
+
+
+def stop_progress_buffer():
+    """Stop the flusher and write whatever is still pending."""
+    global _flush_running
+
+    if not _flush_running:
+        return
+
+    _flush_running = False
+    _wake.set()
+    if _flush_thread and _flush_thread is not threading.current_thread():
+        _flush_thread.join(timeout=FLUSH_INTERVAL * 2)
+
+    with _app.app_context():
+        written = flush()
+    print(f"[ProgressBuffer] Final flush wrote {written} video positions")
@@ -0,0 +1,211 @@
+"""
+Batch Recommendation Generation
+Nightly pass that recomputes AIRecommendation rows for every user with trades
+newer than their watermark (recommendation_state.last_trade_id). Users whose
+trades have not changed are skipped.
+
+Per chunk of users: one pass over their trades ordered by user (replayed with
+trade_analytics.TradeLedger), the recommendation rules applied in memory, then
+one bulk delete of the old rows, one bulk insert of the new ones and one
+watermark upsert. Dismissed recommendations are kept and never re-suggested.
+
+The day's run is claimed in batch_runs, so with several worker processes
+(or restarts) the batch still runs once per day.
+
+Manual run:
+    python -m services.recommendation_batch
+"""
+
+import threading
+import time
+from datetime import date, datetime
+
+from sqlalchemy import delete, func, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, AIRecommendation, BatchRun, Challenge, RecommendationState, Trade
+from services.academy_service import SmartRecommendationEngine
+from services.trade_analytics import TradeLedger
+
+USER_CHUNK = 500           # Users per transaction (also bounds the IN lists)
+STREAM_CHUNK = 5000        # Trade rows fetched per round trip
+CHECK_INTERVAL = 60 * 60   # Seconds between checks for the nightly run
+BATCH_NAME = 'recommendations'
+
+_batch_thread = None
+_batch_running = False
+
+
+def _changed_users():
+    """{user_id: newest trade id} for users with trades past their watermark."""
+    watermarks = dict(db.session.query(RecommendationState.user_id, RecommendationState.last_trade_id))
+    latest = db.session.query(Challenge.user_id, func.max(Trade.id))\
+        .join(Trade, Trade.challenge_id == Challenge.id)\
+        .group_by(Challenge.user_id)
+    return {user_id: last_id for user_id, last_id in latest if last_id > (watermarks.get(user_id) or 0)}
+
+
+def _ledgers(user_ids):
+    """One pass over the users' trades, ordered by user: yields (user_id, TradeLedger)."""
+    rows = db.session.query(
+        Challenge.user_id, Trade.id, Trade.challenge_id, Challenge.start_balance,
+        Trade.symbol, Trade.side, Trade.qty, Trade.price
+    ).join(Challenge, Challenge.id == Trade.challenge_id)\
+        .filter(Challenge.user_id.in_(user_ids))\
+        .order_by(Challenge.user_id, Trade.id)\
+        .yield_per(STREAM_CHUNK)
+
+    current, ledger = None, None
+    for user_id, trade_id, challenge_id, start_balance, symbol, side, qty, price in rows:
+        if user_id != current:
+            if ledger is not None:
+                yield current, ledger
+            current, ledger = user_id, TradeLedger()
+        ledger.apply(challenge_id, start_balance, symbol, side, qty, price)
+        ledger.last_trade_id = trade_id
+    if ledger is not None:
+        yield current, ledger
+
+
+def _process_chunk(user_ids):
+    """Recompute and store recommendations for one chunk of users. Caller commits."""
+    dismissed = {}
+    for user_id, course_id in db.session.query(AIRecommendation.user_id, AIRecommendation.course_id)\
+            .filter(AIRecommendation.user_id.in_(user_ids), AIRecommendation.is_dismissed == True):
+        dismissed.setdefault(user_id, set()).add(course_id)
+
+    ledgers = dict(_ledgers(user_ids))
+    now = datetime.utcnow()
+    recommendations, watermarks = [], []
+    for user_id in user_ids:
+        ledger = ledgers.get(user_id) or TradeLedger()  # No trades yet: beginner recommendations
+        engine = SmartRecommendationEngine(user_id, dismissed.get(user_id, ()))
+        for rec in engine.analyze_trade_patterns(ledger.metrics()):
+            recommendations.append({
+                'user_id': user_id, 'course_id': rec['course_id'], 'reason': rec['reason'],
+                'priority': rec['priority'], 'is_dismissed': False, 'created_at': now
+            })
+        watermarks.append({'user_id': user_id, 'last_trade_id': ledger.last_trade_id, 'computed_at': now})
+
+    db.session.execute(
+        delete(AIRecommendation)
+        .where(AIRecommendation.user_id.in_(user_ids), AIRecommendation.is_dismissed == False)
+        .execution_options(synchronize_session=False)
+    )
+    if recommendations:
+        db.session.execute(insert(AIRecommendation), recommendations)
+
+    existing = {user_id for (user_id,) in db.session.query(RecommendationState.user_id)
+                .filter(RecommendationState.user_id.in_(user_ids))}
+    updates = [row for row in watermarks if row['user_id'] in existing]
+    inserts = [row for row in watermarks if row['user_id'] not in existing]
+    if updates:
+        db.session.execute(update(RecommendationState), updates)
+    if inserts:
+        db.session.execute(insert(RecommendationState), inserts)
+    return len(recommendations)
+
+
+def run_for_users(user_ids):
+    """Recompute the given users regardless of their watermark. Must run inside an app context."""
+    user_ids = sorted(set(user_ids))
+    written = 0
+    try:
+        for start in range(0, len(user_ids), USER_CHUNK):
+            written += _process_chunk(user_ids[start:start + USER_CHUNK])
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[Recommendations] Batch failed: {e}")
+        return {'error': str(e)}
+
+    return {'success': True, 'users': len(user_ids), 'recommendations': written}
+
+
+def _claim_day(today) -> bool:
+    """Mark today's run as taken. True for exactly one caller per day, across processes."""
+    if db.session.get(BatchRun, BATCH_NAME) is None:
+        db.session.add(BatchRun(name=BATCH_NAME))
+        try:
+            db.session.commit()
+        except IntegrityError:  # Another worker created it first
+            db.session.rollback()
+
+    claimed = db.session.execute(
+        update(BatchRun).where(
+            BatchRun.name == BATCH_NAME,
+            or_(BatchRun.last_run_on.is_(None), BatchRun.last_run_on < today)
+        ).values(last_run_on=today, started_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return claimed == 1
+
+
+def _unclaim_day():
+    """Let the next check retry a failed run."""
+    db.session.execute(
+        update(BatchRun).where(BatchRun.name == BATCH_NAME).values(last_run_on=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def run_batch(force=False):
+    """
+    Nightly: recompute users with new trades since the last run. Skipped when
+    today's run was already claimed, unless forced. Must run inside an app context.
+    """
+    if not force and not _claim_day(date.today()):
+        return {'skipped': True}
+
+    changed = _changed_users()
+    result = run_for_users(changed)
+    if 'error' in result:
+        if not force:
+            _unclaim_day()
+    else:
+        print(f"[Recommendations] Batch: {result['users']} users, {result['recommendations']} recommendations")
+    return result
+
+
+# ==================== SCHEDULER ====================
+
+def _batch_loop(app):
+    """Run once per day (first check after midnight, by whichever worker claims it)."""
+    print("[Recommendations] Scheduler started")
+    while _batch_running:
+        with app.app_context():
+            run_batch()
+        time.sleep(CHECK_INTERVAL)
+
+
+def start_recommendation_batch(app):
+    """Start the background nightly batch thread."""
+    global _batch_thread, _batch_running
+
+    if _batch_running:
+        return
+
+    _batch_running = True
+    _batch_thread = threading.Thread(target=_batch_loop, args=(app,), daemon=True)
+    _batch_thread.start()
+
+
+def stop_recommendation_batch():
+    global _batch_running
+    _batch_running = False
+
+
+if __name__ == '__main__':
+    from flask import Flask
+    from config import Config
+    from database import init_database
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    init_database(app)
+
+    with app.app_context():
+        db.create_all()
+        print(run_batch(force=True))
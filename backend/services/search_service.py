@@ -0,0 +1,243 @@
+"""
+Full-Text Search Service
+SQLite FTS5 index over community posts, strategies, courses and lessons,
+kept current by ORM insert/update/delete events.
+
+Text is normalized before indexing and querying (NFKC, Arabic diacritics,
+tatweel and letter variants folded); FTS5's unicode61 tokenizer then removes
+Latin diacritics (French) and porter stems English.
+
+Rebuild from scratch:
+    python -m services.search_service --rebuild
+"""
+
+import re
+import unicodedata
+import weakref
+
+from sqlalchemy import event, text
+
+from models import db, CommunityPost, Strategy, Course, Lesson
+
+INDEX_TABLE = 'search_index'
+
+# rowid = ref_id * KIND_SLOTS + kind code, so updates/deletes are a rowid lookup
+KIND_CODES = {'post': 1, 'strategy': 2, 'course': 3, 'lesson': 4}
+KIND_SLOTS = 8
+
+# bm25 column weights: kind, ref_id, tenant (unindexed), title, body
+BM25_WEIGHTS = '0.0, 0.0, 0.0, 8.0, 1.0'
+
+CREATE_INDEX_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+    "kind UNINDEXED, ref_id UNINDEXED, tenant UNINDEXED, title, body, "
+    "tokenize = 'porter unicode61 remove_diacritics 2')"
+)
+
+_ARABIC_MARKS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')  # Harakat, Quranic marks, tatweel
+_ARABIC_FOLD = str.maketrans({
+    '\u0623': '\u0627', '\u0625': '\u0627', '\u0622': '\u0627', '\u0671': '\u0627',  # Alef variants
+    '\u0649': '\u064a', '\u0629': '\u0647', '\u0624': '\u0648', '\u0626': '\u064a',
+})
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+MIN_PREFIX = 2  # Shorter terms must match a whole token
+
+
+def normalize(value) -> str:
+    """Fold text so FR/EN/AR variants of a word index to the same tokens."""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKC', str(value))
+    value = _ARABIC_MARKS.sub('', value)
+    return value.translate(_ARABIC_FOLD)
+
+
+def build_match(query: str):
+    """User input -> safe FTS5 MATCH expression (every term, prefix-matched), or None."""
+    terms = _TOKEN_RE.findall(normalize(query))
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' if len(term) >= MIN_PREFIX else f'"{term}"' for term in terms[:10])
+
+
+def is_available(connection=None) -> bool:
+    """FTS5 needs SQLite; other backends fall back to the old LIKE queries."""
+    bind = connection if connection is not None else db.session.get_bind()
+    return bind.dialect.name == 'sqlite'
+
+
+def is_ready() -> bool:
+    """True once the index table exists (migration 0005 has run on this database)."""
+    if not is_available():
+        return False
+    connection = db.session.connection()
+    ready = _index_ready.get(connection.engine)
+    if ready is None:
+        ready = _index_ready[connection.engine] = _index_exists(connection)
+    return ready
+
+
+# ==================== DOCUMENTS ====================
+
+def _document(kind, obj):
+    """(tenant, title, body) for one indexed row."""
+    if kind == 'post':
+        return obj.tenant_id, '', obj.content
+    if kind == 'strategy':
+        return None, obj.symbol, obj.description
+    if kind == 'course':
+        return None, obj.title, ' '.join(filter(None, [obj.description, ' '.join(obj.get_tags())]))
+    return None, obj.title, ' '.join(filter(None, [obj.description, obj.content_markdown]))
+
+
+def _rowid(kind, ref_id):
+    return ref_id * KIND_SLOTS + KIND_CODES[kind]
+
+
+def _upsert(connection, kind, obj):
+    tenant, title, body = _document(kind, obj)
+    rowid = _rowid(kind, obj.id)
+    connection.execute(text(f"DELETE FROM {INDEX_TABLE} WHERE rowid = :rowid"), {'rowid': rowid})
+    connection.execute(
+        text(f"INSERT INTO {INDEX_TABLE} (rowid, kind, ref_id, tenant, title, body) "
+             "VALUES (:rowid, :kind, :ref_id, :tenant, :title, :body)"),
+        {'rowid': rowid, 'kind': kind, 'ref_id': obj.id, 'tenant': tenant,
+         'title': normalize(title), 'body': normalize(body)}
+    )
+
+
+def _delete(connection, kind, obj):
+    connection.execute(text(f"DELETE FROM {INDEX_TABLE} WHERE rowid = :rowid"),
+                       {'rowid': _rowid(kind, obj.id)})
+
+
+def _index_exists(connection) -> bool:
+    return connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': INDEX_TABLE}
+    ).first() is not None
+
+
+_index_ready = weakref.WeakKeyDictionary()  # {engine: bool} - index table presence, checked once per engine
+
+
+def _hook(kind, action):
+    def handler(mapper, connection, target):
+        if connection.dialect.name != 'sqlite':
+            return
+        ready = _index_ready.get(connection.engine)
+        if ready is None:
+            ready = _index_ready[connection.engine] = _index_exists(connection)
+        if ready:
+            action(connection, kind, target)
+    return handler
+
+
+for _kind, _model in (('post', CommunityPost), ('strategy', Strategy), ('course', Course), ('lesson', Lesson)):
+    event.listen(_model, 'after_insert', _hook(_kind, _upsert))
+    event.listen(_model, 'after_update', _hook(_kind, _upsert))
+    event.listen(_model, 'after_delete', _hook(_kind, _delete))
+
+
+# ==================== INDEX MAINTENANCE ====================
+
+def index_many(kind, objs):
+    """Batch upsert for rows written with Core statements (which skip the ORM hooks). Caller commits."""
+    if not objs or not is_ready():
+        return 0
+    connection = db.session.connection()
+    connection.execute(text(f"DELETE FROM {INDEX_TABLE} WHERE rowid = :rowid"),
+                       [{'rowid': _rowid(kind, obj.id)} for obj in objs])
+    rows = []
+    for obj in objs:
+        tenant, title, body = _document(kind, obj)
+        rows.append({'rowid': _rowid(kind, obj.id), 'kind': kind, 'ref_id': obj.id, 'tenant': tenant,
+                     'title': normalize(title), 'body': normalize(body)})
+    connection.execute(
+        text(f"INSERT INTO {INDEX_TABLE} (rowid, kind, ref_id, tenant, title, body) "
+             "VALUES (:rowid, :kind, :ref_id, :tenant, :title, :body)"),
+        rows
+    )
+    return len(rows)
+
+
+def create_index():
+    """Create the FTS5 table (SQLite only). Used by migration 0005."""
+    connection = db.session.connection()
+    if not is_available(connection):
+        return
+    connection.execute(text(CREATE_INDEX_SQL))
+    _index_ready[connection.engine] = True
+
+
+def rebuild_index():
+    """Drop and re-index every document. Must run inside an app context."""
+    connection = db.session.connection()
+    if not is_available(connection):
+        return {'error': 'Full-text search requires SQLite FTS5'}
+
+    connection.execute(text(f"DROP TABLE IF EXISTS {INDEX_TABLE}"))
+    connection.execute(text(CREATE_INDEX_SQL))
+    _index_ready[connection.engine] = True
+
+    counts = {}
+    for kind, model in (('post', CommunityPost), ('strategy', Strategy), ('course', Course), ('lesson', Lesson)):
+        rows = []
+        for obj in model.query.yield_per(500):
+            tenant, title, body = _document(kind, obj)
+            rows.append({'rowid': _rowid(kind, obj.id), 'kind': kind, 'ref_id': obj.id, 'tenant': tenant,
+                         'title': normalize(title), 'body': normalize(body)})
+        if rows:
+            connection.execute(
+                text(f"INSERT INTO {INDEX_TABLE} (rowid, kind, ref_id, tenant, title, body) "
+                     "VALUES (:rowid, :kind, :ref_id, :tenant, :title, :body)"),
+                rows
+            )
+        counts[kind] = len(rows)
+
+    connection.execute(text(f"INSERT INTO {INDEX_TABLE} ({INDEX_TABLE}) VALUES ('optimize')"))
+    db.session.commit()
+    return {'success': True, 'indexed': counts}
+
+
+# ==================== QUERIES ====================
+
+def search(query, kinds, tenant=None, limit=20):
+    """
+    Ranked matches as [{'kind', 'id', 'snippet'}], best first (bm25, titles weighted).
+    Posts are restricted to the tenant when one is given.
+    """
+    match = build_match(query)
+    if not match:
+        return []
+
+    kind_params = {f'kind{i}': kind for i, kind in enumerate(kinds)}
+    kind_list = ', '.join(f':{name}' for name in kind_params)
+    tenant_clause = "AND (kind != 'post' OR tenant = :tenant)" if tenant else ''
+
+    rows = db.session.execute(
+        text(f"SELECT kind, ref_id, snippet({INDEX_TABLE}, 4, '[', ']', '…', 12) "
+             f"FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH :match AND kind IN ({kind_list}) {tenant_clause} "
+             f"ORDER BY bm25({INDEX_TABLE}, {BM25_WEIGHTS}) LIMIT :limit"),
+        {'match': match, 'tenant': tenant, 'limit': limit, **kind_params}
+    ).all()
+
+    return [{'kind': kind, 'id': int(ref_id), 'snippet': snippet} for kind, ref_id, snippet in rows]
+
+
+if __name__ == '__main__':
+    import sys
+    from flask import Flask
+    from config import Config
+    from database import init_database
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    init_database(app)
+
+    with app.app_context():
+        if '--rebuild' not in sys.argv:
+            print("Usage: python -m services.search_service --rebuild")
+            sys.exit(1)
+        print(rebuild_index())
@@ -1,34 +1,11 @@
-import os
-import uuid
 import json
-from werkzeug.utils import secure_filename
 from models import db, Strategy
-
-UPLOAD_FOLDER = os.path.join('static', 'uploads', 'strategies')
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-
-def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+from services.file_service import save_image
 
 def save_strategy_screenshot(file_obj):
     if not file_obj or file_obj.filename == '':
         return None
-
-    if allowed_file(file_obj.filename):
-        filename = secure_filename(file_obj.filename)
-        ext = filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4().hex}.{ext}"
-        
-        path = os.path.join(os.getcwd(), UPLOAD_FOLDER)
-        if not os.path.exists(path):
-            os.makedirs(path)
-            
-        file_path = os.path.join(path, unique_filename)
-        file_obj.save(file_path)
-        
-        return f"/static/uploads/strategies/{unique_filename}"
-    return None
+    return save_image(file_obj, 'strategies')
 
 def create_strategy(user_id, symbol, description=None, config_json=None, screenshot_file=None, win_rate=None):
     """
@@ -88,11 +65,10 @@ def get_user_strategies(user_id):
     """Get all strategies created by a user."""
     return Strategy.query.filter_by(user_id=user_id).order_by(Strategy.created_at.desc()).all()
 
-def vote_for_strategy(strategy_id):
-    """Increment the vote count for a strategy."""
-    strategy = Strategy.query.get(strategy_id)
-    if strategy:
-        strategy.votes_count = (strategy.votes_count or 0) + 1
-        db.session.commit()
-        return True
-    return False
+def vote_for_strategy(strategy_id, user_id):
+    """Record a user's vote for a strategy (buffered, once per user)."""
+    from services.counters import add
+    
+    if not Strategy.query.get(strategy_id):
+        return False
+    return add('vote', strategy_id, user_id)
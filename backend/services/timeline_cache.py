@@ -0,0 +1,166 @@
+"""
+Timeline Cache for the Community Nexus
+Per-tenant bounded ring of pre-serialized post JSON, newest first. Writes
+(new post, shared strategy, comment, like, image derivatives ready) update the
+ring in place so feed reads are a slice + string join; cursors older than the
+ring fall through to the database.
+
+Rings are per process and only see this worker's writes, so a ring older than
+MAX_AGE_SECONDS is re-warmed from the database before it is served; posts,
+likes and comments made through other workers show up within that window.
+"""
+
+import threading
+import time
+from bisect import bisect_right
+
+from flask import current_app
+
+from models import db, CommunityPost
+from services.feed_manager import (
+    FEED_PAGE_SIZE, decode_cursor, encode_cursor, get_feed_page, load_media, post_media_urls, serialize_feed_post
+)
+
+TIMELINE_SIZE = 200  # Posts kept per tenant
+MAX_AGE_SECONDS = 15
+
+_lock = threading.Lock()
+_timelines = {}  # {tenant_id: Timeline}
+
+
+class Timeline:
+    """Posts of one tenant ordered by (created_at, id) descending."""
+    def __init__(self, complete: bool):
+        self.keys = []      # [(-created_at_ts, -id)] ascending == newest first
+        self.entries = []   # [{'id', 'cursor', 'json'}] aligned with keys
+        self.complete = complete  # True while the ring holds every post of the tenant
+        self.warmed_at = time.monotonic()
+
+    def insert(self, key, entry):
+        index = bisect_right(self.keys, key)
+        self.keys.insert(index, key)
+        self.entries.insert(index, entry)
+        if len(self.keys) > TIMELINE_SIZE:
+            self.keys.pop()
+            self.entries.pop()
+            self.complete = False
+
+    def index_of(self, post_id):
+        for index, entry in enumerate(self.entries):
+            if entry['id'] == post_id:
+                return index
+        return None
+
+
+def _key(created_at, post_id):
+    return (-created_at.timestamp(), -post_id)
+
+
+def _entry(post, media=None):
+    if media is None:
+        media = load_media([post])
+    return {
+        'id': post.id,
+        'cursor': encode_cursor(post),
+        'media_urls': post_media_urls(post),
+        'json': current_app.json.dumps(serialize_feed_post(post, media=media)),
+    }
+
+
+def _warm(tenant_id) -> Timeline:
+    posts, next_cursor = get_feed_page(tenant_id, per_page=TIMELINE_SIZE)
+    media = load_media(posts)
+    timeline = Timeline(complete=next_cursor is None)
+    for post in posts:
+        timeline.keys.append(_key(post.created_at, post.id))
+        timeline.entries.append(_entry(post, media))
+    return timeline
+
+
+def _get_timeline(tenant_id) -> Timeline:
+    with _lock:
+        timeline = _timelines.get(tenant_id)
+    if timeline is not None and time.monotonic() - timeline.warmed_at < MAX_AGE_SECONDS:
+        return timeline
+    warmed = _warm(tenant_id)
+    with _lock:
+        # Keep a ring another thread re-warmed meanwhile; replace a missing or stale one
+        if _timelines.get(tenant_id) is timeline:
+            _timelines[tenant_id] = warmed
+        return _timelines[tenant_id]
+
+
+def get_cached_page(tenant_id, cursor=None, per_page=FEED_PAGE_SIZE):
+    """
+    Feed page as a ready JSON string, or None if the page is older than the
+    ring (caller falls back to the database).
+    """
+    timeline = _get_timeline(tenant_id)
+
+    with _lock:
+        start = 0
+        if cursor:
+            position = decode_cursor(cursor)
+            if position is None:
+                return None
+            start = bisect_right(timeline.keys, _key(*position))
+
+        end = start + per_page
+        if end >= len(timeline.entries) and not timeline.complete:
+            return None
+
+        page = timeline.entries[start:end]
+        has_next = end < len(timeline.entries)
+        next_cursor = page[-1]['cursor'] if has_next and page else None
+
+    return (
+        '{"posts":[' + ','.join(entry['json'] for entry in page) + '],'
+        f'"has_next":{"true" if has_next else "false"},'
+        f'"next_cursor":{current_app.json.dumps(next_cursor)}}}'
+    )
+
+
+def push_post(post):
+    """Fan out a newly committed post to its tenant's ring (only if the ring is warm)."""
+    with _lock:
+        timeline = _timelines.get(post.tenant_id)
+    if timeline is None:
+        return
+    entry = _entry(post)
+    with _lock:
+        if timeline.index_of(post.id) is None:
+            timeline.insert(_key(post.created_at, post.id), entry)
+
+
+def refresh_post(post_id):
+    """Re-serialize a cached post after its counters changed (comment, like)."""
+    post = db.session.get(CommunityPost, post_id)
+    if post is None:
+        return
+    with _lock:
+        timeline = _timelines.get(post.tenant_id)
+        if timeline is None or timeline.index_of(post_id) is None:
+            return
+    entry = _entry(post)
+    with _lock:
+        index = timeline.index_of(post_id)
+        if index is not None:
+            timeline.entries[index] = entry
+
+
+def refresh_media(url):
+    """Re-serialize cached posts showing this file (its thumbnail/WebP variants are ready)."""
+    with _lock:
+        post_ids = [entry['id'] for timeline in _timelines.values()
+                    for entry in timeline.entries if url in entry['media_urls']]
+    for post_id in post_ids:
+        refresh_post(post_id)
+
+
+def invalidate(tenant_id=None):
+    """Drop one tenant's ring (or all); the next read re-warms it."""
+    with _lock:
+        if tenant_id is None:
+            _timelines.clear()
+        else:
+            _timelines.pop(tenant_id, None)
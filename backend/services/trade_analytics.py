@@ -0,0 +1,98 @@
+"""
+Trade Outcome Analytics
+Per-user trading metrics (win rate, average win/loss, profit factor, streaks,
+drawdown) computed from real round trips in the position ledger.
+
+A round trip runs from a flat position back to flat (or through a flip) in one
+challenge and symbol; its PnL is the sum of its closing fills, replayed with the
+same average-cost rules as equity_service.calculate_realized_pnl. The
+nightly recommendation batch (services/recommendation_batch.py) streams each
+user's trades through a TradeLedger.
+"""
+
+EPSILON = 0.000001
+
+
+class TradeLedger:
+    """Replay state and running totals for one user's trades."""
+    def __init__(self):
+        self.last_trade_id = 0
+        self.positions = {}        # {(challenge_id, symbol): [qty, avg_entry, trip_pnl]}
+        self.balances = {}         # {challenge_id: [start_balance, realized, peak]}
+        self.total_trades = 0      # Fills replayed
+        self.wins = 0
+        self.losses = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.current_streak = 0    # > 0 consecutive winning round trips, < 0 losing
+        self.max_consecutive_losses = 0
+        self.max_drawdown = 0.0
+        self.max_drawdown_pct = 0.0
+
+    def apply(self, challenge_id, start_balance, symbol, side, qty, price):
+        self.total_trades += 1
+        pos = self.positions.setdefault((challenge_id, symbol), [0.0, 0.0, 0.0])
+        signed_qty = qty if side == 'buy' else -qty
+
+        if pos[0] == 0 or (pos[0] > 0) == (signed_qty > 0):
+            new_qty = pos[0] + signed_qty
+            pos[1] = abs((pos[0] * pos[1] + signed_qty * price) / new_qty) if new_qty else 0.0
+            pos[0] = new_qty
+            return
+
+        close_qty = min(abs(signed_qty), abs(pos[0]))
+        pnl = (price - pos[1]) * close_qty if pos[0] > 0 else (pos[1] - price) * close_qty
+        pos[2] += pnl
+        self._realize(challenge_id, start_balance, pnl)
+
+        remaining = pos[0] + signed_qty
+        if abs(remaining) < EPSILON:
+            self._close_trip(pos[2])
+            pos[0], pos[1], pos[2] = 0.0, 0.0, 0.0
+        elif (remaining > 0) != (pos[0] > 0):
+            self._close_trip(pos[2])
+            pos[0], pos[1], pos[2] = remaining, price, 0.0  # Flipped: the rest opens at this price
+        else:
+            pos[0] = remaining
+
+    def _realize(self, challenge_id, start_balance, pnl):
+        balance = self.balances.setdefault(challenge_id, [start_balance, 0.0, start_balance])
+        balance[1] += pnl
+        equity = balance[0] + balance[1]
+        if equity > balance[2]:
+            balance[2] = equity
+            return
+        drawdown = balance[2] - equity
+        self.max_drawdown = max(self.max_drawdown, drawdown)
+        if balance[2] > 0:
+            self.max_drawdown_pct = max(self.max_drawdown_pct, drawdown / balance[2] * 100)
+
+    def _close_trip(self, pnl):
+        if pnl > 0:
+            self.wins += 1
+            self.gross_profit += pnl
+            self.current_streak = self.current_streak + 1 if self.current_streak > 0 else 1
+        else:
+            self.losses += 1
+            self.gross_loss -= pnl
+            self.current_streak = self.current_streak - 1 if self.current_streak < 0 else -1
+            self.max_consecutive_losses = max(self.max_consecutive_losses, -self.current_streak)
+
+    def metrics(self) -> dict:
+        round_trips = self.wins + self.losses
+        return {
+            'total_trades': self.total_trades,
+            'round_trips': round_trips,
+            'wins': self.wins,
+            'losses': self.losses,
+            'win_rate': (self.wins / round_trips * 100) if round_trips > 0 else 0,
+            'avg_win': self.gross_profit / self.wins if self.wins > 0 else 0,
+            'avg_loss': self.gross_loss / self.losses if self.losses > 0 else 0,
+            'profit_factor': self.gross_profit / self.gross_loss if self.gross_loss > 0 else 0,
+            'net_pnl': round(self.gross_profit - self.gross_loss, 2),
+            'max_consecutive_losses': self.max_consecutive_losses,
+            'current_streak': self.current_streak,
+            'max_drawdown': round(self.max_drawdown, 2),
+            'max_drawdown_pct': round(self.max_drawdown_pct, 2),
+            'last_trade_id': self.last_trade_id
+        }
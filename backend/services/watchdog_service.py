@@ -6,6 +6,11 @@ Detects rule violations in real-time and auto-fails challenges.
 from models import db, Challenge, DailyMetric, Trade
 from services.equity_service import calculate_equity
 from services.price_cache import get_cached_price
+from services.write_behind import (
+    queue_daily_metric, is_metric_known, mark_metric_known,
+    get_pending_day_start, discard_equity
+)
+from services.leaderboard_service import remove_challenge
 from datetime import date, datetime
 from typing import Optional, Dict, Any
 
@@ -39,6 +44,11 @@ def get_day_start_equity(challenge_id: int) -> float:
     if daily_metric:
         return daily_metric.day_start_equity
     
+    # Today's metric may still be queued on the write-behind flusher
+    pending_start = get_pending_day_start(challenge_id)
+    if pending_start is not None:
+        return pending_start
+    
     # If no metric for today, get challenge's current stored equity
     # (This should be yesterday's closing equity)
     challenge = Challenge.query.get(challenge_id)
@@ -48,22 +58,41 @@ def get_day_start_equity(challenge_id: int) -> float:
     return 0
 
 
-def ensure_daily_metric(challenge_id: int, start_equity: float) -> DailyMetric:
-    """Ensure a daily metric exists for today."""
+def ensure_daily_metric(challenge_id: int, start_equity: float) -> Optional[DailyMetric]:
+    """
+    Ensure a daily metric exists for today.
+    When the write-behind flusher is running the insert is queued instead of
+    committed on this (read) path; the returned metric is then transient.
+    Returns None without querying when today's metric is already known to
+    exist, so callers that need the row must load it themselves.
+    """
     today = date.today()
+    if is_metric_known(challenge_id, today):
+        return None
+    
     daily_metric = DailyMetric.query.filter_by(
         challenge_id=challenge_id, 
         date=today
     ).first()
     
-    if not daily_metric:
-        daily_metric = DailyMetric(
+    if daily_metric:
+        mark_metric_known(challenge_id, today)
+        return daily_metric
+    
+    if queue_daily_metric(challenge_id, start_equity):
+        return DailyMetric(
             challenge_id=challenge_id,
             date=today,
             day_start_equity=start_equity
         )
-        db.session.add(daily_metric)
-        db.session.commit()
+    
+    daily_metric = DailyMetric(
+        challenge_id=challenge_id,
+        date=today,
+        day_start_equity=start_equity
+    )
+    db.session.add(daily_metric)
+    db.session.commit()
     
     return daily_metric
 
@@ -282,10 +311,13 @@ def execute_watchdog(challenge_id: int) -> Dict[str, Any]:
         close_result = force_close_all_positions(challenge_id)
         response['closed_positions'] = close_result
         
-        # Mark challenge as failed
+        # Mark challenge as failed (synchronous, together with the final equity)
+        discard_equity(challenge_id)
         challenge.status = 'failed'
         challenge.failed_at = datetime.utcnow()
+        challenge.equity = result.metrics.get('current_equity', challenge.equity)
         db.session.commit()
+        remove_challenge(challenge_id)
         
         response['challenge_status'] = 'failed'
         response['fail_reason'] = result.fail_reason
@@ -295,8 +327,10 @@ def execute_watchdog(challenge_id: int) -> Dict[str, Any]:
         response['status'] = 'passed'
         response['action_taken'] = 'CHALLENGE_PASSED'
         
+        discard_equity(challenge_id)
         challenge.status = 'passed'
         challenge.passed_at = datetime.utcnow()
+        challenge.equity = result.metrics.get('current_equity', challenge.equity)
         db.session.commit()
         
         response['challenge_status'] = 'passed'
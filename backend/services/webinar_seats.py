@@ -0,0 +1,193 @@
+"""
+Webinar Seats & Waitlist
+Webinar.registered_count is the seat counter. A seat is taken with one
+conditional `UPDATE ... SET registered_count = registered_count + 1 WHERE
+registered_count < max_attendees`, so the check and the increment are a
+single atomic statement: concurrent registrations can never oversubscribe a
+webinar, and nobody counts the registrations table.
+
+When the UPDATE matches no row the webinar is full and the user joins
+webinar_waitlist. Seats freed by a cancellation or a capacity increase go
+to the waitlist first-in first-out, in the same transaction.
+"""
+
+from sqlalchemy import bindparam, delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Webinar, WebinarRegistration, WebinarWaitlist
+
+OPEN_STATUSES = ('upcoming', 'live')
+
+# Built once: a burst runs these thousands of times and statement construction
+# would otherwise cost more than the SQLite round trip.
+_TAKE_SEAT = update(Webinar).where(
+    Webinar.id == bindparam('webinar_id'),
+    Webinar.status.in_(OPEN_STATUSES),
+    or_(func.coalesce(Webinar.max_attendees, 0) == 0,  # No cap
+        Webinar.registered_count < Webinar.max_attendees)
+).values(registered_count=Webinar.registered_count + 1).execution_options(synchronize_session=False)
+
+_FREE_SEAT = update(Webinar).where(
+    Webinar.id == bindparam('webinar_id'),
+    Webinar.registered_count > 0
+).values(registered_count=Webinar.registered_count - 1).execution_options(synchronize_session=False)
+
+# Why the seat UPDATE matched nothing: (status, already registered) for the user
+_SEAT_REFUSED = select(
+    Webinar.status,
+    select(WebinarRegistration.id).where(
+        WebinarRegistration.webinar_id == Webinar.id,
+        WebinarRegistration.user_id == bindparam('user_id')
+    ).exists()
+).where(Webinar.id == bindparam('webinar_id'))
+
+_CANCEL = delete(WebinarRegistration).where(
+    WebinarRegistration.webinar_id == bindparam('webinar_id'),
+    WebinarRegistration.user_id == bindparam('user_id')
+).execution_options(synchronize_session=False)
+
+_LEAVE_WAITLIST = delete(WebinarWaitlist).where(
+    WebinarWaitlist.webinar_id == bindparam('webinar_id'),
+    WebinarWaitlist.user_id == bindparam('user_id')
+).execution_options(synchronize_session=False)
+
+_WAITLIST_ENTRY = select(WebinarWaitlist.id).where(
+    WebinarWaitlist.webinar_id == bindparam('webinar_id'),
+    WebinarWaitlist.user_id == bindparam('user_id')
+)
+
+_QUEUE_AHEAD = select(func.count(WebinarWaitlist.id)).where(
+    WebinarWaitlist.webinar_id == bindparam('webinar_id'),
+    WebinarWaitlist.id <= bindparam('entry_id')
+)
+
+
+def _take_seat(webinar_id) -> bool:
+    """Reserve one seat if the webinar is open and not full."""
+    return db.session.execute(_TAKE_SEAT, {'webinar_id': webinar_id}).rowcount == 1
+
+
+def _free_seat(webinar_id):
+    db.session.execute(_FREE_SEAT, {'webinar_id': webinar_id})
+
+
+def _position(webinar_id, entry_id):
+    return db.session.execute(_QUEUE_AHEAD, {'webinar_id': webinar_id, 'entry_id': entry_id}).scalar()
+
+
+def waitlist_position(user_id, webinar_id):
+    """1-based place in the queue, or None if the user is not waiting."""
+    entry_id = db.session.execute(_WAITLIST_ENTRY, {'webinar_id': webinar_id, 'user_id': user_id}).scalar()
+    return None if entry_id is None else _position(webinar_id, entry_id)
+
+
+def _already_registered(user_id, webinar_id):
+    db.session.rollback()
+    existing = WebinarRegistration.query.filter_by(user_id=user_id, webinar_id=webinar_id).first()
+    return {'error': 'Already registered', 'registration': existing}
+
+
+def reserve(user_id, webinar_id):
+    """
+    Register a user, or queue them when the webinar is full. Commits.
+    Returns {'success': True, 'registration': WebinarRegistration},
+    {'success': True, 'waitlisted': True, 'position': n} or {'error': ...}.
+    """
+    # The seat UPDATE is the transaction's first statement: on SQLite it takes
+    # the write lock up front, so the insert below can't hit a stale snapshot.
+    if _take_seat(webinar_id):
+        # Seated directly (e.g. after the cap was raised): no longer waiting
+        db.session.execute(_LEAVE_WAITLIST, {'webinar_id': webinar_id, 'user_id': user_id})
+        registration = WebinarRegistration(user_id=user_id, webinar_id=webinar_id)
+        db.session.add(registration)
+        try:
+            db.session.commit()
+        except IntegrityError:  # Unique (user, webinar): the seat is given back by the rollback
+            return _already_registered(user_id, webinar_id)
+        return {'success': True, 'registration': registration}
+
+    refused = db.session.execute(_SEAT_REFUSED, {'webinar_id': webinar_id, 'user_id': user_id}).first()
+    if refused is None:
+        db.session.rollback()
+        return {'error': 'Webinar not found'}
+    status, registered = refused
+    if status not in OPEN_STATUSES:
+        db.session.rollback()
+        return {'error': 'Webinar is not accepting registrations'}
+    if registered:
+        return _already_registered(user_id, webinar_id)
+
+    entry = WebinarWaitlist(user_id=user_id, webinar_id=webinar_id)
+    db.session.add(entry)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return {'error': 'Already on the waitlist', 'position': waitlist_position(user_id, webinar_id)}
+    position = _position(webinar_id, entry.id)
+    db.session.commit()
+    return {'success': True, 'waitlisted': True, 'position': position}
+
+
+def _next_in_line(webinar_id):
+    """Pop the oldest waitlisted user who is not registered yet, or None when the queue is empty."""
+    while True:
+        head = WebinarWaitlist.query.filter_by(webinar_id=webinar_id).order_by(WebinarWaitlist.id).first()
+        if head is None:
+            return None
+        db.session.delete(head)
+        registered = db.session.query(WebinarRegistration.id)\
+            .filter_by(user_id=head.user_id, webinar_id=webinar_id).first()
+        if registered is None:
+            return head.user_id
+
+
+def promote(webinar_id):
+    """Move waitlisted users into free seats, oldest first. Returns their user ids. Caller commits."""
+    promoted = []
+    # Seat first, then the queue head: the UPDATE locks the webinar row, so
+    # concurrent releases can't hand the same head a seat twice.
+    while _take_seat(webinar_id):
+        user_id = _next_in_line(webinar_id)
+        if user_id is None:
+            _free_seat(webinar_id)
+            break
+        db.session.add(WebinarRegistration(user_id=user_id, webinar_id=webinar_id))
+        db.session.flush()
+        promoted.append(user_id)
+    return promoted
+
+
+def set_capacity(webinar_id, max_attendees):
+    """
+    Change a webinar's seat limit (None or 0 = unlimited). Seats it opens go to
+    the waitlist; lowering it below the current count keeps existing
+    registrations and only stops new ones. Commits.
+    """
+    updated = db.session.execute(
+        update(Webinar).where(Webinar.id == webinar_id).values(max_attendees=max_attendees)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        db.session.rollback()
+        return {'error': 'Webinar not found'}
+    promoted = promote(webinar_id)
+    db.session.commit()
+    return {'success': True, 'max_attendees': max_attendees, 'promoted': promoted}
+
+
+def release(user_id, webinar_id):
+    """Cancel a registration (its seat goes to the waitlist) or leave the waitlist. Commits."""
+    removed = db.session.execute(_CANCEL, {'webinar_id': webinar_id, 'user_id': user_id}).rowcount
+    if removed:
+        _free_seat(webinar_id)
+        promoted = promote(webinar_id)
+        db.session.commit()
+        return {'success': True, 'promoted': promoted}
+
+    left = db.session.execute(_LEAVE_WAITLIST, {'webinar_id': webinar_id, 'user_id': user_id}).rowcount
+    if not left:
+        db.session.rollback()
+        return {'error': 'Not registered for this webinar'}
+    db.session.commit()
+    return {'success': True, 'left_waitlist': True}
@@ -0,0 +1,236 @@
+"""
+Write-Behind Service for Challenge Equity and Daily Metrics
+Coalesces equity and DailyMetric updates per challenge in memory and flushes
+them in batched transactions from a background thread, so request threads
+stop contending for the SQLite write lock on every poll.
+
+Status transitions (failed/passed) are NOT routed through here - they stay
+synchronous in the watchdog.
+"""
+
+import atexit
+import threading
+from datetime import date
+
+from sqlalchemy import update
+
+from models import db, Challenge, DailyMetric
+
+FLUSH_INTERVAL = 2.0   # Max staleness (seconds) of a queued write
+MAX_PENDING = 500      # Flush early once this many challenges are dirty
+
+_lock = threading.Lock()
+_pending_equity = {}    # {challenge_id: equity}
+_pending_metrics = {}   # {(challenge_id, date): {'day_start_equity', 'day_end_equity', 'min_equity'}}
+_known_metrics = set()  # (challenge_id, date) rows known to exist or be queued
+
+_app = None
+_flush_thread = None
+_flush_running = False
+_wake = threading.Event()
+
+
+def is_running() -> bool:
+    """True when queued writes will be flushed by the background thread."""
+    return _flush_running
+
+
+def queue_equity(challenge_id: int, equity: float) -> bool:
+    """
+    Queue an equity update (last write wins) and roll it into today's metric.
+    Returns False if the write-behind thread is not running; caller must write synchronously.
+    """
+    if not _flush_running:
+        return False
+
+    key = (challenge_id, date.today())
+    with _lock:
+        _pending_equity[challenge_id] = equity
+        metric = _pending_metrics.setdefault(
+            key, {'day_start_equity': None, 'day_end_equity': None, 'min_equity': None}
+        )
+        metric['day_end_equity'] = equity
+        if metric['min_equity'] is None or equity < metric['min_equity']:
+            metric['min_equity'] = equity
+        dirty = len(_pending_equity)
+
+    if dirty >= MAX_PENDING:
+        _wake.set()
+    return True
+
+
+def queue_daily_metric(challenge_id: int, start_equity: float) -> bool:
+    """
+    Queue creation of today's DailyMetric if it does not exist yet.
+    Returns False if the write-behind thread is not running.
+    """
+    if not _flush_running:
+        return False
+
+    key = (challenge_id, date.today())
+    with _lock:
+        metric = _pending_metrics.setdefault(
+            key, {'day_start_equity': None, 'day_end_equity': None, 'min_equity': None}
+        )
+        if metric['day_start_equity'] is None:
+            metric['day_start_equity'] = start_equity
+        _known_metrics.add(key)
+    return True
+
+
+def is_metric_known(challenge_id: int, day: date = None) -> bool:
+    """True if today's metric row exists or is already queued (skips a SELECT)."""
+    with _lock:
+        return (challenge_id, day or date.today()) in _known_metrics
+
+
+def mark_metric_known(challenge_id: int, day: date = None):
+    with _lock:
+        _known_metrics.add((challenge_id, day or date.today()))
+
+
+def get_pending_equity(challenge_id: int):
+    """Latest queued equity for a challenge, or None if nothing is pending."""
+    with _lock:
+        return _pending_equity.get(challenge_id)
+
+
+def get_pending_day_start(challenge_id: int):
+    """Queued day_start_equity for today's metric, or None."""
+    with _lock:
+        metric = _pending_metrics.get((challenge_id, date.today()))
+        return metric['day_start_equity'] if metric else None
+
+
+def discard_equity(challenge_id: int):
+    """Drop a queued equity write (used when a status transition writes it synchronously)."""
+    with _lock:
+        _pending_equity.pop(challenge_id, None)
+
+
+def flush():
+    """Write all pending updates in one transaction. Must run inside an app context."""
+    global _pending_equity, _pending_metrics
+
+    with _lock:
+        equity_batch, _pending_equity = _pending_equity, {}
+        metric_batch, _pending_metrics = _pending_metrics, {}
+
+    if not equity_batch and not metric_batch:
+        return 0
+
+    try:
+        if equity_batch:
+            db.session.execute(
+                update(Challenge),
+                [{'id': cid, 'equity': eq} for cid, eq in equity_batch.items()]
+            )
+
+        if metric_batch:
+            challenge_ids = {cid for cid, _ in metric_batch}
+            days = {day for _, day in metric_batch}
+            existing = {
+                (m.challenge_id, m.date): m
+                for m in DailyMetric.query.filter(
+                    DailyMetric.challenge_id.in_(challenge_ids),
+                    DailyMetric.date.in_(days)
+                ).all()
+            }
+
+            for (cid, day), pending in metric_batch.items():
+                row = existing.get((cid, day))
+                if not row:
+                    start = pending['day_start_equity']
+                    if start is None:
+                        start = pending['day_end_equity']
+                    if start is None:
+                        continue
+                    row = DailyMetric(challenge_id=cid, date=day, day_start_equity=start)
+                    db.session.add(row)
+
+                if pending['day_end_equity'] is not None:
+                    row.day_end_equity = pending['day_end_equity']
+                    row.day_pnl = round(row.day_end_equity - row.day_start_equity, 2)
+                if pending['min_equity'] is not None and row.day_start_equity:
+                    drawdown = (row.day_start_equity - pending['min_equity']) / row.day_start_equity * 100
+                    row.max_intraday_drawdown_pct = round(
+                        max(row.max_intraday_drawdown_pct or 0, drawdown, 0), 4
+                    )
+
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[WriteBehind] Flush failed, re-queueing: {e}")
+        _requeue(equity_batch, metric_batch)
+        return 0
+
+    today = date.today()
+    with _lock:
+        _known_metrics.update(metric_batch.keys())
+        stale = [key for key in _known_metrics if key[1] < today]
+        for key in stale:
+            _known_metrics.discard(key)
+
+    return len(equity_batch) + len(metric_batch)
+
+
+def _requeue(equity_batch, metric_batch):
+    """Put a failed batch back without clobbering newer writes."""
+    with _lock:
+        for cid, eq in equity_batch.items():
+            _pending_equity.setdefault(cid, eq)
+        for key, pending in metric_batch.items():
+            current = _pending_metrics.get(key)
+            if not current:
+                _pending_metrics[key] = pending
+                continue
+            if current['day_start_equity'] is None:
+                current['day_start_equity'] = pending['day_start_equity']
+            if current['day_end_equity'] is None:
+                current['day_end_equity'] = pending['day_end_equity']
+            if pending['min_equity'] is not None and (
+                current['min_equity'] is None or pending['min_equity'] < current['min_equity']
+            ):
+                current['min_equity'] = pending['min_equity']
+
+
+def _flush_loop():
+    """Background thread: flush every FLUSH_INTERVAL or as soon as MAX_PENDING is hit."""
+    print("[WriteBehind] Flush thread started")
+    while _flush_running:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        with _app.app_context():
+            flush()
+    print("[WriteBehind] Flush thread stopped")
+
+
+def start_write_behind(app):
+    """Start the background flusher and register a final flush on shutdown."""
+    global _app, _flush_thread, _flush_running
+
+    if _flush_running:
+        return
+
+    _app = app
+    _flush_running = True
+    _flush_thread = threading.Thread(target=_flush_loop, daemon=True)
+    _flush_thread.start()
+    atexit.register(stop_write_behind)
+
+
+def stop_write_behind():
+    """Stop the flusher and write whatever is still pending."""
+    global _flush_running
+
+    if not _flush_running:
+        return
+
+    _flush_running = False
+    _wake.set()
+    if _flush_thread and _flush_thread is not threading.current_thread():
+        _flush_thread.join(timeout=FLUSH_INTERVAL * 2)
+
+    with _app.app_context():
+        written = flush()
+    print(f"[WriteBehind] Final flush wrote {written} pending updates")
@@ -0,0 +1,130 @@
+"""
+XP Event Log & Badge Evaluator
+Every XP award is appended to xp_events; UserXP.total_xp and level are a
+running projection of that log (rebuild() recomputes them from it).
+
+Badge rules declare the event types they listen to. Recording an event only
+evaluates the rules registered for its type, and a rule is handed the totals
+before and after the event, so threshold badges fire on the crossing without
+re-reading the user's badges.
+"""
+
+from sqlalchemy import update
+
+from models import db, UserBadge, UserXP, XPEvent
+
+XP_PER_LEVEL = 500  # XP needed per level
+
+# Event types that carry XP
+LESSON_COMPLETED = 'lesson_completed'
+COURSE_CERTIFIED = 'course_certified'
+OPENING_BALANCE = 'opening_balance'  # XP earned before the log existed (migration 0008)
+XP_EVENTS = (LESSON_COMPLETED, COURSE_CERTIFIED, OPENING_BALANCE)
+
+BADGE_THRESHOLDS = {
+    'certified_analyst': {'xp': 1000, 'name': 'Certified Analyst', 'icon': '📊'},
+    'risk_master': {'xp': 2500, 'name': 'Risk Master', 'icon': '🛡️'},
+    'trading_expert': {'xp': 5000, 'name': 'Trading Expert', 'icon': '🏆'},
+    'elite_trader': {'xp': 10000, 'name': 'Elite Trader', 'icon': '👑'},
+}
+
+
+class BadgeRule:
+    """A badge, the events that can unlock it and check(event, xp_before, xp_after) -> bool."""
+    def __init__(self, badge_type, name, icon, events, check):
+        self.badge_type = badge_type
+        self.name = name
+        self.icon = icon
+        self.events = tuple(events)
+        self.check = check
+
+
+_rules = {}  # {event_type: [BadgeRule, ...]}
+
+
+def register_rule(rule: BadgeRule):
+    for event_type in rule.events:
+        _rules.setdefault(event_type, []).append(rule)
+    return rule
+
+
+def _crosses(threshold):
+    return lambda event, before, after: before < threshold <= after
+
+
+for _badge_type, _info in BADGE_THRESHOLDS.items():
+    register_rule(BadgeRule(_badge_type, _info['name'], _info['icon'], XP_EVENTS, _crosses(_info['xp'])))
+
+
+def level_for(total_xp) -> int:
+    return total_xp // XP_PER_LEVEL + 1
+
+
+def _award(user_id, rule):
+    """Add the badge unless the user already has it (only checked once a rule fired)."""
+    exists = db.session.query(UserBadge.id).filter_by(user_id=user_id, badge_type=rule.badge_type).first()
+    if exists:
+        return None
+    badge = UserBadge(user_id=user_id, badge_type=rule.badge_type, badge_name=rule.name, badge_icon=rule.icon)
+    db.session.add(badge)
+    return badge
+
+
+def evaluate(event, before, after):
+    """Run the rules listening to the event's type. Returns the newly awarded badges."""
+    awarded = []
+    for rule in _rules.get(event.event_type, ()):
+        if rule.check(event, before, after):
+            badge = _award(event.user_id, rule)
+            if badge is not None:
+                awarded.append(badge)
+    return awarded
+
+
+def record(user_id, event_type, xp=0, ref_id=None):
+    """
+    Append an event, apply its XP to the user's totals with an atomic increment
+    and evaluate the matching badge rules. Returns (UserXP, new badges). Caller commits.
+    """
+    event = XPEvent(user_id=user_id, event_type=event_type, xp=xp, ref_id=ref_id)
+    db.session.add(event)
+
+    if xp:
+        result = db.session.execute(
+            update(UserXP).where(UserXP.user_id == user_id)
+            .values(total_xp=UserXP.total_xp + xp, level=(UserXP.total_xp + xp) // XP_PER_LEVEL + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            db.session.add(UserXP(user_id=user_id, total_xp=xp, level=level_for(xp)))
+    db.session.flush()
+
+    # populate_existing: the identity map still holds the totals from before the UPDATE
+    user_xp = UserXP.query.filter_by(user_id=user_id).populate_existing().first()
+    if user_xp is None:  # No XP yet and a zero-XP event
+        user_xp = UserXP(user_id=user_id, total_xp=0, level=1)
+        db.session.add(user_xp)
+    after = user_xp.total_xp or 0
+    return user_xp, evaluate(event, after - xp, after)
+
+
+def rebuild(user_id):
+    """
+    Recompute total_xp/level from the log and replay it through the badge
+    rules (missing badges are awarded, existing ones kept). Caller commits.
+    """
+    events = XPEvent.query.filter_by(user_id=user_id).order_by(XPEvent.id).all()
+    total = 0
+    for event in events:
+        before, total = total, total + (event.xp or 0)
+        evaluate(event, before, total)
+
+    user_xp = UserXP.query.filter_by(user_id=user_id).first()
+    if user_xp is None:
+        user_xp = UserXP(user_id=user_id)
+        db.session.add(user_xp)
+    user_xp.total_xp = total
+    user_xp.level = level_for(total)
+    db.session.flush()
+    return user_xp
+
@@ -0,0 +1,175 @@
+"""
+Order Book Suite
+Drives services.order_book with synthetic price ticks against a throwaway
+SQLite database: limit/stop matching, OCO cancellation, bracket activation
+and reduce-only legs on a position that was already closed.
+
+Run:
+    python -m pytest -q test_order_book.py
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models import db, User, Plan, Challenge, Order, Trade
+from database import init_database
+from migrations import run_migrations
+from services.order_book import (OrderBook, RestingOrder, order_book, place_order, attach_bracket,
+                                 cancel_flat_brackets, process_tick)
+from services.price_cache import update_price
+
+SYMBOL = 'TEST-OB'
+
+
+@pytest.fixture
+def app():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'order_book.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        init_database(app)
+        with app.app_context():
+            db.create_all()
+            run_migrations()
+            order_book.clear()
+            # Equity updates after a fill read this instead of the mock price feed
+            update_price(SYMBOL, 100.0)
+            yield app
+            order_book.clear()
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def challenge_id(app):
+    plan = Plan(slug='starter', price_dh=200)
+    user = User(name='Trader', email='trader@tradesense.com', password_hash='x')
+    db.session.add_all([plan, user])
+    db.session.flush()
+    challenge = Challenge(user_id=user.id, plan_id=plan.id, start_balance=5000, equity=5000)
+    db.session.add(challenge)
+    db.session.commit()
+    return challenge.id
+
+
+def tick(price):
+    return process_tick({SYMBOL: price})
+
+
+def status(order_id):
+    db.session.expire_all()
+    return db.session.get(Order, order_id).status
+
+
+def net_position(challenge_id):
+    trades = Trade.query.filter_by(challenge_id=challenge_id, symbol=SYMBOL).all()
+    return sum(t.qty if t.side == 'buy' else -t.qty for t in trades)
+
+
+def test_limit_fills_only_when_crossed(challenge_id):
+    order = place_order(challenge_id, SYMBOL, 'buy', 'limit', 2, 95.0)['order']
+
+    assert tick(96.0) == 0
+    assert status(order['id']) == 'open'
+
+    assert tick(94.0) == 1
+    assert status(order['id']) == 'filled'
+    filled = db.session.get(Order, order['id'])
+    assert filled.fill_price == 94.0  # Limit buy fills at its price or better
+    assert net_position(challenge_id) == 2
+    assert order_book.open_count() == 0
+
+
+def test_stop_fills_at_trigger_tick(challenge_id):
+    order = place_order(challenge_id, SYMBOL, 'buy', 'stop', 1, 105.0)['order']
+
+    assert tick(104.0) == 0
+    assert tick(106.5) == 1
+    assert db.session.get(Order, order['id']).fill_price == 106.5
+
+
+def test_bracket_activates_on_entry_and_take_profit_cancels_stop(challenge_id):
+    result = place_order(challenge_id, SYMBOL, 'buy', 'limit', 1, 100.0, stop_loss=90.0, take_profit=110.0)
+    stop_leg, profit_leg = (leg['id'] for leg in result['bracket'])
+    assert status(stop_leg) == status(profit_leg) == 'pending'
+    assert order_book.open_count() == 1  # Legs wait off-book until the entry fills
+
+    assert tick(99.0) == 1
+    assert status(stop_leg) == status(profit_leg) == 'open'
+    assert order_book.open_count() == 2
+
+    assert tick(111.0) == 1
+    assert status(profit_leg) == 'filled'
+    assert status(stop_leg) == 'cancelled'
+    assert order_book.open_count() == 0
+    assert net_position(challenge_id) == 0
+
+    # The cancelled stop is gone from the book: a later drop trades nothing
+    assert tick(80.0) == 0
+    assert net_position(challenge_id) == 0
+
+
+def test_stop_on_flat_position_is_cancelled_not_reversed(challenge_id):
+    db.session.add(Trade(challenge_id=challenge_id, symbol=SYMBOL, side='buy', qty=1, price=100.0))
+    db.session.commit()
+    stop_leg, _ = (leg['id'] for leg in
+                   attach_bracket(challenge_id, SYMBOL, 'buy', 1, 100.0, stop_loss=90.0, take_profit=110.0)['bracket'])
+
+    # Closed by hand, then the stop fires before anyone cleans it up
+    db.session.add(Trade(challenge_id=challenge_id, symbol=SYMBOL, side='sell', qty=1, price=101.0))
+    db.session.commit()
+
+    assert tick(89.0) == 0
+    assert status(stop_leg) == 'cancelled'
+    assert net_position(challenge_id) == 0
+
+
+def test_reduce_only_leg_is_capped_at_open_position(challenge_id):
+    db.session.add(Trade(challenge_id=challenge_id, symbol=SYMBOL, side='buy', qty=3, price=100.0))
+    db.session.commit()
+    stop_leg = attach_bracket(challenge_id, SYMBOL, 'buy', 3, 100.0, stop_loss=90.0)['bracket'][0]['id']
+
+    db.session.add(Trade(challenge_id=challenge_id, symbol=SYMBOL, side='sell', qty=2, price=101.0))
+    db.session.commit()
+
+    assert tick(89.0) == 1
+    assert status(stop_leg) == 'filled'
+    assert net_position(challenge_id) == 0
+
+
+def test_cancel_flat_brackets_pulls_legs_off_the_book(challenge_id):
+    db.session.add(Trade(challenge_id=challenge_id, symbol=SYMBOL, side='buy', qty=1, price=100.0))
+    db.session.commit()
+    legs = [leg['id'] for leg in
+            attach_bracket(challenge_id, SYMBOL, 'buy', 1, 100.0, stop_loss=90.0, take_profit=110.0)['bracket']]
+
+    assert cancel_flat_brackets(challenge_id, SYMBOL) == []  # Still long: legs stay
+
+    db.session.add(Trade(challenge_id=challenge_id, symbol=SYMBOL, side='sell', qty=1, price=101.0))
+    db.session.commit()
+
+    assert sorted(cancel_flat_brackets(challenge_id, SYMBOL)) == sorted(legs)
+    assert [status(leg) for leg in legs] == ['cancelled', 'cancelled']
+    assert order_book.open_count() == 0
+
+
+def test_oco_siblings_crossed_in_same_tick_fill_once():
+    book = OrderBook()
+    # Both trigger on a rise, so one gap up crosses the pair
+    book.add(RestingOrder(1, 1, SYMBOL, 'sell', 'limit', 1, 110.0, oco_group='g'))
+    book.add(RestingOrder(2, 1, SYMBOL, 'buy', 'stop', 1, 108.0, oco_group='g'))
+    book.add(RestingOrder(3, 1, SYMBOL, 'sell', 'limit', 1, 130.0))
+
+    fills = book.match({SYMBOL: 120.0})
+    assert [(f.order.id, f.price, f.cancelled_ids) for f in fills] == [(2, 120.0, [1])]
+    assert book.open_count() == 1
+
+    assert book.match({SYMBOL: 125.0}) == []
+    assert book.remove(3)
+    assert not book.remove(1)
@@ -0,0 +1,292 @@
+"""
+Query Plan Regression Suite
+Calls the hot endpoints in routes/ and services/ against a seeded SQLite
+database, captures every SQL statement they emit, runs EXPLAIN QUERY PLAN on
+each one and fails if a table is read with a full scan instead of an index.
+
+Run:
+    python -m pytest -q test_query_plans.py
+    python test_query_plans.py
+"""
+
+import os
+import re
+import sys
+import tempfile
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import jwt
+from flask import Flask
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models import (db, User, Plan, Challenge, Trade, DailyMetric, CommunityPost, CommunityComment,
+                    Strategy, DirectMessage, Conversation, Course, CourseModule, Lesson, LessonQuiz,
+                    Webinar)
+from config import Config
+from database import init_database
+from migrations import run_migrations
+
+TENANT = 'ma'
+
+# Plan rows look like "SCAN trades" or "SCAN trades USING INDEX ..."; only the bare form is a table scan
+SCAN_RE = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+
+# (method, path, body) - {placeholders} are filled from the seeded ids
+ENDPOINTS = [
+    ('GET', '/api/challenges/active', None),
+    ('GET', '/api/challenges/{challenge_id}', None),
+    ('GET', '/api/challenges/plans', None),
+    ('GET', '/api/trades?challenge_id={challenge_id}', None),
+    ('GET', '/api/trades/orders?challenge_id={challenge_id}', None),
+    ('GET', '/api/trades/risk/{challenge_id}', None),
+    ('GET', '/api/trades/equity/{challenge_id}', None),
+    ('GET', '/api/trades/positions/{challenge_id}', None),
+    ('GET', '/api/trades/watchdog/{challenge_id}', None),
+    ('GET', '/api/leaderboard/monthly-top10', None),
+    ('GET', '/api/leaderboard/monthly-rank', None),
+    ('GET', '/api/leaderboard/risk-adjusted', None),
+    ('GET', '/api/v1/{tenant}/community/feed', None),
+    ('GET', '/api/v1/{tenant}/community/nexus', None),
+    ('GET', '/api/v1/{tenant}/community/posts/{post_id}/comments', None),
+    ('POST', '/api/v1/{tenant}/community/posts/{post_id}/like', None),
+    ('GET', '/api/v1/{tenant}/community/strategies/top', None),
+    ('GET', '/api/v1/{tenant}/community/search?q=breakout', None),
+    ('GET', '/api/v1/{tenant}/dm/conversations', None),
+    ('GET', '/api/v1/{tenant}/dm/messages/{other_id}', None),
+    ('GET', '/api/v1/{tenant}/dm/users', None),
+    ('GET', '/api/v1/{tenant}/academy/courses', None),
+    ('GET', '/api/v1/{tenant}/academy/courses/{course_id}', None),
+    ('GET', '/api/v1/{tenant}/academy/lessons/{lesson_id}', None),
+    ('POST', '/api/v1/{tenant}/academy/lessons/{lesson_id}/progress', {'video_progress_seconds': 30}),
+    ('GET', '/api/v1/{tenant}/academy/me/stats', None),
+    ('GET', '/api/v1/{tenant}/academy/me/progress', None),
+    ('GET', '/api/v1/{tenant}/academy/me/recommendations', None),
+    ('POST', '/api/v1/{tenant}/academy/me/recommendations/analyze', None),
+    ('GET', '/api/v1/{tenant}/academy/me/badges', None),
+    ('POST', '/api/v1/{tenant}/academy/courses/{course_id}/enroll', None),
+    ('GET', '/api/v1/{tenant}/academy/me/enrollments', None),
+    ('GET', '/api/v1/{tenant}/academy/me/certificates', None),
+    ('GET', '/api/v1/{tenant}/academy/webinars', None),
+    ('POST', '/api/v1/{tenant}/academy/webinars/{webinar_id}/register', None),
+    ('GET', '/api/v1/{tenant}/academy/me/webinars', None),
+    ('DELETE', '/api/v1/{tenant}/academy/webinars/{webinar_id}/unregister', None),
+    ('GET', '/api/v1/{tenant}/academy/lessons/{lesson_id}/notes', None),
+    ('GET', '/api/v1/{tenant}/academy/me/notes', None),
+    ('GET', '/api/v1/{tenant}/academy/me/bookmarks', None),
+    ('GET', '/api/v1/{tenant}/academy/search?q=trading', None),
+    ('POST', '/api/v1/{tenant}/academy/lessons/{lesson_id}/quiz', {'answers': {'{quiz_id}': 0}}),
+    ('GET', '/api/v1/{tenant}/academy/courses/{course_id}/leaderboard', None),
+    ('GET', '/api/v1/{tenant}/academy/courses/{course_id}/leaderboard/me', None),
+]
+
+# Full scans that are expected, per endpoint: {path template: {table: reason}}
+ALLOWED_SCANS = {
+    # Small reference table, always read in full
+    '/api/challenges/plans': {'plans': 'plan catalog'},
+    # Any 50 users; no filter to index
+    '/api/v1/{tenant}/dm/users': {'users': 'LIMIT 50 listing'},
+    # The catalog endpoint lists every course
+    '/api/v1/{tenant}/academy/courses': {'courses': 'catalog listing'},
+}
+
+
+def build_app(db_path):
+    from routes.challenges import challenges_bp
+    from routes.trades import trades_bp
+    from routes.leaderboard import leaderboard_bp
+    from routes.community import community_bp
+    from routes.academy import academy_bp
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SECRET_KEY'] = Config.SECRET_KEY
+    init_database(app)
+
+    app.register_blueprint(challenges_bp, url_prefix='/api/challenges')
+    app.register_blueprint(trades_bp, url_prefix='/api/trades')
+    app.register_blueprint(leaderboard_bp, url_prefix='/api/leaderboard')
+    app.register_blueprint(community_bp, url_prefix='/api/v1')
+    app.register_blueprint(academy_bp, url_prefix='/api/v1')
+
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+    return app
+
+
+def seed(app):
+    """Enough rows in every hot table that the planner has something to choose between."""
+    with app.app_context():
+        plan = Plan(slug='starter', price_dh=200)
+        users = [User(name=f'User {i}', email=f'user{i}@tradesense.com', password_hash='x') for i in range(5)]
+        db.session.add(plan)
+        db.session.add_all(users)
+        db.session.flush()
+        me, other = users[0], users[1]
+
+        challenges = [
+            Challenge(user_id=u.id, plan_id=plan.id, start_balance=5000, equity=5000 + i * 10)
+            for i, u in enumerate(users)
+        ]
+        db.session.add_all(challenges)
+        db.session.flush()
+        challenge = challenges[0]
+
+        now = datetime.utcnow()
+        for c in challenges:
+            for i in range(10):
+                db.session.add(Trade(challenge_id=c.id, symbol='BTC-USD', side='buy' if i % 2 else 'sell',
+                                     qty=0.01, price=45000 + i, executed_at=now - timedelta(minutes=i)))
+            db.session.add(DailyMetric(challenge_id=c.id, date=now.date(), day_start_equity=5000))
+
+        posts = []
+        for i in range(10):
+            post = CommunityPost(user_id=users[i % 5].id, tenant_id=TENANT, content=f'Post {i}')
+            posts.append(post)
+        db.session.add_all(posts)
+        db.session.flush()
+        for post in posts:
+            db.session.add(CommunityComment(post_id=post.id, user_id=other.id, content='Nice'))
+        for u in users:
+            db.session.add(Strategy(user_id=u.id, symbol='BTC-USD', description='Breakout', win_rate=55, votes_count=3))
+
+        for i in range(10):
+            sender, receiver = (me, other) if i % 2 else (other, me)
+            db.session.add(DirectMessage(sender_id=sender.id, receiver_id=receiver.id, content=f'Hi {i}'))
+        db.session.add(Conversation(user1_id=me.id, user2_id=other.id))
+
+        course = Course(title='Price Action', description='...')
+        db.session.add(course)
+        db.session.flush()
+        module = CourseModule(course_id=course.id, title='Basics', order_index=0)
+        db.session.add(module)
+        db.session.flush()
+        lesson = Lesson(module_id=module.id, title='Candles', content_markdown='...', order_index=0)
+        db.session.add(lesson)
+        db.session.flush()
+        quiz = LessonQuiz(lesson_id=lesson.id, question='?', options_json='["a", "b"]', correct_answer_index=0)
+        db.session.add(quiz)
+
+        webinar = Webinar(title='Live', description='...', scheduled_at=now + timedelta(days=1),
+                          host_name='Host', status='upcoming')
+        db.session.add(webinar)
+        db.session.commit()
+
+        return {
+            'tenant': TENANT,
+            'user_id': me.id,
+            'other_id': other.id,
+            'challenge_id': challenge.id,
+            'post_id': posts[0].id,
+            'course_id': course.id,
+            'lesson_id': lesson.id,
+            'quiz_id': quiz.id,
+            'webinar_id': webinar.id,
+        }
+
+
+def fill(body, ids):
+    """Fill {placeholders} in a request body's keys and string values."""
+    if isinstance(body, dict):
+        return {fill(key, ids): fill(value, ids) for key, value in body.items()}
+    if isinstance(body, str):
+        return body.format(**ids)
+    return body
+
+
+def capture_statements(app, ids):
+    """Hit every endpoint and return {path template: [(sql, params), ...]}."""
+    captured = defaultdict(list)
+    current = {'endpoint': None}
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        if current['endpoint'] and not executemany:
+            captured[current['endpoint']].append((statement, parameters))
+
+    with app.app_context():
+        engines = [db.engine]
+    reader = app.extensions.get('db_read_engine')
+    if reader is not None:
+        engines.append(reader)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _on_execute)
+
+    token = jwt.encode({'user_id': ids['user_id'], 'role': 'user',
+                        'exp': datetime.utcnow() + timedelta(hours=1)}, Config.SECRET_KEY, algorithm='HS256')
+    headers = {'Authorization': f'Bearer {token}'}
+    client = app.test_client()
+
+    try:
+        for method, template, body in ENDPOINTS:
+            current['endpoint'] = template
+            path = template.format(**ids)
+            response = client.open(path, method=method, json=fill(body, ids), headers=headers)
+            # A 4xx would mean the handler bailed out before its real queries ran
+            assert 200 <= response.status_code < 300, \
+                f"{method} {path} -> {response.status_code} {response.get_data(as_text=True)[:200]}"
+    finally:
+        current['endpoint'] = None
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', _on_execute)
+
+    return captured
+
+
+def find_table_scans(app, captured):
+    """EXPLAIN every captured read and return the full scans that are not allowlisted."""
+    problems = []
+    with app.app_context():
+        raw = db.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            for template, statements in captured.items():
+                allowed = ALLOWED_SCANS.get(template, {})
+                seen = set()
+                for statement, params in statements:
+                    verb = statement.lstrip().split(None, 1)[0].upper()
+                    if verb not in ('SELECT', 'UPDATE', 'DELETE') or statement in seen:
+                        continue
+                    seen.add(statement)
+                    cursor.execute(f"EXPLAIN QUERY PLAN {statement}", params)
+                    for row in cursor.fetchall():
+                        detail = row[-1]
+                        match = SCAN_RE.match(detail)
+                        if match and match.group(1) not in allowed:
+                            problems.append(f"{template}: {detail}\n    {' '.join(statement.split())}")
+        finally:
+            raw.close()
+    return problems
+
+
+def test_hot_queries_use_indexes():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'plans.db'))
+        ids = seed(app)
+        captured = capture_statements(app, ids)
+        problems = find_table_scans(app, captured)
+
+        with app.app_context():
+            db.engine.dispose()
+        app.extensions['db_read_engine'].dispose()
+
+    assert captured, "No SQL captured - endpoints did not run"
+    assert not problems, "Full table scans:\n" + "\n".join(problems)
+
+
+def test_migrations_are_idempotent():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'migrate.db'))
+        with app.app_context():
+            assert run_migrations() == []
+            db.engine.dispose()
+        app.extensions['db_read_engine'].dispose()
+
+
+if __name__ == '__main__':
+    test_hot_queries_use_indexes()
+    test_migrations_are_idempotent()
+    print("Query plans OK")
@@ -116,7 +116,7 @@ export const checkout = {
 };
 
 export const community = {
-    getFeed: (tenant = 'default', page = 1) => api.get(`/v1/${tenant}/community/nexus`, { params: { page } }),
+    getFeed: (tenant = 'default', cursor = null) => api.get(`/v1/${tenant}/community/nexus`, { params: cursor ? { cursor } : {} }),
     createPost: (tenant = 'default', formData) => api.post(`/v1/${tenant}/community/posts`, formData, {
         headers: { 'Content-Type': 'multipart/form-data' }
     }),